@@ -0,0 +1,66 @@
+# benchmarks/broadcast_bench.py
+"""
+Сравнение скорости рассылки: старый последовательный цикл и BroadcastEngine.
+
+Запуск: python benchmarks/broadcast_bench.py [--users 300] [--latency 0.05]
+Вместо настоящего бота используется FakeBot, который имитирует задержку Bot API.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.broadcast import BroadcastEngine, BroadcastRateLimiter, send_broadcast_payload
+
+class FakeBot:
+    """Имитация Bot с фиксированной задержкой сетевого запроса"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.sent = 0
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        await asyncio.sleep(self.latency)
+        self.sent += 1
+
+async def legacy_broadcast(bot, chat_ids, payload):
+    """Старый алгоритм: по одному сообщению с паузой 0.3 секунды"""
+    for chat_id in chat_ids:
+        await send_broadcast_payload(bot, chat_id, payload)
+        await asyncio.sleep(0.3)
+
+async def engine_broadcast(bot, chat_ids, payload, rate):
+    engine = BroadcastEngine(limiter=BroadcastRateLimiter(global_rate=rate))
+    await engine.run(
+        chat_ids, lambda chat_id, delivered: send_broadcast_payload(bot, chat_id, payload, delivered)
+    )
+
+async def measure(name, coro_factory, bot, count):
+    started = time.perf_counter()
+    await coro_factory()
+    elapsed = time.perf_counter() - started
+    print(f"{name:<10} {count:>6} msgs  {elapsed:8.2f} s  {bot.sent / elapsed:8.1f} msg/s")
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=300, help="получателей для BroadcastEngine")
+    parser.add_argument("--legacy-users", type=int, default=30, help="получателей для старого цикла")
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка одного запроса, сек")
+    parser.add_argument("--rate", type=float, default=25, help="глобальный лимит, сообщений в секунду")
+    args = parser.parse_args()
+
+    payload = {"type": "text", "text": "benchmark"}
+
+    bot = FakeBot(args.latency)
+    legacy_ids = list(range(args.legacy_users))
+    await measure("legacy", lambda: legacy_broadcast(bot, legacy_ids, payload), bot, len(legacy_ids))
+
+    bot = FakeBot(args.latency)
+    engine_ids = list(range(args.users))
+    await measure("engine", lambda: engine_broadcast(bot, engine_ids, payload, args.rate), bot, len(engine_ids))
+
+if __name__ == "__main__":
+    asyncio.run(main())
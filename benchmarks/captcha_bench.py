@@ -0,0 +1,89 @@
+# benchmarks/captcha_bench.py
+"""
+Скорость генерации капч (капч в секунду).
+
+legacy - прежний алгоритм: 1000 вызовов draw.point() на картинку
+single - generate_captcha() в текущем процессе
+pool   - CaptchaPool: получение готовых капч из пула, пополняемого процессами
+
+Запуск: python benchmarks/captcha_bench.py [--count 300] [--processes 2]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFont
+
+from utils.captcha import CaptchaPool, generate_captcha, generate_captcha_text
+
+def legacy_generate():
+    """Прежняя реализация generate_captcha_image для сравнения"""
+    text = generate_captcha_text()
+    width, height = 200, 80
+    image = Image.new('RGB', (width, height), color='white')
+    draw = ImageDraw.Draw(image)
+    for _ in range(1000):
+        draw.point((random.randint(0, width), random.randint(0, height)), fill='gray')
+    for _ in range(5):
+        draw.line([(random.randint(0, width), random.randint(0, height)),
+                   (random.randint(0, width), random.randint(0, height))], fill='gray', width=1)
+    try:
+        font = ImageFont.truetype("arial.ttf", 45)
+    except Exception:
+        font = ImageFont.load_default()
+    draw.text(((width - font.getlength(text)) // 2, (height - 45) // 2), text, font=font, fill='black')
+    buffer = BytesIO()
+    image.save(buffer, format='PNG')
+    return text, buffer.getvalue()
+
+def report(name, count, elapsed):
+    print(f"{name:<8} {count:>6} captchas  {elapsed:7.2f} s  {count / elapsed:8.1f} captchas/s")
+
+def measure_sync(name, func, count):
+    started = time.perf_counter()
+    for _ in range(count):
+        func()
+    report(name, count, time.perf_counter() - started)
+
+async def measure_pool(count, processes):
+    pool = CaptchaPool(size=count, processes=processes)
+    pool.start()
+    # Ждем, пока процессы запустятся и пул наполнится (как после старта бота)
+    while pool.qsize() < count:
+        await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    for _ in range(count):
+        await pool.get()
+    report("pool", count, time.perf_counter() - started)
+    await pool.stop()
+
+async def measure_refill(count, processes):
+    """Пропускная способность пополнения пула (капч в секунду со всех процессов)"""
+    pool = CaptchaPool(size=count, processes=processes)
+    pool.start()
+    await pool.get()  # первая капча - после запуска процессов
+    started = time.perf_counter()
+    while pool.qsize() < count - 1:
+        await asyncio.sleep(0.01)
+    report("refill", count - 1, time.perf_counter() - started)
+    await pool.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=300)
+    parser.add_argument("--processes", type=int, default=2)
+    args = parser.parse_args()
+
+    measure_sync("legacy", legacy_generate, args.count)
+    measure_sync("single", generate_captcha, args.count)
+    asyncio.run(measure_refill(args.count, args.processes))
+    asyncio.run(measure_pool(args.count, args.processes))
+
+if __name__ == "__main__":
+    main()
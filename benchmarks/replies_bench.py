@@ -0,0 +1,117 @@
+# benchmarks/replies_bench.py
+"""
+Количество запросов к Bot API на один апдейт в типичных сценариях.
+
+Обработчики регистрируются как в bot.py, запросы к Bot API не отправляются (сессия сразу
+возвращает None и считает вызванные методы). Для сценариев авторизованного пользователя
+создается пользователь во временной базе; база проекта не открывается.
+
+Запуск: python benchmarks/replies_bench.py [--updates 200]
+Нужен config.py проекта.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Путь к базе подменяется до импорта database: глобальный db создается при импорте
+import config
+bench_directory = tempfile.TemporaryDirectory()
+config.DATABASE_PATH = os.path.join(bench_directory.name, "bench.db")
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import Update
+
+from database import db
+from handlers import register_all_handlers
+from models import LinkStates
+from utils.captcha import captcha_pool
+
+TOKEN = "42:TEST"
+USER_ID = 987654321987
+
+class CountingSession(BaseSession):
+    """Сессия без сети: считает вызванные методы Bot API и сразу возвращает None"""
+
+    def __init__(self):
+        super().__init__()
+        self.methods = Counter()
+
+    async def make_request(self, bot, method, timeout=None):
+        self.methods[type(method).__name__] += 1
+        return None
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+    async def close(self):
+        pass
+
+# (название, текст, состояние FSM перед апдейтом, нужен ли авторизованный пользователь)
+CASES = [
+    ("/start (авторизован)", "/start", None, True),
+    ("/start (капча)", "/start", None, False),
+    ("Моё актуальное", "🔗 Моё актуальное", None, True),
+    ("/mylink", "/mylink", None, True),
+    ("Отмена ввода ссылки", "❌ Отмена", LinkStates.waiting_for_link, True),
+    ("Выйти (не авторизован)", "🚪 Выйти", None, False),
+]
+
+def make_update(update_id, text):
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": USER_ID, "type": "private"},
+            "from": {"id": USER_ID, "is_bot": False, "first_name": "User"},
+            "text": text,
+        },
+    }, context={"bot": None})
+
+async def measure(dp, bot, user_id, text, state, authorized, updates):
+    await db.update_telegram_id(user_id, USER_ID if authorized else None)
+    key = StorageKey(bot_id=bot.id, chat_id=USER_ID, user_id=USER_ID)
+    bot.session.methods.clear()
+    for update_id in range(1, updates + 1):
+        await dp.storage.set_state(key, state)
+        await dp.feed_update(bot, make_update(update_id, text))
+    return sum(bot.session.methods.values()) / updates, dict(bot.session.methods)
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--updates", type=int, default=200)
+    args = parser.parse_args()
+
+    bot = Bot(TOKEN, session=CountingSession())
+    dp = Dispatcher(storage=MemoryStorage())
+    register_all_handlers(dp)
+    captcha_pool.start()
+
+    await db.add_user("bench", "bench")
+    user_id = (await db.get_user_by_username("bench"))[0]
+    try:
+        await db.update_link(user_id, "https://example.com|Пример")
+        print(f"{'':26} {'запросов на апдейт':>18}  методы")
+        total = 0.0
+        for name, text, state, authorized in CASES:
+            calls, methods = await measure(dp, bot, user_id, text, state, authorized, args.updates)
+            total += calls
+            per_method = ", ".join(f"{method} {count / args.updates:g}" for method, count in sorted(methods.items()))
+            print(f"{name:26} {calls:18.2f}  {per_method}")
+        print(f"{'в среднем':26} {total / len(CASES):18.2f}")
+    finally:
+        await captcha_pool.stop()
+        db.close()
+        bench_directory.cleanup()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+# benchmarks/routing_bench.py
+"""
+Время диспетчеризации сообщения (dp.feed_update) без таблицы маршрутов кнопок и с ней.
+
+Обработчики регистрируются как в bot.py, запросы к Bot API не отправляются (сессия сразу
+возвращает None). Для каждого текста замеряется среднее время обработки апдейта: кнопка,
+проверяемая первой, кнопка из конца цепочки, текст кастомной кнопки (доходит до catch-all)
+и текст в состоянии FSM (таблица не используется).
+
+Запуск: python benchmarks/routing_bench.py [--updates 20000]
+Нужен config.py проекта.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import Update
+
+from handlers import register_all_handlers
+from models import LinkStates
+from utils.text_routes import text_routes
+
+TOKEN = "42:TEST"
+CHAT_ID = 1000001
+
+class NullSession(BaseSession):
+    """Сессия без сети: любой метод Bot API сразу возвращает None"""
+
+    async def make_request(self, bot, method, timeout=None):
+        return None
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+    async def close(self):
+        pass
+
+CASES = [
+    ("первая кнопка", "📝 Регистрация", None),
+    ("последняя кнопка", "✉️ Написать сообщение", None),
+    ("кастомная кнопка", "Неизвестная кнопка", None),
+    ("в состоянии FSM", "https://example.com", LinkStates.waiting_for_link),
+]
+
+def make_update(update_id, text):
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": CHAT_ID, "type": "private"},
+            "from": {"id": CHAT_ID, "is_bot": False, "first_name": "User"},
+            "text": text,
+        },
+    }, context={"bot": None})
+
+async def measure(dp, bot, text, state, updates):
+    key = StorageKey(bot_id=bot.id, chat_id=CHAT_ID, user_id=CHAT_ID)
+    update = make_update(1, text)
+    # Прогрев: кэши базы и обработчиков
+    for _ in range(100):
+        await dp.storage.set_state(key, state)
+        await dp.feed_update(bot, update)
+    started = time.perf_counter()
+    for _ in range(updates):
+        await dp.storage.set_state(key, state)
+        await dp.feed_update(bot, update)
+    return (time.perf_counter() - started) / updates * 1e6
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--updates", type=int, default=20000)
+    args = parser.parse_args()
+
+    bot = Bot(TOKEN, session=NullSession())
+    dp = Dispatcher(storage=MemoryStorage())
+    register_all_handlers(dp)
+
+    before = {name: await measure(dp, bot, text, state, args.updates) for name, text, state in CASES}
+    text_routes.build(dp)
+    dp.message.outer_middleware.register(text_routes)
+    after = {name: await measure(dp, bot, text, state, args.updates) for name, text, state in CASES}
+
+    print(f"{'':20} {'фильтры, мкс':>14} {'таблица, мкс':>14}")
+    for name, _, _ in CASES:
+        print(f"{name:20} {before[name]:14.1f} {after[name]:14.1f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
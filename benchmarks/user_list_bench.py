@@ -0,0 +1,90 @@
+# benchmarks/user_list_bench.py
+"""
+Сравнение построения списка пользователей для администратора на синтетической базе.
+
+legacy     - весь список: get_all_users() и отдельный get_user_by_username() для пароля каждого
+first page - первая страница, как ее показывает /admin (render_users_page, keyset-запрос get_users_page)
+all pages  - обход всех страниц кнопкой «вперед»
+
+Запуск: python benchmarks/user_list_bench.py [--users 10000]
+Нужен config.py проекта; данные создаются во временной базе и удаляются после замера.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Путь к базе подменяется до импорта database: глобальный db создается при импорте
+import config
+bench_directory = tempfile.TemporaryDirectory()
+config.DATABASE_PATH = os.path.join(bench_directory.name, "bench.db")
+
+from database import Database, db
+from handlers.admin import render_users_page
+from utils.helpers import format_admin_user_entry
+
+def fill_database(database: Database, count: int):
+    with database._cursor() as cursor:
+        cursor.executemany(
+            "INSERT INTO users (username, password, telegram_id, link, full_name) VALUES (?, ?, ?, ?, ?)",
+            [
+                (f"user{i}", f"pass{i}", 100000 + i if i % 3 else None, f"https://example.com/{i}|Партнер {i}", f"Имя {i}")
+                for i in range(count)
+            ]
+        )
+        cursor.connection.commit()
+
+async def legacy_list(database: Database):
+    """Старый алгоритм: N+1 запросов и форматирование всего списка"""
+    entries = []
+    for user_id, username, telegram_id, link, full_name in database.get_all_users():
+        password = database.get_user_by_username(username)[1]
+        entries.append(format_admin_user_entry((user_id, username, password, telegram_id, link, full_name)))
+    return len(entries)
+
+async def first_page():
+    text, _ = await render_users_page("list")
+    return 1 if text else 0
+
+async def all_pages():
+    """Перелистывание до конца: ключ следующей страницы берется из кнопки «вперед», как в callback_users_page"""
+    pages = 0
+    text, keyboard = await render_users_page("list")
+    while text is not None:
+        pages += 1
+        next_buttons = [button for button in (keyboard.inline_keyboard[0] if keyboard else [])
+                        if ":next:" in button.callback_data]
+        if not next_buttons:
+            break
+        text, keyboard = await render_users_page("list", after_id=int(next_buttons[0].callback_data.rsplit(":", 1)[1]))
+    return pages
+
+async def measure(name, func, repeat, unit):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = await func()
+        best = min(best, time.perf_counter() - started)
+    print(f"{name:<10} {best * 1000:9.1f} ms  ({result} {unit})")
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    try:
+        fill_database(db.sync, args.users)
+        await measure("legacy", lambda: legacy_list(db.sync), args.repeat, "entries")
+        await measure("first page", first_page, args.repeat, "page")
+        await measure("all pages", all_pages, 1, "pages")
+    finally:
+        db.close()
+        bench_directory.cleanup()
+
+if __name__ == "__main__":
+    asyncio.run(main())
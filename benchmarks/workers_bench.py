@@ -0,0 +1,163 @@
+# benchmarks/workers_bench.py
+"""
+Пропускная способность бота (апдейтов в секунду) с 1, 2 и 4 воркерами.
+
+Бот запускается как обычно (python bot.py) в режиме вебхука, запросы к Bot API уходят
+на локальный фейковый сервер. На вебхук отправляются текстовые сообщения от неавторизованных
+пользователей из разных чатов; каждое вызывает один ответ sendMessage. Замеряется время
+от первого апдейта до последнего ответа.
+
+Общий лимит отправки (OUTBOUND_RATE) делится между процессами и ограничил бы любой замер
+30 ответами в секунду, поэтому по умолчанию он отключен (--outbound-rate 0); с --outbound-rate 30
+видно, что суммарная скорость ответов не превышает лимит при любом числе воркеров
+(часть бюджета остается основному процессу для рассылок).
+
+Запуск: python benchmarks/workers_bench.py [--updates 2000] [--chats 500] [--workers 1 2 4] [--outbound-rate 0]
+Нужен config.py проекта.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_PORT = 8181
+WEBHOOK_PORT = 8182
+WORKER_BASE_PORT = 8190
+SECRET = "bench-secret"
+
+class FakeBotAPI:
+    """Фейковый Bot API: отвечает на любой метод и считает отправленные сообщения"""
+
+    def __init__(self):
+        self.sent = 0
+        self.message_ids = itertools.count(1)
+        self.done = None
+        self.expected = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        if method == "sendmessage":
+            data = await request.post()
+            self.sent += 1
+            if self.done is not None and self.sent >= self.expected:
+                self.done.set()
+            return web.json_response({"ok": True, "result": {
+                "message_id": next(self.message_ids),
+                "date": int(time.time()),
+                "chat": {"id": int(data.get("chat_id", 0)), "type": "private"},
+                "text": data.get("text", ""),
+            }})
+        if method == "getme":
+            return web.json_response({"ok": True, "result": {
+                "id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot"
+            }})
+        return web.json_response({"ok": True, "result": True})
+
+def make_update(update_id, chat_id):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "User"},
+            "text": "привет",
+        },
+    }
+
+async def wait_ready(session, urls, timeout=60):
+    deadline = time.monotonic() + timeout
+    for url in urls:
+        while True:
+            try:
+                async with session.get(url) as response:
+                    if response.status == 200:
+                        break
+            except aiohttp.ClientError:
+                pass
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{url} is not ready")
+            await asyncio.sleep(0.2)
+
+async def measure(api: FakeBotAPI, workers, updates, chats, concurrency, outbound_rate):
+    env = dict(
+        os.environ,
+        BOT_WORKERS=str(workers),
+        OUTBOUND_RATE=str(outbound_rate),
+        BOT_MODE="webhook",
+        WEBHOOK_URL="",
+        WEBHOOK_HOST="127.0.0.1",
+        WEBHOOK_PORT=str(WEBHOOK_PORT),
+        WEBHOOK_SECRET=SECRET,
+        WORKER_BASE_PORT=str(WORKER_BASE_PORT),
+        BOT_API_URL=f"http://127.0.0.1:{API_PORT}",
+    )
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "bot.py")], env=env, cwd=ROOT,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        async with aiohttp.ClientSession() as session:
+            health = [f"http://127.0.0.1:{WEBHOOK_PORT}/healthz"]
+            if workers > 1:
+                health += [f"http://127.0.0.1:{WORKER_BASE_PORT + i}/healthz" for i in range(workers)]
+            await wait_ready(session, health)
+
+            api.sent = 0
+            api.expected = updates
+            api.done = asyncio.Event()
+            url = f"http://127.0.0.1:{WEBHOOK_PORT}/webhook"
+            headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+            counter = itertools.count(1)
+
+            async def sender():
+                for update_id in iter(lambda: next(counter), None):
+                    if update_id > updates:
+                        return
+                    update = make_update(update_id, 1000000 + update_id % chats)
+                    async with session.post(url, json=update, headers=headers) as response:
+                        await response.read()
+
+            started = time.perf_counter()
+            await asyncio.gather(*(sender() for _ in range(concurrency)))
+            await asyncio.wait_for(api.done.wait(), 120)
+            elapsed = time.perf_counter() - started
+        print(f"{workers} worker(s): {updates} updates in {elapsed:6.2f} s  {updates / elapsed:8.1f} updates/s")
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--chats", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--outbound-rate", type=float, default=0, help="общий лимит отправки, 0 - без ограничения")
+    args = parser.parse_args()
+
+    api = FakeBotAPI()
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", api.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", API_PORT).start()
+    try:
+        for workers in args.workers:
+            await measure(api, workers, args.updates, args.chats, args.concurrency, args.outbound_rate)
+    finally:
+        await runner.cleanup()
+
+if __name__ == "__main__":
+    asyncio.run(main())
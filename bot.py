@@ -1,14 +1,27 @@
 # bot.py
 import logging
 import asyncio
+import os
 import signal
 import sys
 import traceback
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 from config import BOT_TOKEN
 from handlers import register_all_handlers
 from database import db
+from utils.broadcast_queue import broadcast_queue
+from utils.captcha import captcha_pool
+from utils.welcome import welcome_message
+from utils.notifications import notification_bus, LINK_UPDATED
+from utils.webhook import BOT_MODE, WEBHOOK_PATH, run_webhook, run_polling, run_front_polling
+from utils.workers import (
+    MULTI_WORKER, IS_PRIMARY, WORKER_INDEX, WORKER_BASE_PORT, WORKER_SECRET, UpdateRouter, WorkerPool
+)
+from utils.fsm_storage import fsm_storage
+from utils.scheduler import chat_scheduler
+from utils.text_routes import text_routes
+from utils.outbound import outbound_calls
+from utils.bot_session import create_session, warm_up
 
 # Настройка логирования
 logging.basicConfig(
@@ -19,45 +32,82 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Инициализация бота и диспетчера
-bot = Bot(token=BOT_TOKEN)
-storage = MemoryStorage()
-dp = Dispatcher(storage=storage)
-
-async def send_channel_notification(username, link):
-    """Отправка уведомления в канал о новой ссылке"""
-    try:
-        # Получаем ID канала из базы данных
-        channel_id = db.get_channel("links")
-        if not channel_id:
-            logger.warning("Links channel not configured")
-            return
-
-        await bot.send_message(
-            channel_id,
-            f"📢 Пользователь обновил ссылки!\n"
-            f"👤 Пользователь: {username}\n"
-            f"🔗 Ссылки: \n{link}"
-        )
-        logger.info(f"Notification sent to channel about user {username}")
-    except Exception as e:
-        logger.error(f"Failed to send channel notification: {e}")
+# Сессия с настроенным пулом соединений, повторами запросов и статистикой задержек (utils/bot_session.py)
+bot = Bot(token=BOT_TOKEN, session=create_session())
+# Состояния FSM хранятся в базе (переживают перезапуск и общие для воркеров), чтение - из памяти
+dp = Dispatcher(storage=fsm_storage)
 
 # Middleware для обработки результатов от process_link
 class NotificationMiddleware:
+    """Публикует событие об обновлении ссылки; пост в канал отправляют фоновые воркеры"""
+
     async def __call__(self, handler, event, data):
         result = await handler(event, data)
         if isinstance(result, dict) and 'username' in result and 'link' in result:
-            await send_channel_notification(result['username'], result['link'])
+            try:
+                await notification_bus.publish(LINK_UPDATED, {
+                    'user_id': result.get('user_id'),
+                    'username': result['username'],
+                    'link': result['link'],
+                })
+            except Exception as e:
+                logger.error(f"Failed to publish link notification: {e}")
         return result
 
 async def on_startup():
     """Действия при запуске бота"""
+    # Соединения с Bot API открываются заранее, чтобы первые ответы не ждали TCP/TLS
+    await warm_up(bot)
+    if IS_PRIMARY:
+        # Фоновые задачи выполняет только основной процесс
+        # Запускаем воркер рассылок: он продолжит незавершенные рассылки
+        broadcast_queue.start(bot)
+        # Запускаем отправку уведомлений в канал (включая оставшиеся с прошлого запуска)
+        notification_bus.start(bot)
+    if MULTI_WORKER:
+        # Сбрасываем кэши после изменений в других процессах
+        db.start_cache_sync(prune=IS_PRIMARY)
+    if not (MULTI_WORKER and IS_PRIMARY):
+        # Запускаем фоновую генерацию капч там, где обрабатываются апдейты
+        captcha_pool.start()
+        # Запускаем запись состояний FSM и удаление брошенных диалогов
+        fsm_storage.start()
+    # Загружаем приветственное сообщение в память и следим за изменениями файла
+    welcome_message.start()
     logger.info("Бот запущен")
 
 async def on_shutdown():
     """Действия при остановке бота"""
     logger.info("Завершение работы бота...")
     
+    # Останавливаем воркер рассылок до закрытия базы данных
+    try:
+        await broadcast_queue.stop()
+        logger.info("Воркер рассылок остановлен")
+    except Exception as e:
+        logger.error(f"Ошибка при остановке воркера рассылок: {e}")
+    
+    # Останавливаем отправку уведомлений: неотправленные останутся в базе
+    try:
+        await notification_bus.stop()
+    except Exception as e:
+        logger.error(f"Ошибка при остановке отправки уведомлений: {e}")
+    
+    # Останавливаем генерацию капч
+    try:
+        await captcha_pool.stop()
+    except Exception as e:
+        logger.error(f"Ошибка при остановке генерации капч: {e}")
+    
+    await welcome_message.stop()
+    await db.stop_cache_sync()
+    
+    # Записываем несохраненные состояния FSM до закрытия базы
+    try:
+        await fsm_storage.close()
+    except Exception as e:
+        logger.error(f"Ошибка при сохранении состояний FSM: {e}")
+    
     # Закрываем подключение к базе данных
     try:
         db.close()
@@ -72,13 +122,37 @@ async def on_shutdown():
     except Exception as e:
         logger.error(f"Ошибка при закрытии сессии бота: {e}")
 
+async def run_front(script):
+    """Основной процесс режима нескольких воркеров: запуск воркеров и пересылка им апдейтов по ID чата"""
+    workers = WorkerPool(script)
+    router = UpdateRouter(path=WEBHOOK_PATH, secret_token=workers.secret_token)
+    workers.start()
+    router.start()
+    try:
+        if BOT_MODE == "webhook":
+            await run_webhook(dp, bot, router=router)
+        else:
+            await run_front_polling(dp, bot, router)
+    finally:
+        await router.stop()
+        await workers.stop()
+
 async def main():
     try:
         # Регистрация всех обработчиков
         register_all_handlers(dp)
         
         # Добавление middleware
+        # Апдейты одного чата обрабатываются по очереди, разных чатов - параллельно
+        dp.update.outer_middleware.register(chat_scheduler)
+        # Подсчет запросов к Bot API на апдейт
+        dp.update.outer_middleware.register(outbound_calls)
+        bot.session.middleware(outbound_calls.count_request)
         dp.message.middleware.register(NotificationMiddleware())
+        # Нажатия кнопок без состояния FSM передаются обработчику по словарю текстов
+        # (строится после регистрации всех обработчиков и middleware)
+        text_routes.build(dp)
+        dp.message.outer_middleware.register(text_routes)
         
         # Запуск бота
         await on_startup()
@@ -93,8 +167,18 @@ async def main():
         signal.signal(signal.SIGINT, signal_handler)
         signal.signal(signal.SIGTERM, signal_handler)
         
-        # Запускаем поллинг
-        await dp.start_polling(bot, skip_updates=True)
+        # Запускаем получение апдейтов: вебхук или поллинг (накопившиеся апдейты пропускаются)
+        if MULTI_WORKER and not IS_PRIMARY:
+            # Воркер получает апдейты своих чатов от основного процесса
+            await run_webhook(
+                dp, bot, host="127.0.0.1", port=WORKER_BASE_PORT + WORKER_INDEX, url="", secret_token=WORKER_SECRET
+            )
+        elif MULTI_WORKER:
+            await run_front(os.path.abspath(__file__))
+        elif BOT_MODE == "webhook":
+            await run_webhook(dp, bot)
+        else:
+            await run_polling(dp, bot)
         
     except KeyboardInterrupt:
         logger.info("Бот остановлен по запросу пользователя")
@@ -1,359 +1,1021 @@
 # Обновление database.py - добавляем поле full_name
 
+import asyncio
+import functools
+import itertools
+import os
+import queue
 import sqlite3
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from config import DATABASE_PATH
+from utils.cache import LRUCache
+from utils.workers import MULTI_WORKER
 
 logger = logging.getLogger(__name__)
 
+# Количество соединений в пуле (и потоков, выполняющих запросы)
+POOL_SIZE = 4
+
+# Максимальное количество пользователей в кэше get_user_by_telegram_id
+USER_CACHE_SIZE = 10000
+
+# Как часто процесс проверяет изменения, сделанные другими воркерами (секунды),
+# и сколько хранятся записи об изменениях
+CACHE_SYNC_INTERVAL = 0.5
+INVALIDATIONS_TTL_MINUTES = 10
+
+class ConnectionPool:
+    """Пул соединений SQLite в режиме WAL"""
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.size = size
+        self._connections = queue.Queue()
+        for _ in range(size):
+            connection = sqlite3.connect(path, check_same_thread=False, timeout=10)
+            # WAL позволяет читать параллельно с записью
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._connections.put(connection)
+
+    @contextmanager
+    def connection(self):
+        """Получение соединения из пула на время одного запроса"""
+        connection = self._connections.get()
+        try:
+            yield connection
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            # Не возвращаем в пул соединение с незавершенной транзакцией
+            if connection.in_transaction:
+                connection.rollback()
+            self._connections.put(connection)
+
+    def refresh_schema(self):
+        """Перечитывание схемы всеми соединениями после миграций
+
+        Соединение с устаревшей схемой не видит новые индексы при подготовке запроса (например, для ON CONFLICT).
+        """
+        connections = [self._connections.get() for _ in range(self.size)]
+        try:
+            for connection in connections:
+                connection.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+        finally:
+            for connection in connections:
+                self._connections.put(connection)
+
+    def close(self):
+        """Закрытие всех соединений пула"""
+        for _ in range(self.size):
+            self._connections.get().close()
+
 class Database:
-    def __init__(self):
-        """Инициализация соединения с базой данных"""
-        self.connection = sqlite3.connect(DATABASE_PATH)
-        self.cursor = self.connection.cursor()
+    def __init__(self, path=DATABASE_PATH, pool_size=POOL_SIZE, shared_cache=MULTI_WORKER):
+        """Инициализация пула соединений с базой данных
+
+        shared_cache: базу используют несколько процессов - изменения записываются в cache_invalidations,
+        чтобы другие процессы сбросили свои кэши
+        """
+        self.pool = ConnectionPool(path, pool_size)
+        self.shared_cache = shared_cache
+        # Версия кастомных кнопок: увеличивается при каждом их изменении
+        self._versions = itertools.count(1)
+        self.custom_buttons_version = 0
         self._create_tables()
         self._migrate_tables()  # Добавляем миграцию
+        self.pool.refresh_schema()
+    
+    def _log_invalidation(self, cursor, name, key=None):
+        """Запись об изменении данных для кэшей других процессов (в той же транзакции, что и изменение)"""
+        if self.shared_cache:
+            cursor.execute(
+                "INSERT INTO cache_invalidations (origin, name, key) VALUES (?, ?, ?)",
+                (os.getpid(), name, None if key is None else str(key))
+            )
+
+    def _bump_custom_buttons_version(self):
+        """Отметка об изменении кастомных кнопок (для перестроения клавиатуры)"""
+        self.custom_buttons_version = next(self._versions)
+    
+    @contextmanager
+    def _cursor(self):
+        """Отдельный курсор на отдельном соединении для каждого запроса"""
+        with self.pool.connection() as connection:
+            yield connection.cursor()
     
     # Добавить в database.py в метод _create_tables():
 
     def _create_tables(self):
         """Создание необходимых таблиц, если они не существуют"""
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY,
-            username TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            telegram_id INTEGER UNIQUE,
-            link TEXT,
-            full_name TEXT
-        )
-        ''')
+        with self._cursor() as cursor:
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY,
+                username TEXT UNIQUE NOT NULL,
+                password TEXT NOT NULL,
+                telegram_id INTEGER UNIQUE,
+                link TEXT,
+                full_name TEXT
+            )
+            ''')
+        
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS channels (
+                id INTEGER PRIMARY KEY,
+                type TEXT NOT NULL,
+                channel_id TEXT NOT NULL
+            )
+            ''')
+        
+            # Новая таблица для кастомных кнопок
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS custom_buttons (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                url TEXT NOT NULL,
+                is_active INTEGER DEFAULT 1,
+                sort_order INTEGER DEFAULT 0
+            )
+            ''')
         
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS channels (
-            id INTEGER PRIMARY KEY,
-            type TEXT NOT NULL,
-            channel_id TEXT NOT NULL
-        )
-        ''')
+            # Рассылки: задание и список получателей со статусом доставки
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS broadcast_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sender_id INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                finished_at TEXT
+            )
+            ''')
+        
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS broadcast_recipients (
+                job_id INTEGER NOT NULL,
+                telegram_id INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                PRIMARY KEY (job_id, telegram_id)
+            )
+            ''')
+        
+            # Исходящие уведомления: хранятся до успешной отправки, чтобы пережить перезапуск
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS notification_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+            ''')
+        
+            # Сообщения доски ссылок в канале: часть доски (диапазон id пользователей) -> сообщение
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS link_board (
+                chat_id TEXT NOT NULL,
+                shard INTEGER NOT NULL,
+                message_id INTEGER NOT NULL,
+                PRIMARY KEY (chat_id, shard)
+            )
+            ''')
+        
+            # Состояния FSM (общие для всех процессов бота)
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS fsm_states (
+                key TEXT PRIMARY KEY,
+                state TEXT,
+                data TEXT,
+                expires_at REAL
+            )
+            ''')
+        
+            # Изменения данных, после которых другие процессы должны сбросить кэши
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS cache_invalidations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                origin INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                key TEXT,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+            ''')
         
-        # Новая таблица для кастомных кнопок
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS custom_buttons (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            url TEXT NOT NULL,
-            is_active INTEGER DEFAULT 1,
-            sort_order INTEGER DEFAULT 0
-        )
-        ''')
+            # Загруженные в Telegram статические файлы: путь, хэш содержимого и file_id
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS media_assets (
+                path TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                file_id TEXT NOT NULL,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+            ''')
         
-        self.connection.commit()
+            cursor.connection.commit()
 
     # Добавить методы для работы с кастомными кнопками в конец класса Database:
 
     def add_custom_button(self, name, url):
         """Добавление новой кастомной кнопки"""
-        try:
-            # Получаем максимальный порядок сортировки
-            self.cursor.execute("SELECT MAX(sort_order) FROM custom_buttons")
-            max_order = self.cursor.fetchone()[0] or 0
+        with self._cursor() as cursor:
+            try:
+                # Получаем максимальный порядок сортировки
+                cursor.execute("SELECT MAX(sort_order) FROM custom_buttons")
+                max_order = cursor.fetchone()[0] or 0
             
-            self.cursor.execute(
-                "INSERT INTO custom_buttons (name, url, sort_order) VALUES (?, ?, ?)",
-                (name, url, max_order + 1)
-            )
-            self.connection.commit()
-            return True
-        except sqlite3.Error as e:
-            logger.error(f"Ошибка при добавлении кастомной кнопки: {e}")
-            return False
+                cursor.execute(
+                    "INSERT INTO custom_buttons (name, url, sort_order) VALUES (?, ?, ?)",
+                    (name, url, max_order + 1)
+                )
+                self._log_invalidation(cursor, "custom_buttons")
+                cursor.connection.commit()
+                self._bump_custom_buttons_version()
+                return True
+            except sqlite3.Error as e:
+                logger.error(f"Ошибка при добавлении кастомной кнопки: {e}")
+                return False
 
     def get_custom_buttons(self, active_only=True):
-        """Получение списка кастомных кнопок"""
-        try:
-            if active_only:
-                self.cursor.execute(
-                    "SELECT id, name, url, is_active FROM custom_buttons WHERE is_active = 1 ORDER BY sort_order"
-                )
-            else:
-                self.cursor.execute(
-                    "SELECT id, name, url, is_active FROM custom_buttons ORDER BY sort_order"
-                )
-            return self.cursor.fetchall()
-        except sqlite3.Error as e:
-            logger.error(f"Ошибка при получении кастомных кнопок: {e}")
-            return []
+        """Получение списка кастомных кнопок (None - ошибка чтения, в отличие от пустого списка)"""
+        with self._cursor() as cursor:
+            try:
+                if active_only:
+                    cursor.execute(
+                        "SELECT id, name, url, is_active FROM custom_buttons WHERE is_active = 1 ORDER BY sort_order"
+                    )
+                else:
+                    cursor.execute(
+                        "SELECT id, name, url, is_active FROM custom_buttons ORDER BY sort_order"
+                    )
+                return cursor.fetchall()
+            except sqlite3.Error as e:
+                logger.error(f"Ошибка при получении кастомных кнопок: {e}")
+                return None
 
     def update_custom_button(self, button_id, name=None, url=None):
         """Обновление кастомной кнопки"""
-        try:
-            if name is not None and url is not None:
-                self.cursor.execute(
-                    "UPDATE custom_buttons SET name = ?, url = ? WHERE id = ?",
-                    (name, url, button_id)
-                )
-            elif name is not None:
-                self.cursor.execute(
-                    "UPDATE custom_buttons SET name = ? WHERE id = ?",
-                    (name, button_id)
-                )
-            elif url is not None:
-                self.cursor.execute(
-                    "UPDATE custom_buttons SET url = ? WHERE id = ?",
-                    (url, button_id)
-                )
-            self.connection.commit()
-            return True
-        except sqlite3.Error as e:
-            logger.error(f"Ошибка при обновлении кастомной кнопки: {e}")
-            return False
+        with self._cursor() as cursor:
+            try:
+                if name is not None and url is not None:
+                    cursor.execute(
+                        "UPDATE custom_buttons SET name = ?, url = ? WHERE id = ?",
+                        (name, url, button_id)
+                    )
+                elif name is not None:
+                    cursor.execute(
+                        "UPDATE custom_buttons SET name = ? WHERE id = ?",
+                        (name, button_id)
+                    )
+                elif url is not None:
+                    cursor.execute(
+                        "UPDATE custom_buttons SET url = ? WHERE id = ?",
+                        (url, button_id)
+                    )
+                self._log_invalidation(cursor, "custom_buttons")
+                cursor.connection.commit()
+                self._bump_custom_buttons_version()
+                return True
+            except sqlite3.Error as e:
+                logger.error(f"Ошибка при обновлении кастомной кнопки: {e}")
+                return False
 
     def toggle_custom_button(self, button_id):
         """Переключение активности кастомной кнопки"""
-        try:
-            self.cursor.execute(
-                "UPDATE custom_buttons SET is_active = 1 - is_active WHERE id = ?",
-                (button_id,)
-            )
-            self.connection.commit()
-            return True
-        except sqlite3.Error as e:
-            logger.error(f"Ошибка при переключении кастомной кнопки: {e}")
-            return False
+        with self._cursor() as cursor:
+            try:
+                cursor.execute(
+                    "UPDATE custom_buttons SET is_active = 1 - is_active WHERE id = ?",
+                    (button_id,)
+                )
+                self._log_invalidation(cursor, "custom_buttons")
+                cursor.connection.commit()
+                self._bump_custom_buttons_version()
+                return True
+            except sqlite3.Error as e:
+                logger.error(f"Ошибка при переключении кастомной кнопки: {e}")
+                return False
 
     def delete_custom_button(self, button_id):
         """Удаление кастомной кнопки"""
-        try:
-            self.cursor.execute("DELETE FROM custom_buttons WHERE id = ?", (button_id,))
-            self.connection.commit()
-            return True
-        except sqlite3.Error as e:
-            logger.error(f"Ошибка при удалении кастомной кнопки: {e}")
-            return False
+        with self._cursor() as cursor:
+            try:
+                cursor.execute("DELETE FROM custom_buttons WHERE id = ?", (button_id,))
+                self._log_invalidation(cursor, "custom_buttons")
+                cursor.connection.commit()
+                self._bump_custom_buttons_version()
+                return True
+            except sqlite3.Error as e:
+                logger.error(f"Ошибка при удалении кастомной кнопки: {e}")
+                return False
 
     def get_custom_button_by_id(self, button_id):
         """Получение кастомной кнопки по ID"""
-        try:
-            self.cursor.execute(
-                "SELECT id, name, url, is_active FROM custom_buttons WHERE id = ?",
-                (button_id,)
-            )
-            return self.cursor.fetchone()
-        except sqlite3.Error as e:
-            logger.error(f"Ошибка при получении кастомной кнопки: {e}")
-            return None
+        with self._cursor() as cursor:
+            try:
+                cursor.execute(
+                    "SELECT id, name, url, is_active FROM custom_buttons WHERE id = ?",
+                    (button_id,)
+                )
+                return cursor.fetchone()
+            except sqlite3.Error as e:
+                logger.error(f"Ошибка при получении кастомной кнопки: {e}")
+                return None
     
     def _migrate_tables(self):
         """Миграция существующих таблиц"""
-        try:
-            # Проверяем, есть ли колонка full_name
-            self.cursor.execute("PRAGMA table_info(users)")
-            columns = [column[1] for column in self.cursor.fetchall()]
+        with self._cursor() as cursor:
+            try:
+                # Проверяем, есть ли колонка full_name
+                cursor.execute("PRAGMA table_info(users)")
+                columns = [column[1] for column in cursor.fetchall()]
+            
+                if 'full_name' not in columns:
+                    # Добавляем колонку full_name, если её нет
+                    cursor.execute("ALTER TABLE users ADD COLUMN full_name TEXT")
+                    cursor.connection.commit()
+                    logger.info("Added full_name column to users table")
+            
+                # Один канал на тип: убираем дубли (оставляем последнюю запись) и добавляем уникальный индекс
+                cursor.execute(
+                    "DELETE FROM channels WHERE id NOT IN (SELECT MAX(id) FROM channels GROUP BY type)"
+                )
+                if cursor.rowcount:
+                    logger.info(f"Removed {cursor.rowcount} duplicate channel rows")
+                cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_channels_type ON channels(type)")
+                cursor.connection.commit()
             
-            if 'full_name' not in columns:
-                # Добавляем колонку full_name, если её нет
-                self.cursor.execute("ALTER TABLE users ADD COLUMN full_name TEXT")
-                self.connection.commit()
-                logger.info("Added full_name column to users table")
-        except Exception as e:
-            logger.error(f"Migration error: {e}")
+                # Время истечения состояний FSM: брошенные диалоги удаляются по индексу
+                cursor.execute("PRAGMA table_info(fsm_states)")
+                if 'expires_at' not in [column[1] for column in cursor.fetchall()]:
+                    cursor.execute("ALTER TABLE fsm_states ADD COLUMN expires_at REAL")
+                    logger.info("Added expires_at column to fsm_states table")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_fsm_states_expires ON fsm_states(expires_at)")
+                # Состояниям, сохраненным до появления колонки, даем срок с момента миграции
+                cursor.execute(
+                    "UPDATE fsm_states SET expires_at = ? WHERE expires_at IS NULL", (time.time() + 24 * 60 * 60,)
+                )
+                cursor.connection.commit()
+            
+                # Счетчик неудачных попыток выполнения рассылки
+                cursor.execute("PRAGMA table_info(broadcast_jobs)")
+                if 'attempts' not in [column[1] for column in cursor.fetchall()]:
+                    cursor.execute("ALTER TABLE broadcast_jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+                    cursor.connection.commit()
+                    logger.info("Added attempts column to broadcast_jobs table")
+            except Exception as e:
+                logger.error(f"Migration error: {e}")
     
     def add_user(self, username, password, full_name=None):
         """Добавление нового пользователя"""
-        try:
-            self.cursor.execute(
-                "INSERT INTO users (username, password, full_name) VALUES (?, ?, ?)",
-                (username, password, full_name)
-            )
-            self.connection.commit()
-            return True
-        except sqlite3.IntegrityError:
-            logger.error(f"Пользователь {username} уже существует")
-            return False
+        with self._cursor() as cursor:
+            try:
+                cursor.execute(
+                    "INSERT INTO users (username, password, full_name) VALUES (?, ?, ?)",
+                    (username, password, full_name)
+                )
+                cursor.connection.commit()
+                return True
+            except sqlite3.IntegrityError:
+                logger.error(f"Пользователь {username} уже существует")
+                return False
     
     def authenticate_user(self, username, password):
         """Проверка учетных данных пользователя"""
-        self.cursor.execute(
-            "SELECT id FROM users WHERE username = ? AND password = ?",
-            (username, password)
-        )
-        user = self.cursor.fetchone()
-        return user[0] if user else None
+        with self._cursor() as cursor:
+            cursor.execute(
+                "SELECT id FROM users WHERE username = ? AND password = ?",
+                (username, password)
+            )
+            user = cursor.fetchone()
+            return user[0] if user else None
     
     def update_telegram_id(self, user_id, telegram_id, full_name=None):
         """Обновление Telegram ID и полного имени пользователя"""
-        if full_name:
-            self.cursor.execute(
-                "UPDATE users SET telegram_id = ?, full_name = ? WHERE id = ?",
-                (telegram_id, full_name, user_id)
-            )
-        else:
-            self.cursor.execute(
-                "UPDATE users SET telegram_id = ? WHERE id = ?",
-                (telegram_id, user_id)
-            )
-        self.connection.commit()
+        with self._cursor() as cursor:
+            if full_name:
+                cursor.execute(
+                    "UPDATE users SET telegram_id = ?, full_name = ? WHERE id = ?",
+                    (telegram_id, full_name, user_id)
+                )
+            else:
+                cursor.execute(
+                    "UPDATE users SET telegram_id = ? WHERE id = ?",
+                    (telegram_id, user_id)
+                )
+            self._log_invalidation(cursor, "user", user_id)
+            if telegram_id is not None:
+                self._log_invalidation(cursor, "telegram", telegram_id)
+            cursor.connection.commit()
     
     def get_user_by_telegram_id(self, telegram_id):
         """Получение информации о пользователе по Telegram ID"""
-        self.cursor.execute(
-            "SELECT id, username, link, full_name FROM users WHERE telegram_id = ?",
-            (telegram_id,)
-        )
-        result = self.cursor.fetchone()
-        # Обеспечиваем обратную совместимость: если full_name NULL, возвращаем только первые 3 поля
-        if result and result[3] is None:
-            return result[:3]  # (id, username, link)
-        return result  # (id, username, link, full_name) или None
+        with self._cursor() as cursor:
+            cursor.execute(
+                "SELECT id, username, link, full_name FROM users WHERE telegram_id = ?",
+                (telegram_id,)
+            )
+            result = cursor.fetchone()
+            # Обеспечиваем обратную совместимость: если full_name NULL, возвращаем только первые 3 поля
+            if result and result[3] is None:
+                return result[:3]  # (id, username, link)
+            return result  # (id, username, link, full_name) или None
     
     def get_user_by_username(self, username):
         """Получение информации о пользователе по имени пользователя"""
-        self.cursor.execute(
-            "SELECT id, password, telegram_id, link, full_name FROM users WHERE username = ?",
-            (username,)
-        )
-        return self.cursor.fetchone()
+        with self._cursor() as cursor:
+            cursor.execute(
+                "SELECT id, password, telegram_id, link, full_name FROM users WHERE username = ?",
+                (username,)
+            )
+            return cursor.fetchone()
     
     def update_link(self, user_id, link):
         """Обновление ссылки пользователя"""
-        self.cursor.execute(
-            "UPDATE users SET link = ? WHERE id = ?",
-            (link, user_id)
-        )
-        self.connection.commit()
+        with self._cursor() as cursor:
+            cursor.execute(
+                "UPDATE users SET link = ? WHERE id = ?",
+                (link, user_id)
+            )
+            self._log_invalidation(cursor, "user", user_id)
+            cursor.connection.commit()
     
     def get_all_users(self):
         """Получение списка всех пользователей для админа"""
-        try:
-            # Проверяем, есть ли колонка full_name
-            self.cursor.execute("PRAGMA table_info(users)")
-            columns = [column[1] for column in self.cursor.fetchall()]
+        with self._cursor() as cursor:
+            try:
+                # Проверяем, есть ли колонка full_name
+                cursor.execute("PRAGMA table_info(users)")
+                columns = [column[1] for column in cursor.fetchall()]
             
-            if 'full_name' in columns:
-                # Если колонка есть, выбираем все поля включая full_name
-                self.cursor.execute("SELECT id, username, telegram_id, link, full_name FROM users")
-            else:
-                # Если колонки нет, выбираем только старые поля
-                self.cursor.execute("SELECT id, username, telegram_id, link FROM users")
+                if 'full_name' in columns:
+                    # Если колонка есть, выбираем все поля включая full_name
+                    cursor.execute("SELECT id, username, telegram_id, link, full_name FROM users")
+                else:
+                    # Если колонки нет, выбираем только старые поля
+                    cursor.execute("SELECT id, username, telegram_id, link FROM users")
             
-            return self.cursor.fetchall()
-        except Exception as e:
-            logger.error(f"Error getting all users: {e}")
-            # Fallback to old query format
-            self.cursor.execute("SELECT id, username, telegram_id, link FROM users")
-            return self.cursor.fetchall()
+                return cursor.fetchall()
+            except Exception as e:
+                logger.error(f"Error getting all users: {e}")
+                # Fallback to old query format
+                cursor.execute("SELECT id, username, telegram_id, link FROM users")
+                return cursor.fetchall()
     
+    def get_users_page(self, after_id=None, before_id=None, limit=10):
+        """Страница пользователей по возрастанию id (keyset-пагинация)
+
+        Args:
+            after_id: вернуть пользователей с id больше указанного (следующая страница)
+            before_id: вернуть пользователей с id меньше указанного (предыдущая страница)
+            limit: максимальное количество строк
+
+        Returns:
+            list: строки (id, username, password, telegram_id, link, full_name) по возрастанию id
+        """
+        columns = "id, username, password, telegram_id, link, full_name"
+        with self._cursor() as cursor:
+            if before_id is not None:
+                cursor.execute(
+                    f"SELECT {columns} FROM users WHERE id < ? ORDER BY id DESC LIMIT ?",
+                    (before_id, limit)
+                )
+                return cursor.fetchall()[::-1]
+            
+            cursor.execute(
+                f"SELECT {columns} FROM users WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id or 0, limit)
+            )
+            return cursor.fetchall()
+    
+    def get_user_links_in_range(self, first_id, last_id):
+        """Пользователи с сохраненной ссылкой и id в диапазоне [first_id, last_id]: (id, username, link)"""
+        with self._cursor() as cursor:
+            cursor.execute(
+                "SELECT id, username, link FROM users "
+                "WHERE id BETWEEN ? AND ? AND link IS NOT NULL AND link != '' ORDER BY id",
+                (first_id, last_id)
+            )
+            return cursor.fetchall()
+
+    def get_max_user_id(self):
+        """Наибольший id пользователя (0, если пользователей нет)"""
+        with self._cursor() as cursor:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM users")
+            return cursor.fetchone()[0]
+
     def delete_user(self, user_id):
         """Удаление пользователя"""
-        try:
-            self.cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
-            self.connection.commit()
-            return True
-        except sqlite3.Error as e:
-            logger.error(f"Ошибка при удалении пользователя: {e}")
-            return False
+        with self._cursor() as cursor:
+            try:
+                cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
+                self._log_invalidation(cursor, "user", user_id)
+                cursor.connection.commit()
+                return True
+            except sqlite3.Error as e:
+                logger.error(f"Ошибка при удалении пользователя: {e}")
+                return False
     
     def update_username(self, user_id, new_username):
         """Изменение логина пользователя"""
-        try:
-            self.cursor.execute(
-                "UPDATE users SET username = ? WHERE id = ?",
-                (new_username, user_id)
-            )
-            self.connection.commit()
-            return True
-        except sqlite3.IntegrityError:
-            logger.error(f"Пользователь с логином {new_username} уже существует")
-            return False
-        except sqlite3.Error as e:
-            logger.error(f"Ошибка при изменении логина: {e}")
-            return False
+        with self._cursor() as cursor:
+            try:
+                cursor.execute(
+                    "UPDATE users SET username = ? WHERE id = ?",
+                    (new_username, user_id)
+                )
+                self._log_invalidation(cursor, "user", user_id)
+                cursor.connection.commit()
+                return True
+            except sqlite3.IntegrityError:
+                logger.error(f"Пользователь с логином {new_username} уже существует")
+                return False
+            except sqlite3.Error as e:
+                logger.error(f"Ошибка при изменении логина: {e}")
+                return False
     
     def update_password(self, user_id, new_password):
         """Изменение пароля пользователя"""
-        try:
-            self.cursor.execute(
-                "UPDATE users SET password = ? WHERE id = ?",
-                (new_password, user_id)
-            )
-            self.connection.commit()
-            return True
-        except sqlite3.Error as e:
-            logger.error(f"Ошибка при изменении пароля: {e}")
-            return False
+        with self._cursor() as cursor:
+            try:
+                cursor.execute(
+                    "UPDATE users SET password = ? WHERE id = ?",
+                    (new_password, user_id)
+                )
+                cursor.connection.commit()
+                return True
+            except sqlite3.Error as e:
+                logger.error(f"Ошибка при изменении пароля: {e}")
+                return False
     
     def get_user_by_id(self, user_id):
         """Получение информации о пользователе по ID"""
-        self.cursor.execute(
-            "SELECT username, telegram_id, link, full_name FROM users WHERE id = ?",
-            (user_id,)
-        )
-        result = self.cursor.fetchone()
-        # Обеспечиваем обратную совместимость: если full_name NULL, возвращаем только первые 3 поля
-        if result and result[3] is None:
-            return result[:3]  # (username, telegram_id, link)
-        return result  # (username, telegram_id, link, full_name) или None
+        with self._cursor() as cursor:
+            cursor.execute(
+                "SELECT username, telegram_id, link, full_name FROM users WHERE id = ?",
+                (user_id,)
+            )
+            result = cursor.fetchone()
+            # Обеспечиваем обратную совместимость: если full_name NULL, возвращаем только первые 3 поля
+            if result and result[3] is None:
+                return result[:3]  # (username, telegram_id, link)
+            return result  # (username, telegram_id, link, full_name) или None
         
     # Заменить метод set_channel в database.py:
 
     def set_channel(self, channel_type, channel_id):
         """Установка или обновление канала определенного типа"""
-        try:
-            # Сначала проверяем, есть ли уже запись с таким типом
-            self.cursor.execute(
-                "SELECT id FROM channels WHERE type = ?",
-                (channel_type,)
-            )
-            existing = self.cursor.fetchone()
-            
-            if existing:
-                # Если запись существует, обновляем её
-                self.cursor.execute(
-                    "UPDATE channels SET channel_id = ? WHERE type = ?",
-                    (channel_id, channel_type)
-                )
-                logger.info(f"Updated channel {channel_type} to {channel_id}")
-            else:
-                # Если записи нет, создаём новую
-                self.cursor.execute(
-                    "INSERT INTO channels (type, channel_id) VALUES (?, ?)",
+        with self._cursor() as cursor:
+            try:
+                cursor.execute(
+                    "INSERT INTO channels (type, channel_id) VALUES (?, ?) "
+                    "ON CONFLICT(type) DO UPDATE SET channel_id = excluded.channel_id",
                     (channel_type, channel_id)
                 )
-                logger.info(f"Inserted new channel {channel_type} with {channel_id}")
-            
-            self.connection.commit()
-            
-            # Проверяем, что изменения применились
-            self.cursor.execute(
-                "SELECT channel_id FROM channels WHERE type = ?",
-                (channel_type,)
-            )
-            result = self.cursor.fetchone()
-            saved_id = result[0] if result else None
-            logger.info(f"Verification: channel {channel_type} now has ID {saved_id}")
-            
-            return True
-        except sqlite3.Error as e:
-            logger.error(f"Ошибка при установке канала: {e}")
-            return False
+                self._log_invalidation(cursor, "channels", channel_type)
+                cursor.connection.commit()
+                logger.info(f"Channel {channel_type} set to {channel_id}")
+                return True
+            except sqlite3.Error as e:
+                logger.error(f"Ошибка при установке канала: {e}")
+                return False
 
     def get_channel(self, channel_type):
         """Получение ID канала по типу"""
-        try:
-            self.cursor.execute(
-                "SELECT channel_id FROM channels WHERE type = ?",
-                (channel_type,)
+        with self._cursor() as cursor:
+            try:
+                cursor.execute(
+                    "SELECT channel_id FROM channels WHERE type = ?",
+                    (channel_type,)
+                )
+                result = cursor.fetchone()
+                return result[0] if result else None
+            except sqlite3.Error as e:
+                logger.error(f"Ошибка при получении канала: {e}")
+                return None
+
+    def get_all_channels(self):
+        """Получение всех каналов: {тип: ID канала}"""
+        with self._cursor() as cursor:
+            cursor.execute("SELECT type, channel_id FROM channels")
+            return dict(cursor.fetchall())
+
+    def create_broadcast_job(self, sender_id, payload):
+        """Создание задания на рассылку всем авторизованным пользователям, кроме отправителя"""
+        with self._cursor() as cursor:
+            try:
+                cursor.execute(
+                    "INSERT INTO broadcast_jobs (sender_id, payload) VALUES (?, ?)",
+                    (sender_id, payload)
+                )
+                job_id = cursor.lastrowid
+                cursor.execute(
+                    "INSERT OR IGNORE INTO broadcast_recipients (job_id, telegram_id) "
+                    "SELECT ?, telegram_id FROM users WHERE telegram_id IS NOT NULL AND telegram_id != ?",
+                    (job_id, sender_id)
+                )
+                cursor.connection.commit()
+                return job_id
+            except sqlite3.Error as e:
+                cursor.connection.rollback()
+                logger.error(f"Ошибка при создании рассылки: {e}")
+                return None
+
+    def get_unfinished_broadcast_jobs(self):
+        """Получение незавершенных рассылок в порядке создания"""
+        with self._cursor() as cursor:
+            cursor.execute(
+                "SELECT id, sender_id, payload, attempts FROM broadcast_jobs WHERE status = 'pending' ORDER BY id"
+            )
+            return cursor.fetchall()
+
+    def get_pending_broadcast_recipients(self, job_id, limit=1000):
+        """Получение получателей рассылки, которым сообщение еще не отправлено"""
+        with self._cursor() as cursor:
+            cursor.execute(
+                "SELECT telegram_id FROM broadcast_recipients WHERE job_id = ? AND status = 'pending' LIMIT ?",
+                (job_id, limit)
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def set_broadcast_statuses(self, job_id, statuses):
+        """Сохранение статусов доставки пачкой в одной транзакции
+
+        Args:
+            job_id: ID рассылки
+            statuses: список пар (telegram_id, status)
+        """
+        with self._cursor() as cursor:
+            try:
+                cursor.executemany(
+                    "UPDATE broadcast_recipients SET status = ? WHERE job_id = ? AND telegram_id = ?",
+                    [(status, job_id, telegram_id) for telegram_id, status in statuses]
+                )
+                cursor.connection.commit()
+                return True
+            except sqlite3.Error as e:
+                cursor.connection.rollback()
+                logger.error(f"Ошибка при сохранении статусов рассылки: {e}")
+                return False
+
+    def get_broadcast_stats(self, job_id):
+        """Получение количества получателей рассылки по статусам"""
+        with self._cursor() as cursor:
+            cursor.execute(
+                "SELECT status, COUNT(*) FROM broadcast_recipients WHERE job_id = ? GROUP BY status",
+                (job_id,)
+            )
+            return dict(cursor.fetchall())
+
+    def finish_broadcast_job(self, job_id):
+        """Отметка рассылки как завершенной"""
+        with self._cursor() as cursor:
+            cursor.execute(
+                "UPDATE broadcast_jobs SET status = 'done', finished_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (job_id,)
+            )
+            cursor.connection.commit()
+
+    def set_broadcast_job_attempts(self, job_id, attempts, failed=False):
+        """Сохранение числа неудачных попыток рассылки; failed - рассылка больше не выполняется"""
+        with self._cursor() as cursor:
+            cursor.execute(
+                "UPDATE broadcast_jobs SET attempts = ?, status = ?, "
+                "finished_at = CASE WHEN ? THEN CURRENT_TIMESTAMP END WHERE id = ?",
+                (attempts, 'failed' if failed else 'pending', failed, job_id)
+            )
+            cursor.connection.commit()
+
+    def add_notification(self, kind, payload):
+        """Сохранение уведомления в очередь на отправку"""
+        with self._cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO notification_outbox (kind, payload) VALUES (?, ?)",
+                (kind, payload)
+            )
+            cursor.connection.commit()
+            return cursor.lastrowid
+
+    def get_pending_notifications(self):
+        """Получение неотправленных уведомлений в порядке создания"""
+        with self._cursor() as cursor:
+            cursor.execute(
+                "SELECT id, kind, payload, attempts FROM notification_outbox WHERE status = 'pending' ORDER BY id"
+            )
+            return cursor.fetchall()
+
+    def delete_notifications(self, notification_ids):
+        """Удаление отправленных уведомлений"""
+        with self._cursor() as cursor:
+            cursor.executemany(
+                "DELETE FROM notification_outbox WHERE id = ?",
+                [(notification_id,) for notification_id in notification_ids]
+            )
+            cursor.connection.commit()
+
+    def set_notifications_attempts(self, notification_ids, attempts, failed=False):
+        """Сохранение числа попыток отправки; failed - уведомления больше не отправляются"""
+        with self._cursor() as cursor:
+            cursor.executemany(
+                "UPDATE notification_outbox SET attempts = ?, status = ? WHERE id = ?",
+                [(attempts, 'failed' if failed else 'pending', notification_id) for notification_id in notification_ids]
+            )
+            cursor.connection.commit()
+
+    def get_link_board(self, chat_id):
+        """Сообщения доски ссылок в канале: {часть: message_id}"""
+        with self._cursor() as cursor:
+            cursor.execute("SELECT shard, message_id FROM link_board WHERE chat_id = ?", (str(chat_id),))
+            return dict(cursor.fetchall())
+
+    def save_link_board_message(self, chat_id, shard, message_id):
+        """Сохранение сообщения части доски ссылок"""
+        with self._cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO link_board (chat_id, shard, message_id) VALUES (?, ?, ?) "
+                "ON CONFLICT(chat_id, shard) DO UPDATE SET message_id = excluded.message_id",
+                (str(chat_id), shard, message_id)
+            )
+            cursor.connection.commit()
+
+    def get_media_asset(self, path):
+        """Получение (sha256, file_id) загруженного файла"""
+        with self._cursor() as cursor:
+            try:
+                cursor.execute(
+                    "SELECT sha256, file_id FROM media_assets WHERE path = ?",
+                    (path,)
+                )
+                return cursor.fetchone()
+            except sqlite3.Error as e:
+                logger.error(f"Ошибка при получении файла {path}: {e}")
+                return None
+
+    def save_media_asset(self, path, sha256, file_id):
+        """Сохранение file_id загруженного файла"""
+        with self._cursor() as cursor:
+            try:
+                cursor.execute(
+                    "INSERT INTO media_assets (path, sha256, file_id) VALUES (?, ?, ?) "
+                    "ON CONFLICT(path) DO UPDATE SET sha256 = excluded.sha256, file_id = excluded.file_id, "
+                    "updated_at = CURRENT_TIMESTAMP",
+                    (path, sha256, file_id)
+                )
+                cursor.connection.commit()
+                return True
+            except sqlite3.Error as e:
+                logger.error(f"Ошибка при сохранении файла {path}: {e}")
+                return False
+
+    def delete_media_asset(self, path):
+        """Удаление сохраненного file_id файла"""
+        with self._cursor() as cursor:
+            cursor.execute("DELETE FROM media_assets WHERE path = ?", (path,))
+            cursor.connection.commit()
+
+    def get_fsm_record(self, key):
+        """Получение (state, data, expires_at) состояния FSM"""
+        with self._cursor() as cursor:
+            cursor.execute("SELECT state, data, expires_at FROM fsm_states WHERE key = ?", (key,))
+            return cursor.fetchone()
+
+    def save_fsm_records(self, records):
+        """Сохранение пачки состояний FSM в одной транзакции
+
+        Args:
+            records: список (key, state, data, expires_at); запись без состояния и данных удаляется
+        """
+        with self._cursor() as cursor:
+            cursor.executemany(
+                "INSERT INTO fsm_states (key, state, data, expires_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET state = excluded.state, data = excluded.data, "
+                "expires_at = excluded.expires_at",
+                [record for record in records if record[1] is not None or record[2] is not None]
+            )
+            cursor.executemany(
+                "DELETE FROM fsm_states WHERE key = ?",
+                [(key,) for key, state, data, expires_at in records if state is None and data is None]
             )
-            result = self.cursor.fetchone()
-            return result[0] if result else None
-        except sqlite3.Error as e:
-            logger.error(f"Ошибка при получении канала: {e}")
-            return None
+            cursor.connection.commit()
+
+    def delete_expired_fsm_states(self, now):
+        """Удаление истекших состояний FSM; возвращает количество удаленных"""
+        with self._cursor() as cursor:
+            cursor.execute("DELETE FROM fsm_states WHERE expires_at <= ?", (now,))
+            cursor.connection.commit()
+            return cursor.rowcount
+
+    def count_fsm_states(self, now):
+        """Количество неистекших состояний FSM"""
+        with self._cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM fsm_states WHERE expires_at > ?", (now,))
+            return cursor.fetchone()[0]
+
+    def log_invalidation(self, name, key=None):
+        """Отдельная запись об изменении данных, которые хранятся вне базы (например, приветствие)"""
+        with self._cursor() as cursor:
+            self._log_invalidation(cursor, name, key)
+            cursor.connection.commit()
+
+    def get_last_invalidation_id(self):
+        with self._cursor() as cursor:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM cache_invalidations")
+            return cursor.fetchone()[0]
+
+    def get_invalidations(self, after_id):
+        """Изменения после after_id: (id, origin, name, key), origin - pid процесса, сделавшего изменение"""
+        with self._cursor() as cursor:
+            cursor.execute(
+                "SELECT id, origin, name, key FROM cache_invalidations WHERE id > ? ORDER BY id",
+                (after_id,)
+            )
+            return cursor.fetchall()
+
+    def prune_invalidations(self, max_age_minutes=INVALIDATIONS_TTL_MINUTES):
+        """Удаление старых записей об изменениях"""
+        with self._cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM cache_invalidations WHERE created_at < datetime('now', ?)",
+                (f"-{max_age_minutes} minutes",)
+            )
+            cursor.connection.commit()
+            return cursor.rowcount
 
     def close(self):
         """Закрытие соединения с базой данных"""
-        self.connection.close()
+        self.pool.close()
+
+class AsyncDatabase:
+    """Асинхронный доступ к базе данных с теми же методами, что и у Database
+
+    Запросы выполняются в пуле потоков, поэтому медленный диск не блокирует обработку апдейтов.
+    Синхронный экземпляр доступен через атрибут sync.
+    """
+
+    def __init__(self, database: Database, user_cache_size=USER_CACHE_SIZE):
+        self.sync = database
+        self._executor = ThreadPoolExecutor(max_workers=database.pool.size, thread_name_prefix="db")
+        # Кэш пользователей по telegram_id (кэшируется и отсутствие пользователя)
+        self.user_cache = LRUCache(user_cache_size, on_evict=self._forget_user)
+        self._telegram_ids = {}  # id пользователя -> telegram_id закэшированной записи
+        self._user_cache_generation = 0
+        # Реестр каналов {тип: ID канала}: загружается при запуске и обновляется через set_channel
+        self.channels = {}
+        self.load_channels()
+        # Синхронизация кэшей с другими процессами (режим нескольких воркеров)
+        self._listeners = {}
+        self._sync_task = None
+        self._last_invalidation = 0
+
+    def load_channels(self):
+        """Загрузка реестра каналов из базы"""
+        self.channels = self.sync.get_all_channels()
+        logger.info(f"Loaded {len(self.channels)} channels")
+
+    async def run(self, func, *args, **kwargs):
+        """Выполнение синхронной функции в пуле потоков базы данных"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def __getattr__(self, name):
+        method = getattr(self.sync, name)
+        if not callable(method) or name.startswith("_"):
+            return method
+
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs):
+            return await self.run(method, *args, **kwargs)
+
+        # Запоминаем обертку, чтобы не создавать её при каждом вызове
+        setattr(self, name, wrapper)
+        return wrapper
+
+    def _forget_user(self, telegram_id, user):
+        if user is not None:
+            self._telegram_ids.pop(user[0], None)
+
+    def _invalidate_user(self, user_id=None, telegram_id=None):
+        """Удаление пользователя из кэша по id и/или telegram_id"""
+        self._user_cache_generation += 1
+        if user_id is not None and user_id in self._telegram_ids:
+            self.user_cache.pop(self._telegram_ids.pop(user_id))
+        if telegram_id is not None:
+            self._forget_user(telegram_id, self.user_cache.pop(telegram_id))
+
+    async def get_user_by_telegram_id(self, telegram_id):
+        """Получение информации о пользователе по Telegram ID (через кэш)"""
+        found, user = self.user_cache.lookup(telegram_id)
+        if found:
+            return user
+
+        generation = self._user_cache_generation
+        user = await self.run(self.sync.get_user_by_telegram_id, telegram_id)
+        # Если пока шел запрос пользователей изменили, результат может быть устаревшим
+        if generation == self._user_cache_generation:
+            self.user_cache.set(telegram_id, user)
+            if user is not None:
+                self._telegram_ids[user[0]] = telegram_id
+        return user
+
+    async def update_telegram_id(self, user_id, telegram_id, full_name=None):
+        """Обновление Telegram ID и полного имени пользователя"""
+        try:
+            return await self.run(self.sync.update_telegram_id, user_id, telegram_id, full_name)
+        finally:
+            self._invalidate_user(user_id=user_id, telegram_id=telegram_id)
+
+    async def update_link(self, user_id, link):
+        """Обновление ссылки пользователя"""
+        try:
+            return await self.run(self.sync.update_link, user_id, link)
+        finally:
+            self._invalidate_user(user_id=user_id)
+
+    async def update_username(self, user_id, new_username):
+        """Изменение логина пользователя"""
+        try:
+            return await self.run(self.sync.update_username, user_id, new_username)
+        finally:
+            self._invalidate_user(user_id=user_id)
+
+    async def delete_user(self, user_id):
+        """Удаление пользователя"""
+        try:
+            return await self.run(self.sync.delete_user, user_id)
+        finally:
+            self._invalidate_user(user_id=user_id)
+
+    async def get_channel(self, channel_type):
+        """Получение ID канала по типу (из памяти, без запроса к базе)"""
+        return self.channels.get(channel_type)
+
+    async def set_channel(self, channel_type, channel_id):
+        """Установка или обновление канала определенного типа"""
+        saved = await self.run(self.sync.set_channel, channel_type, channel_id)
+        if saved:
+            # Новый словарь вместо изменения на месте: читатели всегда видят целый реестр
+            self.channels = {**self.channels, channel_type: channel_id}
+        return saved
+
+    def add_invalidation_listener(self, name, callback):
+        """Вызов await callback(key), когда другой процесс изменил данные name"""
+        self._listeners.setdefault(name, []).append(callback)
+
+    def start_cache_sync(self, prune=False):
+        """Запуск отслеживания изменений, сделанных другими процессами
+
+        prune: этот процесс удаляет устаревшие записи об изменениях (достаточно одного процесса)
+        """
+        self._last_invalidation = self.sync.get_last_invalidation_id()
+        self._sync_task = asyncio.create_task(self._sync_caches(prune))
+
+    async def stop_cache_sync(self):
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            await asyncio.gather(self._sync_task, return_exceptions=True)
+            self._sync_task = None
+
+    async def _sync_caches(self, prune):
+        pid = os.getpid()
+        last_prune = time.monotonic()
+        while True:
+            await asyncio.sleep(CACHE_SYNC_INTERVAL)
+            try:
+                for row_id, origin, name, key in await self.run(self.sync.get_invalidations, self._last_invalidation):
+                    self._last_invalidation = row_id
+                    if origin != pid:
+                        await self._apply_invalidation(name, key)
+                if prune and time.monotonic() - last_prune >= 60:
+                    last_prune = time.monotonic()
+                    await self.run(self.sync.prune_invalidations)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Cache sync error: {e}")
+
+    async def _apply_invalidation(self, name, key):
+        """Сброс кэшей после изменения в другом процессе"""
+        if name == "user":
+            self._invalidate_user(user_id=int(key))
+        elif name == "telegram":
+            self._invalidate_user(telegram_id=int(key))
+        elif name == "channels":
+            self.channels = await self.run(self.sync.get_all_channels)
+        elif name == "custom_buttons":
+            self.sync._bump_custom_buttons_version()
+        for callback in self._listeners.get(name, []):
+            await callback(key)
+
+    def close(self):
+        """Закрытие соединений с базой данных"""
+        logger.info(f"User cache stats: {self.user_cache.stats()}")
+        self._executor.shutdown(wait=True)
+        self.sync.close()
 
 # Создаем глобальный экземпляр базы данных для использования во всем приложении
-db = Database()
\ No newline at end of file
+db = AsyncDatabase(Database())
\ No newline at end of file
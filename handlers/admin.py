@@ -2,11 +2,19 @@ from aiogram import Router, F, Bot, Dispatcher
 from aiogram.types import Message, CallbackQuery, ReplyKeyboardMarkup, KeyboardButton
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
-from config import get_welcome_message, update_welcome_message
+from config import ADMIN_IDS
 from models import BroadcastByIdStates, ChannelStates, CustomButtonStates
 from database import db
 from models import AddUserStates, EditUserStates, DeleteUserStates, BroadcastStates, WelcomeMessageStates
 from utils.url_validator import validate_and_fix_url, is_valid_url, get_url_display_name
+from utils.broadcast import build_broadcast_payload
+from utils.broadcast_queue import broadcast_queue
+from utils.welcome import welcome_message
+from utils.fsm_storage import fsm_storage
+from utils.scheduler import chat_scheduler
+from utils.replies import ReplyComposer
+from utils.outbound import outbound_calls, outbound_scheduler
+from utils.bot_session import bot_api_latency, bot_api_retries
 
 from utils.keyboards import (
     get_admin_keyboard, 
@@ -16,12 +24,13 @@ from utils.keyboards import (
     get_main_keyboard,
     get_start_keyboard,
     get_button_management_keyboard,
-    get_button_edit_keyboard
+    get_button_edit_keyboard,
+    get_users_page_keyboard
 )
 from utils.helpers import (
     check_admin,
     cancel_state,
-    format_user_list,
+    iter_user_list_parts,
     send_error_message,
     send_success_message
 )
@@ -55,7 +64,7 @@ async def cmd_set_links_channel(message: Message, state: FSMContext, bot: Bot):
         return
 
     # Получаем свежий ID канала из базы данных
-    current_channel_id = db.get_channel("links")
+    current_channel_id = await db.get_channel("links")
     if current_channel_id:
         current_status = await get_channel_info(bot, current_channel_id)
     else:
@@ -77,7 +86,7 @@ async def cmd_set_messages_channel(message: Message, state: FSMContext, bot: Bot
         return
 
     # Получаем свежий ID канала из базы данных
-    current_channel_id = db.get_channel("messages")
+    current_channel_id = await db.get_channel("messages")
     if current_channel_id:
         current_status = await get_channel_info(bot, current_channel_id)
     else:
@@ -105,6 +114,7 @@ async def process_channel_id(message: Message, state: FSMContext, bot: Bot):
 
     logger.info(f"Attempting to set channel {channel_type} to {channel_id}")
 
+    reply = ReplyComposer(message)
     try:
         # Пытаемся отправить тестовое сообщение в канал
         test_message = await bot.send_message(
@@ -115,30 +125,25 @@ async def process_channel_id(message: Message, state: FSMContext, bot: Bot):
         await test_message.delete()
 
         # Сохраняем ID канала в базе данных
-        save_result = db.set_channel(channel_type, channel_id)
+        save_result = await db.set_channel(channel_type, channel_id)
         logger.info(f"Channel save result: {save_result}")
         
         if save_result:
             # Проверяем, что канал действительно сохранился
-            saved_channel = db.get_channel(channel_type)
+            saved_channel = await db.get_channel(channel_type)
             logger.info(f"Saved channel ID: {saved_channel}")
             
             channel_type_text = "ссылок" if channel_type == "links" else "сообщений"
-            await send_success_message(
-                message,
+            reply.success(
                 f"Канал для {channel_type_text} успешно установлен!\n"
                 f"Новый ID: {channel_id}"
             )
         else:
-            await send_error_message(
-                message,
-                "Не удалось сохранить настройки канала"
-            )
+            reply.error("Не удалось сохранить настройки канала")
 
     except Exception as e:
         logger.error(f"Error setting channel: {e}")
-        await send_error_message(
-            message,
+        reply.error(
             "Не удалось установить канал. Убедитесь, что:\n"
             "1. ID канала указан верно\n"
             "2. Бот добавлен в канал\n"
@@ -146,35 +151,121 @@ async def process_channel_id(message: Message, state: FSMContext, bot: Bot):
             f"Ошибка: {str(e)}"
         )
 
-    await message.answer("Выберите действие:", reply_markup=get_admin_keyboard())
+    # Результат и клавиатура уходят одним сообщением
+    reply.add("Выберите действие:", reply_markup=get_admin_keyboard())
+    await reply.send()
     await state.clear()
 
-def get_display_name(user_data, username):
-    """Безопасное получение отображаемого имени пользователя"""
-    # Безопасная распаковка данных
-    user_id = user_data[0]
-    username = user_data[1]
-    telegram_id = user_data[2] if len(user_data) > 2 else None
-    link = user_data[3] if len(user_data) > 3 else None
-    full_name = user_data[4] if len(user_data) > 4 else None
+# =============================================================================
+# ПОСТРАНИЧНЫЙ СПИСОК ПОЛЬЗОВАТЕЛЕЙ
+# =============================================================================
+
+# Размер страницы: полный список (с паролями и ссылками) и короткий список для выбора ID
+USERS_PAGE_SIZE = 8
+USERS_PICK_PAGE_SIZE = 20
+MAX_LINK_LENGTH = 250
+# Лимит Telegram на длину сообщения
+MESSAGE_LIMIT = 4096
+
+# Подсказки для коротких списков: вид списка -> текст
+USER_PAGE_PROMPTS = {
+    "message": "Введите ID пользователя, которому хотите отправить сообщение:",
+    "edit": "Введите ID пользователя для изменения:",
+    "delete": "Введите ID пользователя для удаления:",
+}
+
+def format_user_pick_entry(user_data, show_telegram_id=False) -> str:
+    """Короткая строка пользователя для выбора по ID"""
+    user_id, username, password, telegram_id, link, full_name = user_data
     
     # Формируем отображение имени ТОЛЬКО если есть full_name и оно не пустое
     if full_name and full_name.strip():
-        return f"{full_name} (@{username})"
+        display_name = f"{full_name} (@{username})"
     else:
-        return username
+        display_name = username
+    
+    user_line = f"👤 ID: {user_id} | {display_name}"
+    if telegram_id and show_telegram_id:
+        user_line += f" | ✅ Авторизован (TG ID: {telegram_id})"
+    elif telegram_id:
+        user_line += " | ✅ Авторизован"
+    else:
+        user_line += " | ❌ Не авторизован"
+    return user_line + "\n"
 
-def get_display_name_from_user_info(user_info, username):
-    """Безопасное получение отображаемого имени из данных пользователя по ID"""
-    # user_info может быть (username, telegram_id, link) или (username, telegram_id, link, full_name)
-    if len(user_info) >= 4:  # Есть поле full_name
-        full_name = user_info[3]
-        if full_name and full_name.strip():
-            return f"{full_name} (@{username})"
-    
-    return username
+async def render_users_page(view, after_id=None, before_id=None):
+    """Текст и клавиатура одной страницы списка пользователей ((None, None) - страница пуста)"""
+    page_size = USERS_PAGE_SIZE if view == "list" else USERS_PICK_PAGE_SIZE
+    
+    # Запрашиваем на одну строку больше, чтобы узнать, есть ли страница дальше
+    rows = await db.get_users_page(after_id=after_id, before_id=before_id, limit=page_size + 1)
+    if before_id is not None:
+        has_prev = len(rows) > page_size
+        has_next = True
+        rows = rows[-page_size:]
+    else:
+        has_prev = after_id is not None
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+    
+    if not rows:
+        return None, None
+    
+    first_id, last_id = rows[0][0], rows[-1][0]
+    if view == "list":
+        # Страница заканчивается на последней записи, которая целиком помещается в сообщение:
+        # остальные покажет следующая страница (заголовок с последним id строки - не короче итогового)
+        header_length = len(f"📊 Список пользователей (ID {first_id}–{last_id}):\n\n")
+        body, shown = next(iter_user_list_parts(rows, MESSAGE_LIMIT - header_length, MAX_LINK_LENGTH))
+        if len(shown) < len(rows):
+            last_id = shown[-1][0]
+            has_next = True
+        text = f"📊 Список пользователей (ID {first_id}–{last_id}):\n\n" + body
+    else:
+        text = "📋 Список пользователей:\n\n"
+        text += "".join(format_user_pick_entry(user_data, show_telegram_id=(view == "message")) for user_data in rows)
+    
+    # Страховка от лимита Telegram: одна запись длиннее сообщения
+    return text[:MESSAGE_LIMIT], get_users_page_keyboard(view, first_id, last_id, has_prev, has_next)
+
+async def send_users_page(message: Message, view) -> bool:
+    """Отправка первой страницы списка пользователей"""
+    text, keyboard = await render_users_page(view)
+    if text is None:
+        await send_error_message(message, "Список пользователей пуст.", reply_markup=get_admin_keyboard())
+        return False
+    
+    await message.answer(text, reply_markup=keyboard)
+    return True
 
-# Обновленная функция для отображения списка пользователей с именами
+@router.callback_query(F.data.startswith("users:"))
+async def callback_users_page(callback: CallbackQuery):
+    """Перелистывание списка пользователей: сообщение редактируется на месте"""
+    if callback.from_user.id not in ADMIN_IDS:
+        await callback.answer("❌ У вас нет доступа к этой команде.", show_alert=True)
+        return
+    
+    try:
+        _, view, direction, key = callback.data.split(":")
+        key = int(key)
+    except ValueError:
+        await callback.answer()
+        return
+    
+    if direction == "prev":
+        text, keyboard = await render_users_page(view, before_id=key)
+    else:
+        text, keyboard = await render_users_page(view, after_id=key)
+    
+    if text is None:
+        await callback.answer("Больше пользователей нет")
+        return
+    
+    try:
+        await callback.message.edit_text(text, reply_markup=keyboard)
+    except Exception as e:
+        logger.error(f"Failed to edit users page: {e}")
+    await callback.answer()
 
 @router.message(F.text == "📩 Сообщение")
 @router.message(Command("broadcast_by_id"))
@@ -183,38 +274,11 @@ async def cmd_broadcast_by_id(message: Message, state: FSMContext):
     if not await check_admin(message):
         return
     
-    # Получаем список всех пользователей
-    users = db.get_all_users()
-    if not users:
-        await send_error_message(message, "Список пользователей пуст.", reply_markup=get_admin_keyboard())
+    # Показываем первую страницу пользователей с их ID и именами
+    if not await send_users_page(message, "message"):
         return
     
-    # Формируем список пользователей с их ID и именами
-    user_list = "📋 Список пользователей:\n\n"
-    for user_data in users:
-        # Безопасная распаковка данных
-        user_id = user_data[0]
-        username = user_data[1]
-        telegram_id = user_data[2] if len(user_data) > 2 else None
-        link = user_data[3] if len(user_data) > 3 else None
-        full_name = user_data[4] if len(user_data) > 4 else None
-        
-        # Формируем отображение имени ТОЛЬКО если есть full_name и оно не пустое
-        if full_name and full_name.strip():
-            display_name = f"{full_name} (@{username})"
-        else:
-            display_name = username
-        
-        user_list += f"👤 ID: {user_id} | {display_name}"
-        if telegram_id:
-            user_list += f" | ✅ Авторизован (TG ID: {telegram_id})"
-        else:
-            user_list += " | ❌ Не авторизован"
-        user_list += "\n"
-    
-    user_list += "\nВведите ID пользователя, которому хотите отправить сообщение:"
-    
-    await message.answer(user_list, reply_markup=get_cancel_keyboard())
+    await message.answer(USER_PAGE_PROMPTS["message"], reply_markup=get_cancel_keyboard())
     await state.set_state(BroadcastByIdStates.waiting_for_user_id)
 
 
@@ -235,7 +299,7 @@ async def process_user_id_for_broadcast(message: Message, state: FSMContext):
         return
     
     # Проверяем существование пользователя с указанным ID
-    user = db.get_user_by_id(user_id)
+    user = await db.get_user_by_id(user_id)
     if not user:
         await send_error_message(
             message, 
@@ -312,37 +376,11 @@ async def cmd_edit_user(message: Message, state: FSMContext):
     if not await check_admin(message):
         return
     
-    users = db.get_all_users()
-    if not users:
-        await send_error_message(message, "Список пользователей пуст.", reply_markup=get_admin_keyboard())
+    # Показываем первую страницу пользователей с именами
+    if not await send_users_page(message, "edit"):
         return
     
-    # Формируем список пользователей с именами
-    user_list = "📋 Список пользователей:\n\n"
-    for user_data in users:
-        # Безопасная распаковка данных
-        user_id = user_data[0]
-        username = user_data[1]
-        telegram_id = user_data[2] if len(user_data) > 2 else None
-        link = user_data[3] if len(user_data) > 3 else None
-        full_name = user_data[4] if len(user_data) > 4 else None
-        
-        # Формируем отображение имени ТОЛЬКО если есть full_name и оно не пустое
-        if full_name and full_name.strip():
-            display_name = f"{full_name} (@{username})"
-        else:
-            display_name = username
-        
-        user_list += f"👤 ID: {user_id} | {display_name}"
-        if telegram_id:
-            user_list += " | ✅ Авторизован"
-        else:
-            user_list += " | ❌ Не авторизован"
-        user_list += "\n"
-    
-    user_list += "\nВведите ID пользователя для изменения:"
-    
-    await message.answer(user_list, reply_markup=get_cancel_keyboard())
+    await message.answer(USER_PAGE_PROMPTS["edit"], reply_markup=get_cancel_keyboard())
     await state.set_state(EditUserStates.waiting_for_user_id)
 
 @router.message(EditUserStates.waiting_for_user_id)
@@ -362,7 +400,7 @@ async def process_edit_user_id(message: Message, state: FSMContext):
         return
     
     # Проверяем существование пользователя
-    user = db.get_user_by_id(user_id)
+    user = await db.get_user_by_id(user_id)
     if not user:
         await send_error_message(
             message, 
@@ -434,7 +472,7 @@ async def process_new_username_edit(message: Message, state: FSMContext):
     user_id = user_data.get('user_id')
     
     # Проверяем, не занят ли новый логин
-    existing_user = db.get_user_by_username(new_username)
+    existing_user = await db.get_user_by_username(new_username)
     if existing_user and existing_user[0] != user_id:  # existing_user[0] - это ID
         await send_error_message(
             message, 
@@ -445,7 +483,7 @@ async def process_new_username_edit(message: Message, state: FSMContext):
         return
     
     # Обновляем логин
-    if db.update_username(user_id, new_username):
+    if await db.update_username(user_id, new_username):
         await send_success_message(
             message, 
             f"Логин пользователя (ID: {user_id}) успешно изменен на '{new_username}'",
@@ -471,7 +509,7 @@ async def process_new_password_edit(message: Message, state: FSMContext):
     user_id = user_data.get('user_id')
     
     # Обновляем пароль
-    if db.update_password(user_id, new_password):
+    if await db.update_password(user_id, new_password):
         await send_success_message(
             message, 
             f"Пароль пользователя (ID: {user_id}) успешно изменен на '{new_password}'",
@@ -493,37 +531,11 @@ async def cmd_delete_user(message: Message, state: FSMContext):
     if not await check_admin(message):
         return
     
-    users = db.get_all_users()
-    if not users:
-        await send_error_message(message, "Список пользователей пуст.", reply_markup=get_admin_keyboard())
+    # Показываем первую страницу пользователей с именами
+    if not await send_users_page(message, "delete"):
         return
     
-    # Формируем список пользователей с именами
-    user_list = "📋 Список пользователей:\n\n"
-    for user_data in users:
-        # Безопасная распаковка данных
-        user_id = user_data[0]
-        username = user_data[1]
-        telegram_id = user_data[2] if len(user_data) > 2 else None
-        link = user_data[3] if len(user_data) > 3 else None
-        full_name = user_data[4] if len(user_data) > 4 else None
-        
-        # Формируем отображение имени ТОЛЬКО если есть full_name и оно не пустое
-        if full_name and full_name.strip():
-            display_name = f"{full_name} (@{username})"
-        else:
-            display_name = username
-        
-        user_list += f"👤 ID: {user_id} | {display_name}"
-        if telegram_id:
-            user_list += " | ✅ Авторизован"
-        else:
-            user_list += " | ❌ Не авторизован"
-        user_list += "\n"
-    
-    user_list += "\nВведите ID пользователя для удаления:"
-    
-    await message.answer(user_list, reply_markup=get_cancel_keyboard())
+    await message.answer(USER_PAGE_PROMPTS["delete"], reply_markup=get_cancel_keyboard())
     await state.set_state(DeleteUserStates.waiting_for_user_id)
 
 @router.message(DeleteUserStates.waiting_for_user_id)
@@ -543,7 +555,7 @@ async def process_delete_user_id(message: Message, state: FSMContext):
         return
     
     # Проверяем существование пользователя
-    user = db.get_user_by_id(user_id)
+    user = await db.get_user_by_id(user_id)
     if not user:
         await send_error_message(
             message, 
@@ -566,7 +578,7 @@ async def process_delete_user_id(message: Message, state: FSMContext):
         display_name = username
     
     # Удаляем пользователя
-    if db.delete_user(user_id):
+    if await db.delete_user(user_id):
         await send_success_message(
             message, 
             f"Пользователь '{display_name}' (ID: {user_id}) успешно удален",
@@ -598,359 +610,96 @@ async def cmd_broadcast(message: Message, state: FSMContext):
     await state.set_state(BroadcastStates.waiting_for_content)
 
 @router.message(BroadcastStates.waiting_for_content)
-async def process_broadcast_content(message: Message, state: FSMContext, bot: Bot):
+async def process_broadcast_content(message: Message, state: FSMContext):
     """Обработка любого контента для массовой рассылки"""
     if await cancel_state(message, state):
         return
     
-    users = db.get_all_users()
-    sent_count = 0
-    failed_count = 0
-    
-    logger.info(f"Starting broadcast. Total users: {len(users)}")
-    progress_msg = await message.answer("⏳ Начинаю рассылку...")
+    # Готовим содержимое рассылки один раз для всех получателей
+    payload = build_broadcast_payload(message)
+    if payload is None:
+        await send_error_message(
+            message,
+            "Этот тип сообщений не поддерживается для рассылки.",
+            reply_markup=get_admin_keyboard()
+        )
+        await state.clear()
+        return
     
-    # Отладочная информация
-    await message.answer(f"🔍 Найдено пользователей: {len(users)}")
+    # Сохраняем рассылку в базу: её выполнит фоновый воркер, даже если бот перезапустится
+    await state.clear()
     
-    for user_data in users:
-        try:
-            # Безопасная распаковка данных пользователей
-            user_id = user_data[0]
-            username = user_data[1]
-            telegram_id = user_data[2] if len(user_data) > 2 else None
-            
-            logger.info(f"Processing user: {username}, TG ID: {telegram_id}")
-            
-            # Пропускаем пользователей без telegram_id и отправителя
-            if not telegram_id:
-                logger.info(f"Skipping user {username} - no telegram_id")
-                continue
-                
-            if telegram_id == message.from_user.id:
-                logger.info(f"Skipping sender {username}")
-                continue
-            
-            # Попытка отправки сообщения
-            success = False
-            
-            # Текстовое сообщение
-            if message.text and not message.media_group_id:
-                text = message.text.strip()
-                formatted_message = f"<b>Сообщение от PARTNERS 🔗:</b>\n\n{text}"
-                await bot.send_message(
-                    telegram_id,
-                    formatted_message,
-                    parse_mode="HTML"
-                )
-                success = True
-            
-            # Фото
-            elif message.photo:
-                photo = message.photo[-1]
-                caption = message.caption or ""
-                formatted_caption = f"<b>Сообщение от PARTNERS 🔗:</b>\n\n{caption}" if caption else "<b>Сообщение от PARTNERS 🔗</b>"
-                
-                await bot.send_photo(
-                    telegram_id,
-                    photo=photo.file_id,
-                    caption=formatted_caption,
-                    parse_mode="HTML"
-                )
-                success = True
-            
-            # Видео
-            elif message.video:
-                caption = message.caption or ""
-                formatted_caption = f"<b>Сообщение от PARTNERS 🔗:</b>\n\n{caption}" if caption else "<b>Сообщение от PARTNERS 🔗</b>"
-                
-                await bot.send_video(
-                    telegram_id,
-                    video=message.video.file_id,
-                    caption=formatted_caption,
-                    parse_mode="HTML"
-                )
-                success = True
-            
-            # Аудио
-            elif message.audio:
-                caption = message.caption or ""
-                formatted_caption = f"<b>Сообщение от PARTNERS 🔗:</b>\n\n{caption}" if caption else "<b>Сообщение от PARTNERS 🔗</b>"
-                
-                await bot.send_audio(
-                    telegram_id,
-                    audio=message.audio.file_id,
-                    caption=formatted_caption,
-                    parse_mode="HTML"
-                )
-                success = True
-            
-            # Документ
-            elif message.document:
-                caption = message.caption or ""
-                formatted_caption = f"<b>Сообщение от PARTNERS 🔗:</b>\n\n{caption}" if caption else "<b>Сообщение от PARTNERS 🔗</b>"
-                
-                await bot.send_document(
-                    telegram_id,
-                    document=message.document.file_id,
-                    caption=formatted_caption,
-                    parse_mode="HTML"
-                )
-                success = True
-            
-            # Голосовое сообщение
-            elif message.voice:
-                await bot.send_message(
-                    telegram_id,
-                    "<b>Сообщение от PARTNERS 🔗</b>",
-                    parse_mode="HTML"
-                )
-                await bot.send_voice(
-                    telegram_id,
-                    voice=message.voice.file_id
-                )
-                success = True
-            
-            # Стикер
-            elif message.sticker:
-                await bot.send_message(
-                    telegram_id,
-                    "<b>Сообщение от PARTNERS 🔗</b>",
-                    parse_mode="HTML"
-                )
-                await bot.send_sticker(
-                    telegram_id,
-                    sticker=message.sticker.file_id
-                )
-                success = True
-            
-            # Анимация (GIF)
-            elif message.animation:
-                caption = message.caption or ""
-                formatted_caption = f"<b>Сообщение от PARTNERS 🔗:</b>\n\n{caption}" if caption else "<b>Сообщение от PARTNERS 🔗</b>"
-                
-                await bot.send_animation(
-                    telegram_id,
-                    animation=message.animation.file_id,
-                    caption=formatted_caption,
-                    parse_mode="HTML"
-                )
-                success = True
-            
-            # Видеосообщение
-            elif message.video_note:
-                await bot.send_message(
-                    telegram_id,
-                    "<b>Сообщение от PARTNERS 🔗</b>",
-                    parse_mode="HTML"
-                )
-                await bot.send_video_note(
-                    telegram_id,
-                    video_note=message.video_note.file_id
-                )
-                success = True
-            
-            if success:
-                sent_count += 1
-                logger.info(f"Message sent successfully to user {username} (TG ID: {telegram_id})")
-            else:
-                failed_count += 1
-                logger.warning(f"Unknown message type for user {username}")
-            
-            # Обновляем прогресс каждые 5 отправлений
-            if (sent_count + failed_count) % 5 == 0:
-                try:
-                    await progress_msg.edit_text(f"⏳ Обработано: {sent_count + failed_count}/{len(users)} пользователей\n✅ Отправлено: {sent_count}")
-                except:
-                    pass
-            
-            # Добавляем задержку между отправками
-            await asyncio.sleep(0.3)
-            
-        except Exception as e:
-            failed_count += 1
-            logger.error(f"Failed to send message to user {username if 'username' in locals() else 'unknown'}: {e}")
-            import traceback
-            traceback.print_exc()
+    job_id = await broadcast_queue.enqueue(message.from_user.id, payload)
+    if job_id is None:
+        await send_error_message(message, "Не удалось создать рассылку.", reply_markup=get_admin_keyboard())
+        return
     
-    # Удаляем сообщение о прогрессе
-    try:
-        await progress_msg.delete()
-    except:
-        pass
-    
-    # Подсчитываем количество авторизованных пользователей
-    authorized_users = sum(1 for user_data in users if len(user_data) > 2 and user_data[2] is not None and user_data[2] != message.from_user.id)
-    
-    result_message = (
-        f"📊 Рассылка завершена!\n\n"
-        f"👥 Всего пользователей: {len(users)}\n"
-        f"🔐 Авторизованных: {authorized_users}\n"
-        f"✅ Отправлено: {sent_count}\n"
-        f"❌ Не доставлено: {failed_count}"
+    logger.info(f"Broadcast job #{job_id} queued by {message.from_user.id}")
+    await message.answer(
+        f"⏳ Рассылка #{job_id} поставлена в очередь. Отчет придет по завершении.",
+        reply_markup=get_admin_keyboard()
     )
-    
-    logger.info(f"Broadcast completed. Sent: {sent_count}, Failed: {failed_count}")
-    
-    await send_success_message(message, result_message)
-    await message.answer("Выберите действие:", reply_markup=get_admin_keyboard())
-    await state.clear()
-
-async def check_admin_and_get_users(message: Message) -> list:
-    """Проверка админа и получение списка пользователей"""
-    if not await check_admin(message):
-        return None
-        
-    users = db.get_all_users()
-    if not users:
-        await send_error_message(message, "Список пользователей пуст.", reply_markup=get_admin_keyboard())
-        return None
-    return users
 
 @router.message(F.text == "👥 Пользователи")
 @router.message(Command("admin"))
 async def cmd_admin(message: Message):
-    """Обработчик команды /admin с разбивкой на части"""
+    """Обработчик команды /admin: постраничный список пользователей"""
     if not await check_admin(message):
         return
     
-    users = db.get_all_users()
-    if not users:
-        await send_error_message(message, "Список пользователей пуст.")
-        await message.answer("Функции администрирования:", reply_markup=get_admin_keyboard())
+    # Первая страница; следующие подгружаются кнопками с редактированием сообщения
+    if not await send_users_page(message, "list"):
         return
     
-    # Разбиваем список пользователей на части
-    await send_user_list_in_parts(message, users)
-    
     await message.answer(
         "Функции администрирования:",
         reply_markup=get_admin_keyboard()
     )
 
-async def send_user_list_in_parts(message: Message, users: list):
-    """Отправка списка пользователей частями с улучшенной обработкой"""
-    if not users:
-        await message.answer("Список пользователей пуст.")
-        return
-    
-    # Константы для разбивки (оставляем больше запаса)
-    MAX_MESSAGE_LENGTH = 3800  # Запас от лимита в 4096 символов
-    
-    # Заголовок
-    header = f"📊 Список всех пользователей (всего: {len(users)}):\n\n"
-    
-    # Формируем данные для каждого пользователя
-    user_entries = []
-    for user_data in users:
-        try:
-            # Безопасная распаковка данных
-            user_id = user_data[0]
-            username = user_data[1]
-            telegram_id = user_data[2] if len(user_data) > 2 else None
-            link = user_data[3] if len(user_data) > 3 else None
-            full_name = user_data[4] if len(user_data) > 4 else None
-            
-            # Получаем пароль из базы данных
-            try:
-                user_db_data = db.get_user_by_username(username)
-                password = user_db_data[1] if user_db_data else "❌ Ошибка"
-            except Exception as e:
-                logger.error(f"Error getting user password for {username}: {e}")
-                password = "❌ Ошибка"
-            
-            # Формируем отображение имени
-            if full_name and full_name.strip():
-                display_name = f"{full_name} (@{username})"
-            else:
-                display_name = username
-            
-            # Формируем текст для одного пользователя
-            user_text = f"🆔 ID: {user_id}\n"
-            user_text += f"👤 Имя: {display_name}\n"
-            user_text += f"📝 Логин: {username}\n"
-            user_text += f"🔐 Пароль: {password}\n"
-            
-            if telegram_id:
-                user_text += f"✅ Авторизован (TG: {telegram_id})\n"
-            else:
-                user_text += f"❌ Не авторизован\n"
-            
-            # Показываем ссылки полностью
-            if link:
-                user_text += f"🔗 Информация: {link}\n"
-            else:
-                user_text += f"🔗 Информация: —\n"
-            
-            user_text += "─" * 30 + "\n\n"
-            
-            user_entries.append(user_text)
-            
-        except Exception as e:
-            logger.error(f"Error processing user data: {e}")
-            # Добавляем базовую информацию даже при ошибке
-            user_entries.append(f"❌ Ошибка обработки пользователя ID: {user_data[0] if user_data else 'Unknown'}\n\n")
-    
-    # Разбиваем на части
-    parts = []
-    current_part = ""
-    
-    for i, user_entry in enumerate(user_entries):
-        # Для первой части учитываем длину заголовка
-        if not current_part:
-            test_length = len(header) + len(current_part) + len(user_entry)
-        else:
-            test_length = len(current_part) + len(user_entry)
-        
-        if test_length > MAX_MESSAGE_LENGTH and current_part:
-            # Если не помещается и есть текущая часть, сохраняем её
-            parts.append(current_part.rstrip())
-            current_part = user_entry
-        else:
-            # Если помещается, добавляем к текущей части
-            current_part += user_entry
-    
-    # Добавляем последнюю часть
-    if current_part:
-        parts.append(current_part.rstrip())
-    
-    # Отправляем части
-    for i, part in enumerate(parts):
-        try:
-            if i == 0:
-                # Первая часть с заголовком
-                full_message = header + part
-            else:
-                # Остальные части с номером
-                full_message = f"📊 Список пользователей (часть {i + 1}):\n\n{part}"
-            
-            await message.answer(full_message)
-            
-            # Небольшая задержка между сообщениями
-            await asyncio.sleep(0.2)
-            
-        except Exception as e:
-            logger.error(f"Error sending user list part {i + 1}: {e}")
-            await message.answer(f"❌ Ошибка при отправке части {i + 1} списка пользователей")
+@router.message(Command("stats"))
+async def cmd_stats(message: Message):
+    """Обработчик команды /stats - внутренняя статистика работы бота"""
+    if not await check_admin(message):
+        return
     
-    # Добавляем итоговую информацию
-    try:
-        summary = f"📈 Статистика:\n"
-        summary += f"👥 Всего пользователей: {len(users)}\n"
-        
-        # Подсчитываем авторизованных пользователей
-        authorized_count = sum(1 for user_data in users if len(user_data) > 2 and user_data[2] is not None)
-        summary += f"✅ Авторизованных: {authorized_count}\n"
-        summary += f"❌ Не авторизованных: {len(users) - authorized_count}\n"
-        
-        if len(parts) > 1:
-            summary += f"📄 Частей сообщений: {len(parts)}"
-        
-        await message.answer(summary)
-        
-    except Exception as e:
-        logger.error(f"Error sending user list summary: {e}")
-        await message.answer(f"📊 Всего пользователей: {len(users)}")
+    user_cache = db.user_cache.stats()
+    fsm = await fsm_storage.stats()
+    updates = chat_scheduler.stats()
+    calls = outbound_calls.stats()
+    stats_text = (
+        f"📈 Статистика бота:\n\n"
+        f"👤 Кэш пользователей: {user_cache['size']}/{user_cache['maxsize']}\n"
+        f"✅ Попаданий: {user_cache['hits']}\n"
+        f"❌ Промахов: {user_cache['misses']}\n"
+        f"🎯 Доля попаданий: {user_cache['hit_ratio']:.1%}\n\n"
+        f"🧩 Активных состояний FSM: {fsm['live']}\n"
+        f"🗑 Удалено по истечении времени: {fsm['evicted']}\n\n"
+        f"⚙️ Апдейтов в обработке: {updates['running']}/{updates['concurrency']}\n"
+        f"⏳ В очереди: {updates['waiting']} (максимум {updates['max_waiting']}), "
+        f"чатов: {updates['chats']}\n"
+        f"🚫 Отброшено: {updates['dropped']}\n\n"
+        f"📤 Запросов к API на апдейт: {calls['calls_per_update']:.2f} (максимум {calls['max_calls']})\n"
+        f"📨 Фоновых запросов: {calls['background_calls']}\n"
+        f"🔁 Повторов запросов: {bot_api_retries.retried}"
+    )
+    # Задержки Bot API по самым частым методам
+    latency = sorted(bot_api_latency.stats().items(), key=lambda item: item[1]["count"], reverse=True)
+    if latency:
+        stats_text += "\n\n⏱ Задержки Bot API (среднее / p95 / макс, мс):"
+        for method, values in latency[:8]:
+            stats_text += (
+                f"\n{method}: {values['avg_ms']:.0f} / {values['p95_ms']:.0f} / {values['max_ms']:.0f} "
+                f"({values['count']} запросов, ошибок: {values['errors']})"
+            )
+    # Ожидание очереди отправки по полосам
+    stats_text += "\n\n🚦 Очередь отправки (ожидание: среднее / p95 / макс, мс):"
+    for lane, values in outbound_scheduler.stats().items():
+        stats_text += (
+            f"\n{lane}: {values['avg_wait_ms']:.0f} / {values['p95_wait_ms']:.0f} / {values['max_wait_ms']:.0f} "
+            f"(в очереди {values['queued']}, ждали {values['waited']} из {values['granted']})"
+        )
+    
+    await message.answer(stats_text, reply_markup=get_admin_keyboard())
 
 @router.message(F.text == "🏪 Добавить")
 @router.message(Command("adduser"))
@@ -969,7 +718,7 @@ async def process_new_username(message: Message, state: FSMContext):
         return
     
     username = message.text.strip()
-    if db.get_user_by_username(username):
+    if await db.get_user_by_username(username):
         await send_error_message(message, f"Пользователь с логином '{username}' уже существует. Попробуйте другой логин.")
         return
     
@@ -987,12 +736,11 @@ async def process_new_password(message: Message, state: FSMContext):
     user_data = await state.get_data()
     username = user_data.get('username')
     
-    if db.add_user(username, password):
-        await send_success_message(
-            message,
-            f"Пользователь '{username}' успешно создан!\n\nЛогин: {username}\nПароль: {password}"
-        )
-        await message.answer("Выберите действие:", reply_markup=get_admin_keyboard())
+    if await db.add_user(username, password):
+        reply = ReplyComposer(message)
+        reply.success(f"Пользователь '{username}' успешно создан!\n\nЛогин: {username}\nПароль: {password}")
+        reply.add("Выберите действие:", reply_markup=get_admin_keyboard())
+        await reply.send()
     else:
         await send_error_message(
             message, 
@@ -1011,7 +759,7 @@ async def cmd_edit_welcome(message: Message, state: FSMContext):
     
     # Показываем текущее сообщение и инструкции
     await message.answer(
-        f"Текущее приветственное сообщение:\n\n{get_welcome_message()}\n\n"
+        f"Текущее приветственное сообщение:\n\n{welcome_message.text}\n\n"
         f"Введите новый текст приветственного сообщения. Можно использовать HTML-разметку:\n"
         f"• Гиперссылка: <a href='https://example.com'>текст</a>\n"
         f"• Жирный текст: <b>текст</b>\n"
@@ -1035,6 +783,7 @@ async def process_welcome_message(message: Message, state: FSMContext):
         return
     
     # Обновляем приветственное сообщение
+    reply = ReplyComposer(message)
     try:
         # Проверяем, что сообщение корректно отображается с HTML
         test_msg = await message.answer(
@@ -1044,24 +793,17 @@ async def process_welcome_message(message: Message, state: FSMContext):
         await test_msg.delete()
         
         # Если HTML валидный, обновляем сообщение
-        if update_welcome_message(new_welcome_message):
-            await send_success_message(message, "Приветственное сообщение успешно обновлено!")
+        if await welcome_message.update(new_welcome_message):
+            reply.success("Приветственное сообщение успешно обновлено!")
         else:
-            await send_error_message(
-                message,
-                "Не удалось обновить приветственное сообщение",
-                reply_markup=get_admin_keyboard()
-            )
+            reply.error("Не удалось обновить приветственное сообщение", reply_markup=get_admin_keyboard())
             
     except Exception as e:
         logger.error(f"Failed to validate HTML in welcome message: {e}")
-        await send_error_message(
-            message,
-            "Ошибка в HTML-разметке. Проверьте правильность тегов.",
-            reply_markup=get_admin_keyboard()
-        )
+        reply.error("Ошибка в HTML-разметке. Проверьте правильность тегов.", reply_markup=get_admin_keyboard())
     
-    await message.answer("Выберите действие:", reply_markup=get_admin_keyboard())
+    reply.add("Выберите действие:", reply_markup=get_admin_keyboard())
+    await reply.send()
     await state.clear()
 
 def setup(dp: Dispatcher):
@@ -1159,7 +901,7 @@ async def process_button_url(message: Message, state: FSMContext):
         )
     
     # Сохраняем кнопку в базу данных
-    if db.add_custom_button(button_name, fixed_url):
+    if await db.add_custom_button(button_name, fixed_url):
         await send_success_message(
             message,
             f"✅ Кнопка успешно создана!\n\n"
@@ -1178,7 +920,7 @@ async def cmd_list_buttons(message: Message):
     if not await check_admin(message):
         return
     
-    buttons = db.get_custom_buttons(active_only=False)
+    buttons = await db.get_custom_buttons(active_only=False)
     
     if not buttons:
         await message.answer("📋 Кастомных кнопок пока нет.")
@@ -1203,7 +945,7 @@ async def cmd_edit_button(message: Message, state: FSMContext):
     if not await check_admin(message):
         return
     
-    buttons = db.get_custom_buttons(active_only=False)
+    buttons = await db.get_custom_buttons(active_only=False)
     
     if not buttons:
         await send_error_message(message, "Нет кнопок для изменения.")
@@ -1231,7 +973,7 @@ async def process_edit_button_id(message: Message, state: FSMContext):
         await send_error_message(message, "Введите корректный числовой ID кнопки.")
         return
     
-    button = db.get_custom_button_by_id(button_id)
+    button = await db.get_custom_button_by_id(button_id)
     if not button:
         await send_error_message(message, f"Кнопка с ID {button_id} не найдена.")
         await message.answer("Управление кнопками:", reply_markup=get_button_management_keyboard())
@@ -1282,7 +1024,7 @@ async def process_new_button_name(message: Message, state: FSMContext):
     user_data = await state.get_data()
     button_id = user_data.get('button_id')
     
-    if db.update_custom_button(button_id, name=new_name):
+    if await db.update_custom_button(button_id, name=new_name):
         await send_success_message(message, f"Название кнопки успешно изменено на '{new_name}'")
     else:
         await send_error_message(message, "Не удалось изменить название кнопки.")
@@ -1328,7 +1070,7 @@ async def process_new_button_url(message: Message, state: FSMContext):
             f"Исправленная: {fixed_url}"
         )
     
-    if db.update_custom_button(button_id, url=fixed_url):
+    if await db.update_custom_button(button_id, url=fixed_url):
         await send_success_message(message, f"Ссылка кнопки успешно изменена на '{fixed_url}'")
     else:
         await send_error_message(message, "Не удалось изменить ссылку кнопки.")
@@ -1342,7 +1084,7 @@ async def cmd_toggle_button(message: Message, state: FSMContext):
     if not await check_admin(message):
         return
     
-    buttons = db.get_custom_buttons(active_only=False)
+    buttons = await db.get_custom_buttons(active_only=False)
     
     if not buttons:
         await send_error_message(message, "Нет кнопок для переключения.")
@@ -1370,7 +1112,7 @@ async def process_toggle_button_id(message: Message, state: FSMContext):
         await send_error_message(message, "Введите корректный числовой ID кнопки.")
         return
     
-    button = db.get_custom_button_by_id(button_id)
+    button = await db.get_custom_button_by_id(button_id)
     if not button:
         await send_error_message(message, f"Кнопка с ID {button_id} не найдена.")
         await message.answer("Управление кнопками:", reply_markup=get_button_management_keyboard())
@@ -1379,7 +1121,7 @@ async def process_toggle_button_id(message: Message, state: FSMContext):
     
     button_id, name, url, is_active = button
     
-    if db.toggle_custom_button(button_id):
+    if await db.toggle_custom_button(button_id):
         new_status = "отключена" if is_active else "активирована"
         await send_success_message(message, f"Кнопка '{name}' успешно {new_status}!")
     else:
@@ -1395,7 +1137,7 @@ async def cmd_delete_button(message: Message, state: FSMContext):
     if not await check_admin(message):
         return
     
-    buttons = db.get_custom_buttons(active_only=False)
+    buttons = await db.get_custom_buttons(active_only=False)
     
     if not buttons:
         await send_error_message(message, "Нет кнопок для удаления.")
@@ -1422,7 +1164,7 @@ async def process_delete_button_id(message: Message, state: FSMContext):
         await send_error_message(message, "Введите корректный числовой ID кнопки.")
         return
     
-    button = db.get_custom_button_by_id(button_id)
+    button = await db.get_custom_button_by_id(button_id)
     if not button:
         await send_error_message(message, f"Кнопка с ID {button_id} не найдена.")
         await message.answer("Управление кнопками:", reply_markup=get_button_management_keyboard())
@@ -1431,7 +1173,7 @@ async def process_delete_button_id(message: Message, state: FSMContext):
     
     button_id, name, url, is_active = button
     
-    if db.delete_custom_button(button_id):
+    if await db.delete_custom_button(button_id):
         await send_success_message(message, f"Кнопка '{name}' успешно удалена!")
     else:
         await send_error_message(message, "Не удалось удалить кнопку.")
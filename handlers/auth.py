@@ -1,5 +1,5 @@
 from aiogram import Router, F, Bot, Dispatcher, types
-from aiogram.types import Message, BufferedInputFile, ReplyKeyboardRemove, FSInputFile, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.types import Message, BufferedInputFile, ReplyKeyboardRemove, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.filters import Command, CommandStart
 from aiogram.fsm.context import FSMContext
 from io import BytesIO
@@ -11,10 +11,12 @@ logger = logging.getLogger(__name__)
 from datetime import datetime
 from database import db
 from models import AuthStates, RegistrationStates
-from config import ADMIN_IDS, BOT_NAME, get_welcome_message
+from config import ADMIN_IDS, BOT_NAME
 from utils.keyboards import get_start_keyboard, get_main_keyboard, get_admin_keyboard, get_admin_inline_keyboard, get_auth_keyboard
-from utils.captcha import generate_captcha_text, generate_captcha_image
-from utils.helpers import send_error_message, send_success_message, cancel_state
+from utils.captcha import captcha_pool
+from utils.helpers import send_error_message, send_success_message, cancel_state, send_welcome_message
+from utils.replies import ReplyComposer
+from utils.notifications import notification_bus, ADMIN_NOTIFICATION
 
 # Создаем роутер для аутентификации
 router = Router()
@@ -44,50 +46,39 @@ async def cmd_start(event: Message | types.CallbackQuery, state: FSMContext):
         user_id = message.from_user.id
     
     # Проверяем, авторизован ли пользователь
-    user = db.get_user_by_telegram_id(user_id)
+    user = await db.get_user_by_telegram_id(user_id)
     
     if user:  # Если пользователь уже авторизован
         is_admin = user_id in ADMIN_IDS
         
-        # Отправляем приветственное сообщение
-        await message.answer(f"С возвращением, {user[1]}! Чем могу помочь?")
+        # Приветствие отправляется вместе с первой клавиатурой
+        reply = ReplyComposer(message)
+        reply.add(f"С возвращением, {user[1]}! Чем могу помочь?")
         
         # Отображаем нужные клавиатуры
         if is_admin:
-            # Для админа - обе клавиатуры
-            await message.answer(
-                "Управление ссылками:", 
-                reply_markup=get_admin_inline_keyboard()
-            )
-            await message.answer(
-                "Функции администрирования:", 
-                reply_markup=get_admin_keyboard()
-            )
+            # Для админа - обе клавиатуры (инлайн и обычная могут быть только в разных сообщениях)
+            reply.add("Управление ссылками:", reply_markup=get_admin_inline_keyboard())
+            reply.add("Функции администрирования:", reply_markup=get_admin_keyboard())
         else:
             # Для обычного пользователя - только инлайн клавиатура
-            await message.answer(
-                "Выберите действие:", 
-                reply_markup=get_main_keyboard()
-            )
+            reply.add("Выберите действие:", reply_markup=await get_main_keyboard())
         
+        await reply.send()
         return  # Завершаем обработку для авторизованных пользователей
     
     # Для неавторизованных пользователей сразу показываем капчу
-    # Генерация капчи
-    captcha_text = generate_captcha_text()
-    captcha_image = generate_captcha_image(captcha_text)
+    # Берем готовую капчу из пула, чтобы не рисовать её в event loop
+    captcha_text, captcha_image = await captcha_pool.get()
     
     await state.update_data(captcha_text=captcha_text)
     
-    await message.answer(
-        "Для продолжения введите текст с картинки:",
-        reply_markup=ReplyKeyboardRemove()
-    )
-    
+    # Подсказка уходит подписью к картинке
     # В aiogram 3.x для отправки байтов используем BufferedInputFile вместо FSInputFile
-    await message.answer_photo(
-        BufferedInputFile(captcha_image, filename="captcha.png")
-    )
+    reply = ReplyComposer(message)
+    reply.add("Для продолжения введите текст с картинки:", reply_markup=ReplyKeyboardRemove())
+    reply.add_photo(BufferedInputFile(captcha_image, filename="captcha.png"))
+    await reply.send()
     await state.set_state(AuthStates.waiting_for_captcha)
 
 @router.message(AuthStates.waiting_for_captcha)
@@ -129,7 +120,7 @@ async def process_registration_username(message: Message, state: FSMContext):
     username = message.text.strip()
     
     # Проверяем, не занят ли логин
-    if db.get_user_by_username(username):
+    if await db.get_user_by_username(username):
         await send_error_message(
             message,
             f"Логин '{username}' уже занят. Попробуйте другой."
@@ -203,15 +194,12 @@ async def process_registration_password_confirm(message: Message, state: FSMCont
     full_name = message.from_user.full_name
     
     # Создаем пользователя с полным именем
-    if db.add_user(username, password, full_name):
+    if await db.add_user(username, password, full_name):
         # Получаем ID созданного пользователя
-        user_id = db.authenticate_user(username, password)
+        user_id = await db.authenticate_user(username, password)
         
         # Привязываем Telegram ID с полным именем
-        db.update_telegram_id(user_id, message.from_user.id, full_name)
-        
-        # Отправляем уведомление админам о новой регистрации
-        await send_admin_notification_registration(bot, username, full_name, message.from_user.id)
+        await db.update_telegram_id(user_id, message.from_user.id, full_name)
         
         # Остальной код остается без изменений...
         await message.answer(
@@ -222,30 +210,8 @@ async def process_registration_password_confirm(message: Message, state: FSMCont
         )
         
         # Теперь отправляем приветственное сообщение с логотипом
-        logo_path = "assets/logo.jpg"
-        
-        if os.path.exists(logo_path):
-            try:
-                await message.answer_photo(
-                    FSInputFile(logo_path),
-                    caption=get_welcome_message(),
-                    parse_mode="HTML"
-                )
-            except Exception as e:
-                logger.error(f"Error sending welcome message with photo: {e}")
-                await message.answer_photo(
-                    FSInputFile(logo_path),
-                    caption=get_welcome_message()
-                )
-        else:
-            try:
-                await message.answer(
-                    get_welcome_message(),
-                    parse_mode="HTML"
-                )
-            except Exception as e:
-                logger.error(f"Error sending welcome message: {e}")
-                await message.answer(get_welcome_message())
+        # Логотип загружается в Telegram один раз, дальше отправляется по file_id
+        await send_welcome_message(message)
         
         # Определяем, является ли пользователь админом
         is_admin = message.from_user.id in ADMIN_IDS
@@ -263,10 +229,13 @@ async def process_registration_password_confirm(message: Message, state: FSMCont
         else:
             await message.answer(
                 "Выберите действие:",
-                reply_markup=get_main_keyboard()
+                reply_markup=await get_main_keyboard()
             )
         
         await state.clear()
+        
+        # Уведомление админам о новой регистрации - после ответа пользователю
+        await send_admin_notification_registration(username, full_name, message.from_user.id)
     else:
         await send_error_message(
             message,
@@ -290,8 +259,8 @@ async def process_username(message: Message, state: FSMContext):
     await message.answer("Теперь введите пароль:", reply_markup=ReplyKeyboardRemove())
     await state.set_state(AuthStates.waiting_for_password)
 
-async def send_admin_notification(bot: Bot, username, user_full_name, user_id):
-    """Отправка уведомления админу о новой авторизации"""
+async def send_admin_notification(username, user_full_name, user_id):
+    """Публикация уведомления админам о новой авторизации"""
     try:
         notification_text = (
             f"🔔 Новая авторизация!\n\n"
@@ -301,19 +270,14 @@ async def send_admin_notification(bot: Bot, username, user_full_name, user_id):
             f"⏰ Время: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}"
         )
         
-        # Отправляем уведомление всем админам
-        for admin_id in ADMIN_IDS:
-            try:
-                await bot.send_message(admin_id, notification_text)
-                logger.info(f"Admin notification sent to {admin_id}")
-            except Exception as e:
-                logger.error(f"Failed to send notification to admin {admin_id}: {e}")
+        # Уведомление отправляют фоновые воркеры шины (полоса массовых отправок), апдейт пользователя не ждет отправки
+        await notification_bus.publish(ADMIN_NOTIFICATION, {'text': notification_text})
                 
     except Exception as e:
-        logger.error(f"Failed to send admin notification: {e}")
+        logger.error(f"Failed to publish admin notification: {e}")
 
-async def send_admin_notification_registration(bot: Bot, username, user_full_name, user_id):
-    """Отправка уведомления админу о новой регистрации"""
+async def send_admin_notification_registration(username, user_full_name, user_id):
+    """Публикация уведомления админам о новой регистрации"""
     try:
         notification_text = (
             f"🆕 Новая регистрация!\n\n"
@@ -323,16 +287,11 @@ async def send_admin_notification_registration(bot: Bot, username, user_full_nam
             f"⏰ Время: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}"
         )
         
-        # Отправляем уведомление всем админам
-        for admin_id in ADMIN_IDS:
-            try:
-                await bot.send_message(admin_id, notification_text)
-                logger.info(f"Admin notification sent to {admin_id}")
-            except Exception as e:
-                logger.error(f"Failed to send notification to admin {admin_id}: {e}")
+        # Уведомление отправляют фоновые воркеры шины (полоса массовых отправок), апдейт пользователя не ждет отправки
+        await notification_bus.publish(ADMIN_NOTIFICATION, {'text': notification_text})
                 
     except Exception as e:
-        logger.error(f"Failed to send admin notification: {e}")
+        logger.error(f"Failed to publish admin notification: {e}")
 
 @router.message(AuthStates.waiting_for_password)
 async def process_password(message: Message, state: FSMContext, bot: Bot):
@@ -342,7 +301,7 @@ async def process_password(message: Message, state: FSMContext, bot: Bot):
     username = user_data.get('username')
     
     # Проверка учетных данных
-    user_id = db.authenticate_user(username, password)
+    user_id = await db.authenticate_user(username, password)
     
     if not user_id:
         await send_error_message(
@@ -358,10 +317,7 @@ async def process_password(message: Message, state: FSMContext, bot: Bot):
     full_name = message.from_user.full_name
     
     # Обновление Telegram ID пользователя с полным именем
-    db.update_telegram_id(user_id, message.from_user.id, full_name)
-    
-    # Отправляем уведомление админу о новой авторизации
-    await send_admin_notification(bot, username, full_name, message.from_user.id)
+    await db.update_telegram_id(user_id, message.from_user.id, full_name)
     
     # Остальной код остается без изменений...
     await message.answer(
@@ -370,30 +326,8 @@ async def process_password(message: Message, state: FSMContext, bot: Bot):
     )
     
     # Отправляем приветственное сообщение с логотипом
-    logo_path = "assets/logo.jpg"
-    
-    if os.path.exists(logo_path):
-        try:
-            await message.answer_photo(
-                FSInputFile(logo_path),
-                caption=get_welcome_message(),
-                parse_mode="HTML"
-            )
-        except Exception as e:
-            logger.error(f"Error sending welcome message with photo: {e}")
-            await message.answer_photo(
-                FSInputFile(logo_path),
-                caption=get_welcome_message()
-            )
-    else:
-        try:
-            await message.answer(
-                get_welcome_message(),
-                parse_mode="HTML"
-            )
-        except Exception as e:
-            logger.error(f"Error sending welcome message: {e}")
-            await message.answer(get_welcome_message())
+    # Логотип загружается в Telegram один раз, дальше отправляется по file_id
+    await send_welcome_message(message)
     
     is_admin = message.from_user.id in ADMIN_IDS
     
@@ -414,10 +348,13 @@ async def process_password(message: Message, state: FSMContext, bot: Bot):
         # Для обычного пользователя - просто инлайн-кнопки
         await message.answer(
             "Выберите действие:",
-            reply_markup=get_main_keyboard()
+            reply_markup=await get_main_keyboard()
         )
     
     await state.clear()
+    
+    # Уведомление админам о новой авторизации - после ответа пользователю
+    await send_admin_notification(username, full_name, message.from_user.id)
 
 @router.message(Command("logout"))
 @router.message(F.text == "🚪 Выйти")
@@ -437,7 +374,7 @@ async def cmd_logout(event: Message | types.CallbackQuery):
         message = event
         user_id = message.from_user.id
     
-    user = db.get_user_by_telegram_id(user_id)
+    user = await db.get_user_by_telegram_id(user_id)
     
     if not user:
         text = "Вы не авторизованы."
@@ -448,7 +385,7 @@ async def cmd_logout(event: Message | types.CallbackQuery):
         return
     
     # Удаление привязки Telegram ID к аккаунту
-    db.update_telegram_id(user[0], None)
+    await db.update_telegram_id(user[0], None)
     
     # Отправляем сообщение о выходе и кнопку для перезапуска
     await message.answer(
@@ -11,7 +11,8 @@ from models import LinkStates, MessageStates
 from config import ADMIN_IDS
 from utils.keyboards import get_main_keyboard, get_admin_keyboard, get_start_keyboard, get_cancel_keyboard, get_admin_inline_keyboard
 from utils.helpers import send_error_message, send_success_message, cancel_state
-from utils.url_validator import validate_and_fix_url, is_valid_url, get_url_display_name
+from utils.custom_buttons import find_custom_button
+from utils.replies import ReplyComposer
 
 # Создаем роутер для пользовательских команд
 router = Router()
@@ -21,7 +22,7 @@ logger = logging.getLogger(__name__)
 
 async def check_auth(message: Message) -> bool:
     """Проверка авторизации пользователя по сообщению"""
-    user = db.get_user_by_telegram_id(message.from_user.id)
+    user = await db.get_user_by_telegram_id(message.from_user.id)
     if not user:
         await send_error_message(message, "Вы не авторизованы. Используйте /login", reply_markup=get_start_keyboard())
         return False
@@ -29,7 +30,7 @@ async def check_auth(message: Message) -> bool:
 
 async def check_auth_callback(callback: CallbackQuery) -> bool:
     """Проверка авторизации пользователя по callback-запросу"""
-    user = db.get_user_by_telegram_id(callback.from_user.id)
+    user = await db.get_user_by_telegram_id(callback.from_user.id)
     if not user:
         await callback.message.answer("❌ Вы не авторизованы. Используйте /login", reply_markup=get_start_keyboard())
         return False
@@ -61,16 +62,18 @@ async def cmd_my_link_button(message: Message):
     if not await check_auth(message):
         return
     
-    user = db.get_user_by_telegram_id(message.from_user.id)
+    user = await db.get_user_by_telegram_id(message.from_user.id)
     link = user[2]
+    reply = ReplyComposer(message)
     
     if link:
-        await message.answer(f"🔗 Ваша текущая информация:\n{link}")
+        reply.add(f"🔗 Ваша текущая информация:\n{link}")
     else:
-        await message.answer("У вас еще нет сохраненной ссылки.\nИспользуйте кнопку 'Изменить' чтобы добавить ссылку.")
+        reply.add("У вас еще нет сохраненной ссылки.\nИспользуйте кнопку 'Изменить' чтобы добавить ссылку.")
     
-    # Показываем клавиатуру для обычного пользователя
-    await message.answer("Выберите действие:", reply_markup=get_main_keyboard())
+    # Клавиатура для обычного пользователя отправляется в том же сообщении
+    reply.add("Выберите действие:", reply_markup=await get_main_keyboard())
+    await reply.send()
 
 @router.message(F.text == "✉️ Написать сообщение")
 async def cmd_send_message_button(message: Message, state: FSMContext):
@@ -79,13 +82,12 @@ async def cmd_send_message_button(message: Message, state: FSMContext):
         return
     
     # Проверяем, настроен ли канал для сообщений
-    messages_channel = db.get_channel("messages")
+    messages_channel = await db.get_channel("messages")
     if not messages_channel:
-        await send_error_message(
-            message,
-            "Канал для сообщений не настроен. Обратитесь к администратору."
-        )
-        await message.answer("Выберите действие:", reply_markup=get_main_keyboard())
+        reply = ReplyComposer(message)
+        reply.error("Канал для сообщений не настроен. Обратитесь к администратору.")
+        reply.add("Выберите действие:", reply_markup=await get_main_keyboard())
+        await reply.send()
         return
     
     await message.answer(
@@ -97,16 +99,18 @@ async def cmd_send_message_button(message: Message, state: FSMContext):
 @router.message(F.text == "🚪 Выйти")
 async def cmd_logout_button(message: Message):
     """Обработчик кнопки 'Выйти' для обычных пользователей"""
-    user = db.get_user_by_telegram_id(message.from_user.id)
+    user = await db.get_user_by_telegram_id(message.from_user.id)
     
     if not user:
-        await send_error_message(message, "Вы не авторизованы.")
         from utils.keyboards import get_start_button
-        await message.answer("Нажмите Старт для начала работы:", reply_markup=get_start_button())
+        reply = ReplyComposer(message)
+        reply.error("Вы не авторизованы.")
+        reply.add("Нажмите Старт для начала работы:", reply_markup=get_start_button())
+        await reply.send()
         return
     
     # Удаление привязки Telegram ID к аккаунту
-    db.update_telegram_id(user[0], None)
+    await db.update_telegram_id(user[0], None)
     
     # Отправляем сообщение о выходе и кнопку для перезапуска
     from utils.keyboards import get_start_button
@@ -138,19 +142,21 @@ async def cmd_my_link(message: Message):
     if not await check_auth(message):
         return
     
-    user = db.get_user_by_telegram_id(message.from_user.id)
+    user = await db.get_user_by_telegram_id(message.from_user.id)
     link = user[2]
     
     # Показываем соответствующую клавиатуру в зависимости от роли пользователя
     is_admin = message.from_user.id in ADMIN_IDS
-    keyboard = get_admin_keyboard() if is_admin else get_main_keyboard()
+    keyboard = get_admin_keyboard() if is_admin else await get_main_keyboard()
 
+    reply = ReplyComposer(message)
     if link:
-        await message.answer(f"🔗 Ваша текущая информация: {link}")
+        reply.add(f"🔗 Ваша текущая информация: {link}")
     else:
-        await message.answer("У вас еще нет сохраненной ссылки.\nИспользуйте /setlink чтобы добавить ссылку.")
+        reply.add("У вас еще нет сохраненной ссылки.\nИспользуйте /setlink чтобы добавить ссылку.")
     
-    await message.answer("Выберите действие:", reply_markup=keyboard)
+    reply.add("Выберите действие:", reply_markup=keyboard)
+    await reply.send()
 
 # =============================================================================
 # ОБРАБОТЧИКИ СОСТОЯНИЙ
@@ -163,7 +169,7 @@ async def process_link(message: Message, state: FSMContext):
         return
         
     link = message.text.strip()
-    user = db.get_user_by_telegram_id(message.from_user.id)
+    user = await db.get_user_by_telegram_id(message.from_user.id)
     
     if not user:
         await send_error_message(message, "Вы не авторизованы. Используйте /login")
@@ -171,7 +177,7 @@ async def process_link(message: Message, state: FSMContext):
         return
     
     # Обновление ссылки в базе данных
-    db.update_link(user[0], link)
+    await db.update_link(user[0], link)
     
     # После обновления ссылки показываем сообщение об успехе
     is_admin = message.from_user.id in ADMIN_IDS
@@ -180,12 +186,13 @@ async def process_link(message: Message, state: FSMContext):
         await send_success_message(message, f"Актуальное:\n{link}", reply_markup=get_admin_keyboard())
     else:
         # Для обычного пользователя показываем обычную клавиатуру
-        await send_success_message(message, f"Актуальное:\n{link}", reply_markup=get_main_keyboard())
+        await send_success_message(message, f"Актуальное:\n{link}", reply_markup=await get_main_keyboard())
     
     await state.clear()
     
     # Возвращаем информацию для отправки уведомления в канал
     return {
+        "user_id": user[0],
         "username": user[1],
         "link": link
     }
@@ -201,23 +208,22 @@ async def process_user_message(message: Message, state: FSMContext, bot: Bot):
         await send_error_message(message, "Сообщение не может быть пустым")
         return
     
-    user = db.get_user_by_telegram_id(message.from_user.id)
+    user = await db.get_user_by_telegram_id(message.from_user.id)
     if not user:
         await send_error_message(message, "Пользователь не найден")
         await state.clear()
         return
     
     try:
-        messages_channel = db.get_channel("messages")
+        messages_channel = await db.get_channel("messages")
         if not messages_channel:
-            await send_error_message(
-                message,
-                "Канал для сообщений не настроен. Обратитесь к администратору."
-            )
             # Показываем соответствующую клавиатуру
             is_admin = message.from_user.id in ADMIN_IDS
-            keyboard = get_admin_keyboard() if is_admin else get_main_keyboard()
-            await message.answer("Выберите действие:", reply_markup=keyboard)
+            keyboard = get_admin_keyboard() if is_admin else await get_main_keyboard()
+            reply = ReplyComposer(message)
+            reply.error("Канал для сообщений не настроен. Обратитесь к администратору.")
+            reply.add("Выберите действие:", reply_markup=keyboard)
+            await reply.send()
             await state.clear()
             return
         
@@ -246,7 +252,7 @@ async def process_user_message(message: Message, state: FSMContext, bot: Bot):
         
         # Отправляем сообщение об успехе
         is_admin = message.from_user.id in ADMIN_IDS
-        keyboard = get_admin_keyboard() if is_admin else get_main_keyboard()
+        keyboard = get_admin_keyboard() if is_admin else await get_main_keyboard()
         
         await send_success_message(
             message, 
@@ -259,7 +265,7 @@ async def process_user_message(message: Message, state: FSMContext, bot: Bot):
         
         # Показываем соответствующую клавиатуру при ошибке
         is_admin = message.from_user.id in ADMIN_IDS
-        keyboard = get_admin_keyboard() if is_admin else get_main_keyboard()
+        keyboard = get_admin_keyboard() if is_admin else await get_main_keyboard()
         
         await send_error_message(
             message,
@@ -300,11 +306,11 @@ async def callback_send_message(callback: CallbackQuery, state: FSMContext):
         return
     
     # Проверяем, настроен ли канал для сообщений
-    messages_channel = db.get_channel("messages")
+    messages_channel = await db.get_channel("messages")
     if not messages_channel:
         await callback.message.answer(
             "❌ Канал для сообщений не настроен. Обратитесь к администратору.",
-            reply_markup=get_main_keyboard()
+            reply_markup=await get_main_keyboard()
         )
         return
     
@@ -322,35 +328,31 @@ async def callback_my_link(callback: CallbackQuery):
     if not await check_auth_callback(callback):
         return
     
-    user = db.get_user_by_telegram_id(callback.from_user.id)
+    user = await db.get_user_by_telegram_id(callback.from_user.id)
     link = user[2]
     
+    reply = ReplyComposer(callback.message)
     if link:
-        await callback.message.answer(f"🔗 Актуальное:\n{link}")
+        reply.add(f"🔗 Актуальное:\n{link}")
     else:
-        await callback.message.answer("У вас еще нет сохраненной ссылки.\nИспользуйте /setlink чтобы добавить ссылку.")
+        reply.add("У вас еще нет сохраненной ссылки.\nИспользуйте /setlink чтобы добавить ссылку.")
     
     # Показываем соответствующие кнопки в зависимости от роли пользователя
     is_admin = callback.from_user.id in ADMIN_IDS
     if is_admin:
         # Для админа показываем функции администрирования
-        await callback.message.answer(
-            "Функции администрирования:",
-            reply_markup=get_admin_keyboard()
-        )
+        reply.add("Функции администрирования:", reply_markup=get_admin_keyboard())
     else:
         # Для обычного пользователя показываем основную клавиатуру
-        await callback.message.answer(
-            "Выберите действие:",
-            reply_markup=get_main_keyboard()
-        )
+        reply.add("Выберите действие:", reply_markup=await get_main_keyboard())
+    await reply.send()
 
 @router.callback_query(F.data == "logout")
 async def callback_logout(callback: CallbackQuery):
     """Обработчик инлайн-кнопки выхода (для админов)"""
     await callback.answer()
     
-    user = db.get_user_by_telegram_id(callback.from_user.id)
+    user = await db.get_user_by_telegram_id(callback.from_user.id)
     
     if not user:
         from utils.keyboards import get_start_button
@@ -358,7 +360,7 @@ async def callback_logout(callback: CallbackQuery):
         return
     
     # Удаление привязки Telegram ID к аккаунту
-    db.update_telegram_id(user[0], None)
+    await db.update_telegram_id(user[0], None)
     from utils.keyboards import get_start_button
     await callback.message.answer("Вы успешно вышли из аккаунта.", reply_markup=get_start_button())
 
@@ -372,63 +374,20 @@ async def handle_custom_buttons(message: Message):
     if not await check_auth(message):
         return
     
-    # Получаем все активные кастомные кнопки
-    custom_buttons = db.get_custom_buttons(active_only=True)
-    
-    # Ищем кнопку с таким названием
-    for button_data in custom_buttons:
-        button_id, name, url, is_active = button_data
-        if message.text.strip() == name:
-            try:
-                # Проверяем и исправляем URL
-                fixed_url = validate_and_fix_url(url)
-                
-                if not is_valid_url(fixed_url):
-                    # Если URL невалидный, показываем текстовое сообщение
-                    await message.answer(
-                        f"🔗 {name}\n\n"
-                        f"Ссылка: {url}\n\n"
-                        f"⚠️ Некорректный формат ссылки. Обратитесь к администратору.",
-                        disable_web_page_preview=True
-                    )
-                else:
-                    # Создаем инлайн-клавиатуру с кнопкой-ссылкой
-                    display_name = get_url_display_name(fixed_url)
-                    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                        [InlineKeyboardButton(text=f"🔗 Перейти в {display_name}", url=fixed_url)]
-                    ])
-                    
-                    # Отправляем сообщение с кнопкой-ссылкой
-                    await message.answer(
-                        f"🔗 {name}\n\n"
-                        f"Нажмите на кнопку ниже, чтобы перейти:",
-                        reply_markup=keyboard,
-                        disable_web_page_preview=True
-                    )
-                
-                # Показываем основную клавиатуру обратно
-                is_admin = message.from_user.id in ADMIN_IDS
-                keyboard_main = get_admin_keyboard() if is_admin else get_main_keyboard()
-                await message.answer("Выберите действие:", reply_markup=keyboard_main)
-                return
-                
-            except Exception as e:
-                logger.error(f"Error processing custom button URL: {e}")
-                # В случае ошибки показываем текстовое сообщение
-                await message.answer(
-                    f"🔗 {name}\n\n"
-                    f"Ссылка: {url}\n\n"
-                    f"⚠️ Ошибка при обработке ссылки. Обратитесь к администратору.",
-                    disable_web_page_preview=True
-                )
-                
-                # Показываем основную клавиатуру обратно
-                is_admin = message.from_user.id in ADMIN_IDS
-                keyboard_main = get_admin_keyboard() if is_admin else get_main_keyboard()
-                await message.answer("Выберите действие:", reply_markup=keyboard_main)
-                return
-    
-    # Если кнопка не найдена, не отвечаем (позволяем другим обработчикам сработать)
+    # Ищем кнопку с таким названием в заранее подготовленном индексе
+    button = await find_custom_button(message.text)
+    if button is None:
+        # Если кнопка не найдена, не отвечаем (позволяем другим обработчикам сработать)
+        return
+    
+    # Сообщение с кнопкой-ссылкой (или с описанием ошибки в ссылке) и основная клавиатура:
+    # без инлайн-кнопки они уходят одним сообщением
+    is_admin = message.from_user.id in ADMIN_IDS
+    keyboard_main = get_admin_keyboard() if is_admin else await get_main_keyboard()
+    reply = ReplyComposer(message)
+    reply.add(button.text, reply_markup=button.reply_markup, disable_web_page_preview=True)
+    reply.add("Выберите действие:", reply_markup=keyboard_main, disable_web_page_preview=True)
+    await reply.send()
 
 def setup(dp: Dispatcher):
     """Регистрация обработчиков пользователя"""
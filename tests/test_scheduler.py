@@ -0,0 +1,116 @@
+# tests/test_scheduler.py
+"""
+Очередь апдейтов чата: порядок обработки, состояние FSM после очереди и лимит ожидающих апдейтов.
+
+Запуск: python -m pytest tests
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.client.session.base import BaseSession
+from aiogram.filters import Command
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import Message, Update
+
+from utils.scheduler import ChatScheduler
+
+TOKEN = "42:TEST"
+CHAT_ID = 1000001
+
+class NullSession(BaseSession):
+    """Сессия без сети: любой метод Bot API сразу возвращает None"""
+
+    async def make_request(self, bot, method, timeout=None):
+        return None
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+    async def close(self):
+        pass
+
+class EditStates(StatesGroup):
+    waiting_for_link = State()
+
+def make_update(update_id, text):
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": CHAT_ID, "type": "private"},
+            "from": {"id": CHAT_ID, "is_bot": False, "first_name": "User"},
+            "text": text,
+        },
+    }, context={"bot": None})
+
+def make_dispatcher(scheduler, handled, started=None, release=None):
+    """Диспетчер с командой, которая ставит состояние после ожидания, обработчиком состояния и catch-all"""
+    router = Router()
+
+    @router.message(Command("go"))
+    async def go(message: Message, state: FSMContext):
+        handled.append("go")
+        if started is not None:
+            started.set()
+            await release.wait()
+        # Состояние меняется, когда следующий апдейт чата уже получен и ждет очереди
+        await state.set_state(EditStates.waiting_for_link)
+
+    @router.message(EditStates.waiting_for_link)
+    async def link(message: Message, state: FSMContext):
+        await state.clear()
+        handled.append(f"link:{message.text}")
+
+    @router.message(F.text)
+    async def catch_all(message: Message):
+        handled.append(f"catch_all:{message.text}")
+
+    dp = Dispatcher(storage=MemoryStorage())
+    dp.include_router(router)
+    dp.update.outer_middleware.register(scheduler)
+    return dp
+
+def test_waiting_update_sees_state_set_by_previous_update():
+    async def run():
+        handled = []
+        started, release = asyncio.Event(), asyncio.Event()
+        bot = Bot(TOKEN, session=NullSession())
+        dp = make_dispatcher(ChatScheduler(), handled, started, release)
+        first = asyncio.create_task(dp.feed_update(bot, make_update(1, "/go")))
+        await started.wait()
+        # Второй апдейт приходит, пока первый еще обрабатывается, и ждет очереди чата
+        second = asyncio.create_task(dp.feed_update(bot, make_update(2, "https://link")))
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(first, second)
+        return handled
+
+    assert asyncio.run(run()) == ["go", "link:https://link"]
+
+def test_chat_queue_limit():
+    async def run():
+        handled = []
+        started, release = asyncio.Event(), asyncio.Event()
+        bot = Bot(TOKEN, session=NullSession())
+        scheduler = ChatScheduler(queue_size=3)
+        dp = make_dispatcher(scheduler, handled, started, release)
+        first = asyncio.create_task(dp.feed_update(bot, make_update(1, "/go")))
+        await started.wait()
+        # В очереди чата уже обрабатываемый апдейт: ждать могут еще два, третий отбрасывается
+        pending = [asyncio.create_task(dp.feed_update(bot, make_update(i, f"text {i}"))) for i in (2, 3, 4)]
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(first, *pending)
+        return handled, scheduler.stats()
+
+    handled, stats = asyncio.run(run())
+    assert handled == ["go", "link:text 2", "catch_all:text 3"]
+    assert stats["dropped"] == 1
+    assert stats["chats"] == 0
@@ -0,0 +1,117 @@
+# tests/test_text_routes.py
+"""
+Таблица маршрутов кнопок: выбор обработчика по тексту и состояние FSM, измененное предыдущим апдейтом чата.
+
+Запуск: python -m pytest tests
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.client.session.base import BaseSession
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import Message, Update
+
+from utils.scheduler import ChatScheduler
+from utils.text_routes import TextRouteTable
+
+TOKEN = "42:TEST"
+CHAT_ID = 1000001
+
+class NullSession(BaseSession):
+    """Сессия без сети: любой метод Bot API сразу возвращает None"""
+
+    async def make_request(self, bot, method, timeout=None):
+        return None
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+    async def close(self):
+        pass
+
+class LinkStates(StatesGroup):
+    waiting_for_link = State()
+
+def make_update(update_id, text):
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": CHAT_ID, "type": "private"},
+            "from": {"id": CHAT_ID, "is_bot": False, "first_name": "User"},
+            "text": text,
+        },
+    }, context={"bot": None})
+
+def make_dispatcher(handled, started=None, release=None):
+    """Диспетчер как в bot.py: планировщик апдейтов и таблица кнопок поверх обработчиков"""
+    router = Router()
+
+    @router.message(LinkStates.waiting_for_link)
+    async def process_link(message: Message, state: FSMContext):
+        await state.clear()
+        handled.append(f"link:{message.text}")
+
+    @router.message(F.text == "🔄 Изменить")
+    async def edit_link(message: Message, state: FSMContext):
+        handled.append("edit")
+        if started is not None:
+            started.set()
+            await release.wait()
+        await state.set_state(LinkStates.waiting_for_link)
+
+    @router.message(F.text == "🔗 Моё актуальное")
+    async def my_link(message: Message):
+        handled.append("my_link")
+
+    @router.message()
+    async def catch_all(message: Message):
+        handled.append(f"catch_all:{message.text}")
+
+    dp = Dispatcher(storage=MemoryStorage())
+    dp.include_router(router)
+    dp.update.outer_middleware.register(ChatScheduler())
+    table = TextRouteTable()
+    table.build(dp)
+    dp.message.outer_middleware.register(table)
+    return dp, table
+
+def test_table_routes_buttons_and_catch_all():
+    async def run():
+        handled = []
+        bot = Bot(TOKEN, session=NullSession())
+        dp, table = make_dispatcher(handled)
+        for update_id, text in enumerate(["🔗 Моё актуальное", "Неизвестная кнопка"], start=1):
+            await dp.feed_update(bot, make_update(update_id, text))
+        return handled, table
+
+    handled, table = asyncio.run(run())
+    assert set(table.routes) == {"🔄 Изменить", "🔗 Моё актуальное"}
+    assert handled == ["my_link", "catch_all:Неизвестная кнопка"]
+    assert (table.hits, table.fallbacks) == (1, 1)
+
+def test_button_text_after_state_change_goes_to_state_handler():
+    async def run():
+        handled = []
+        started, release = asyncio.Event(), asyncio.Event()
+        bot = Bot(TOKEN, session=NullSession())
+        dp, table = make_dispatcher(handled, started, release)
+        first = asyncio.create_task(dp.feed_update(bot, make_update(1, "🔄 Изменить")))
+        await started.wait()
+        # Текст кнопки приходит, пока предыдущий апдейт чата еще не поставил состояние
+        second = asyncio.create_task(dp.feed_update(bot, make_update(2, "🔗 Моё актуальное")))
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(first, second)
+        return handled, table
+
+    handled, table = asyncio.run(run())
+    assert handled == ["edit", "link:🔗 Моё актуальное"]
+    assert table.hits == 1
@@ -0,0 +1,213 @@
+# utils/bot_session.py
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from aiohttp import ClientConnectorError, ClientTimeout, ServerTimeoutError
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import ClientDecodeError, TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+from aiogram.methods import GetUpdates
+
+from utils.outbound import BULK, current_lane, outbound_scheduler
+
+logger = logging.getLogger(__name__)
+
+# Адрес Bot API (например, локальный telegram-bot-api); по умолчанию - api.telegram.org
+BOT_API_URL = os.getenv("BOT_API_URL")
+
+# Пул соединений с Bot API: всего соединений, время жизни простаивающего соединения и кэша DNS (секунды)
+BOT_API_POOL_SIZE = int(os.getenv("BOT_API_POOL_SIZE", "100"))
+BOT_API_KEEPALIVE = float(os.getenv("BOT_API_KEEPALIVE", "60"))
+BOT_API_DNS_TTL = int(os.getenv("BOT_API_DNS_TTL", "300"))
+# Таймауты запроса: весь запрос и установка соединения (секунды)
+BOT_API_TIMEOUT = float(os.getenv("BOT_API_TIMEOUT", "30"))
+BOT_API_CONNECT_TIMEOUT = float(os.getenv("BOT_API_CONNECT_TIMEOUT", "5"))
+# Сколько соединений открывается при запуске, чтобы первые ответы не ждали TCP/TLS
+BOT_API_WARMUP_CONNECTIONS = int(os.getenv("BOT_API_WARMUP_CONNECTIONS", "2"))
+
+# Повторы запросов: количество, базовая и максимальная задержка (секунды).
+# RetryAfter пережидается, пока суммарное ожидание не больше MAX_RETRY_AFTER (фоновые отправки)
+# или MAX_INTERACTIVE_RETRY_AFTER (ответы на апдейты: дольше ждать нельзя, стоит очередь чата);
+# иначе ошибка отдается вызывающему коду
+BOT_API_RETRIES = int(os.getenv("BOT_API_RETRIES", "3"))
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 10.0
+MAX_RETRY_AFTER = 30.0
+MAX_INTERACTIVE_RETRY_AFTER = 3.0
+# Методы, повтор которых после отправленного запроса дублирует сообщение: они повторяются,
+# только если запрос не дошел до сервера (ошибка соединения)
+NON_IDEMPOTENT_PREFIXES = ("Send", "Copy", "Forward")
+
+# Количество последних замеров на метод для перцентилей
+LATENCY_SAMPLES = 500
+
+# Повторы включены (False - вызывающий код повторяет запросы сам, например рассылки)
+_retries_enabled: ContextVar = ContextVar("bot_api_retries", default=True)
+
+def disable_retries():
+    """Отключение повторов для текущей задачи и задач, которые она создаст"""
+    _retries_enabled.set(False)
+
+class TunedAiohttpSession(AiohttpSession):
+    """Сессия Bot API с настроенным пулом соединений, кэшем DNS и таймаутом соединения"""
+
+    def __init__(self, pool_size=BOT_API_POOL_SIZE, keepalive=BOT_API_KEEPALIVE, dns_ttl=BOT_API_DNS_TTL,
+                 timeout=BOT_API_TIMEOUT, connect_timeout=BOT_API_CONNECT_TIMEOUT, **kwargs):
+        super().__init__(timeout=timeout, **kwargs)
+        self.connect_timeout = connect_timeout
+        self._connector_init.update(
+            limit=pool_size,
+            keepalive_timeout=keepalive,
+            ttl_dns_cache=dns_ttl,
+            enable_cleanup_closed=True,
+        )
+
+    async def make_request(self, bot, method, timeout=None):
+        # Общий таймаут берется из запроса (для getUpdates он больше), таймаут соединения - свой
+        total = self.timeout if timeout is None else timeout
+        return await super().make_request(
+            bot, method, timeout=ClientTimeout(total=total, connect=self.connect_timeout)
+        )
+
+def is_connect_error(error: TelegramNetworkError) -> bool:
+    """Запрос не дошел до сервера: соединение не установлено (в отличие от таймаута чтения ответа)"""
+    cause = error.__cause__ or error.__context__
+    if isinstance(cause, ClientConnectorError):
+        return True
+    # aiohttp 3.9 не выделяет таймаут соединения в отдельный класс, отличается только текст
+    return isinstance(cause, ServerTimeoutError) and str(cause).startswith("Connection timeout")
+
+class RetryMiddleware:
+    """Middleware сессии: повтор запроса при сетевой ошибке, 5xx или не-JSON ответе прокси
+    (с экспоненциальной задержкой со случайным разбросом) и RetryAfter (после указанного Telegram времени)
+
+    getUpdates не повторяется: у поллинга свой цикл с задержками. Отправка сообщений повторяется
+    только при ошибке соединения: после таймаута чтения или 5xx сообщение могло уже дойти.
+    """
+
+    def __init__(self, retries=BOT_API_RETRIES, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY,
+                 max_retry_after=MAX_RETRY_AFTER, max_interactive_retry_after=MAX_INTERACTIVE_RETRY_AFTER):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.max_interactive_retry_after = max_interactive_retry_after
+        self.retried = 0
+
+    async def __call__(self, make_request, bot, method):
+        if not _retries_enabled.get() or isinstance(method, GetUpdates):
+            return await make_request(bot, method)
+        sends_message = type(method).__name__.startswith(NON_IDEMPOTENT_PREFIXES)
+        max_retry_after = self.max_retry_after if current_lane() == BULK else self.max_interactive_retry_after
+        retry_after_waited = 0.0
+        attempt = 0
+        while True:
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                # RetryAfter означает, что запрос не выполнен, повтор безопасен
+                if attempt >= self.retries or retry_after_waited + e.retry_after > max_retry_after:
+                    raise
+                delay = e.retry_after + random.uniform(0, self.base_delay)
+                retry_after_waited += delay
+                error = e
+            except (TelegramNetworkError, TelegramServerError, ClientDecodeError) as e:
+                if attempt >= self.retries:
+                    raise
+                if sends_message and not (isinstance(e, TelegramNetworkError) and is_connect_error(e)):
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                error = e
+            attempt += 1
+            self.retried += 1
+            logger.warning(
+                f"{type(method).__name__} failed ({type(error).__name__}: {error}), "
+                f"retry {attempt}/{self.retries} in {delay:.2f} s"
+            )
+            await asyncio.sleep(delay)
+
+class _MethodLatency:
+    __slots__ = ("count", "errors", "total", "max", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=LATENCY_SAMPLES)
+
+class LatencyMiddleware:
+    """Middleware сессии: время ответа Bot API по методам (каждая попытка отдельно)"""
+
+    def __init__(self):
+        self.methods = {}
+
+    async def __call__(self, make_request, bot, method):
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception:
+            self._method(method).errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            latency = self._method(method)
+            latency.count += 1
+            latency.total += elapsed
+            latency.max = max(latency.max, elapsed)
+            latency.samples.append(elapsed)
+
+    def _method(self, method) -> _MethodLatency:
+        name = type(method).__name__
+        latency = self.methods.get(name)
+        if latency is None:
+            latency = self.methods[name] = _MethodLatency()
+        return latency
+
+    def stats(self) -> dict:
+        """Метод -> количество запросов, ошибки, среднее, p95 и максимум (мс); getUpdates не учитывается"""
+        result = {}
+        for name, latency in self.methods.items():
+            if name == GetUpdates.__name__ or not latency.count:
+                continue
+            samples = sorted(latency.samples)
+            result[name] = {
+                "count": latency.count,
+                "errors": latency.errors,
+                "avg_ms": latency.total / latency.count * 1000,
+                "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+                "max_ms": latency.max * 1000,
+            }
+        return result
+
+def create_session() -> TunedAiohttpSession:
+    """Сессия Bot API с повторами, приоритетами отправки и замером задержек
+
+    Порядок middleware: каждый повтор заново ждет очереди своей полосы, задержка меряется без ожидания.
+    """
+    kwargs = {"api": TelegramAPIServer.from_base(BOT_API_URL)} if BOT_API_URL else {}
+    session = TunedAiohttpSession(**kwargs)
+    session.middleware(bot_api_retries)
+    session.middleware(outbound_scheduler)
+    session.middleware(bot_api_latency)
+    return session
+
+async def warm_up(bot: Bot, connections=BOT_API_WARMUP_CONNECTIONS):
+    """Открытие соединений с Bot API до первых апдейтов (getMe заодно проверяет токен)"""
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(bot.get_me() for _ in range(max(connections, 1))))
+    except Exception as e:
+        logger.warning(f"Bot API warm-up failed: {e}")
+        return
+    logger.info(f"Bot API warm-up: {connections} connection(s) in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+# Глобальные middleware сессии: статистика доступна в /stats
+bot_api_retries = RetryMiddleware()
+bot_api_latency = LatencyMiddleware()
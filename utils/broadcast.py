@@ -0,0 +1,245 @@
+# utils/broadcast.py
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+
+from aiogram.exceptions import TelegramRetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Лимиты Telegram: около 30 сообщений в секунду суммарно и 1 сообщение в секунду в один чат.
+# Берем глобальный лимит с запасом, чтобы оставить место для обычных ответов бота.
+GLOBAL_RATE = 25
+# Запас токенов ведра: небольшой, чтобы в первую секунду (и после простоя) не уходило вдвое больше GLOBAL_RATE
+GLOBAL_BURST = 2
+PER_CHAT_INTERVAL = 1.0
+BROADCAST_WORKERS = 20
+MAX_RETRIES = 3
+
+BROADCAST_TITLE = "<b>Сообщение от PARTNERS 🔗</b>"
+
+# Типы контента с подписью: тип -> (метод бота, имя аргумента с file_id)
+CAPTIONED_SENDERS = {
+    "photo": ("send_photo", "photo"),
+    "video": ("send_video", "video"),
+    "audio": ("send_audio", "audio"),
+    "document": ("send_document", "document"),
+    "animation": ("send_animation", "animation"),
+}
+
+# Типы контента без подписи: перед ними отправляется отдельный заголовок
+BARE_SENDERS = {
+    "voice": ("send_voice", "voice"),
+    "sticker": ("send_sticker", "sticker"),
+    "video_note": ("send_video_note", "video_note"),
+}
+
+def format_broadcast_text(text: str) -> str:
+    """Оформление текста рассылки заголовком"""
+    if text:
+        return f"<b>Сообщение от PARTNERS 🔗:</b>\n\n{text}"
+    return BROADCAST_TITLE
+
+def build_broadcast_payload(message) -> dict | None:
+    """Подготовка содержимого рассылки из сообщения администратора (None - тип не поддерживается)"""
+    if message.text and not message.media_group_id:
+        return {"type": "text", "text": format_broadcast_text(message.text.strip())}
+
+    if message.photo:
+        return {
+            "type": "photo",
+            "file_id": message.photo[-1].file_id,
+            "caption": format_broadcast_text(message.caption or ""),
+        }
+
+    for content_type in CAPTIONED_SENDERS:
+        content = getattr(message, content_type, None)
+        if content:
+            return {
+                "type": content_type,
+                "file_id": content.file_id,
+                "caption": format_broadcast_text(message.caption or ""),
+            }
+
+    for content_type in BARE_SENDERS:
+        content = getattr(message, content_type, None)
+        if content:
+            return {"type": content_type, "file_id": content.file_id}
+
+    return None
+
+def broadcast_parts(payload: dict) -> list:
+    """Сообщения, из которых состоит рассылка одному получателю: список (метод бота, аргументы)"""
+    content_type = payload["type"]
+
+    if content_type == "text":
+        return [("send_message", {"text": payload["text"], "parse_mode": "HTML"})]
+    if content_type in CAPTIONED_SENDERS:
+        method_name, argument = CAPTIONED_SENDERS[content_type]
+        return [(method_name, {argument: payload["file_id"], "caption": payload["caption"], "parse_mode": "HTML"})]
+    if content_type in BARE_SENDERS:
+        method_name, argument = BARE_SENDERS[content_type]
+        return [
+            ("send_message", {"text": BROADCAST_TITLE, "parse_mode": "HTML"}),
+            (method_name, {argument: payload["file_id"]}),
+        ]
+    raise ValueError(f"Unknown broadcast content type: {content_type}")
+
+def payload_cost(payload: dict) -> int:
+    """Количество сообщений, которое отправляется одному получателю"""
+    return len(broadcast_parts(payload))
+
+async def send_broadcast_payload(bot, chat_id, payload: dict, delivered: set = None):
+    """Отправка подготовленного содержимого рассылки одному получателю
+
+    Args:
+        delivered: номера уже доставленных частей: они пропускаются, отправленные добавляются
+            (при повторе после RetryAfter заголовок не отправляется второй раз)
+    """
+    for index, (method_name, kwargs) in enumerate(broadcast_parts(payload)):
+        if delivered is not None and index in delivered:
+            continue
+        await getattr(bot, method_name)(chat_id, **kwargs)
+        if delivered is not None:
+            delivered.add(index)
+
+class TokenBucket:
+    """Глобальный ограничитель скорости отправки с возможностью паузы"""
+
+    def __init__(self, rate: float, capacity: float = GLOBAL_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """Остановка выдачи токенов (например, по TelegramRetryAfter)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._updated = self._paused_until
+        self._tokens = 0
+
+    async def acquire(self, cost: float = 1):
+        """Ожидание, пока в ведре не появится нужное количество токенов"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                # Запрос дороже емкости ведра ждет полного ведра и уходит в долг
+                needed = min(cost, self.capacity)
+                if self._tokens >= needed:
+                    self._tokens -= cost
+                    return
+
+                await asyncio.sleep((needed - self._tokens) / self.rate)
+
+class BroadcastRateLimiter:
+    """Ограничение скорости рассылки: общий лимит бота и лимит на один чат"""
+
+    def __init__(self, global_rate: float = GLOBAL_RATE, per_chat_interval: float = PER_CHAT_INTERVAL):
+        self.bucket = TokenBucket(global_rate)
+        self.per_chat_interval = per_chat_interval
+        self._chat_next_send = {}
+
+    def pause(self, seconds: float):
+        self.bucket.pause(seconds)
+
+    async def acquire(self, chat_id, cost: int = 1):
+        now = time.monotonic()
+        next_send = self._chat_next_send.get(chat_id, 0.0)
+        self._chat_next_send[chat_id] = max(now, next_send) + self.per_chat_interval * cost
+
+        if next_send > now:
+            await asyncio.sleep(next_send - now)
+
+        await self.bucket.acquire(cost)
+
+        # Не даем словарю расти бесконечно: удаляем чаты, для которых лимит уже истек
+        if len(self._chat_next_send) > 10000:
+            now = time.monotonic()
+            self._chat_next_send = {
+                key: value for key, value in self._chat_next_send.items() if value > now
+            }
+
+@dataclass
+class BroadcastResult:
+    sent: int = 0
+    failed: int = 0
+
+    @property
+    def processed(self) -> int:
+        return self.sent + self.failed
+
+# Общий ограничитель для всех рассылок бота
+broadcast_limiter = BroadcastRateLimiter()
+
+class BroadcastEngine:
+    """Параллельная рассылка с ограниченным пулом воркеров и общим ограничителем скорости"""
+
+    def __init__(self, limiter: BroadcastRateLimiter = None, workers: int = BROADCAST_WORKERS,
+                 max_retries: int = MAX_RETRIES):
+        self.limiter = limiter or broadcast_limiter
+        self.workers = workers
+        self.max_retries = max_retries
+
+    async def _deliver(self, chat_id, send, cost) -> bool:
+        # Части сообщения, уже доставленные получателю: повтор отправляет и оплачивает только остальные
+        delivered = set()
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire(chat_id, max(1, cost - len(delivered)))
+            try:
+                await send(chat_id, delivered)
+                return True
+            except TelegramRetryAfter as e:
+                # Telegram просит подождать - останавливаем всю рассылку, а недоставленные части отправляем повторно
+                logger.warning(f"Flood control on chat {chat_id}, pausing broadcast for {e.retry_after}s")
+                self.limiter.pause(e.retry_after)
+            except Exception as e:
+                logger.error(f"Failed to send broadcast message to {chat_id}: {e}")
+                return False
+
+        logger.error(f"Giving up on chat {chat_id} after {self.max_retries} retries")
+        return False
+
+    async def run(self, chat_ids, send, cost: int = 1, on_result=None) -> BroadcastResult:
+        """
+        Рассылка по списку чатов
+
+        Args:
+            chat_ids: идентификаторы получателей
+            send: корутина send(chat_id, delivered), отправляющая сообщение одному получателю;
+                delivered - множество номеров уже доставленных частей, которые при повторе пропускаются
+            cost: количество сообщений на одного получателя
+            on_result: необязательная корутина on_result(chat_id, success, result)
+
+        Returns:
+            BroadcastResult: количество доставленных и недоставленных сообщений
+        """
+        result = BroadcastResult()
+        recipients = iter(chat_ids)
+
+        async def worker():
+            # Воркеры разбирают общий итератор, пока получатели не закончатся
+            for chat_id in recipients:
+                success = await self._deliver(chat_id, send, cost)
+                if success:
+                    result.sent += 1
+                else:
+                    result.failed += 1
+
+                if on_result is not None:
+                    try:
+                        await on_result(chat_id, success, result)
+                    except Exception as e:
+                        logger.error(f"Broadcast result callback failed: {e}")
+
+        await asyncio.gather(*(worker() for _ in range(self.workers)))
+        return result
@@ -0,0 +1,211 @@
+# utils/broadcast_queue.py
+import asyncio
+import json
+import logging
+import time
+
+from database import db
+from utils.broadcast import BroadcastEngine, send_broadcast_payload, payload_cost
+from utils.bot_session import disable_retries
+from utils.outbound import BULK, set_lane
+from utils.workers import MULTI_WORKER
+
+logger = logging.getLogger(__name__)
+
+# Статусы доставки записываются в базу пачками, а не после каждого получателя
+FLUSH_SIZE = 50
+FLUSH_INTERVAL = 2.0
+# Пауза перед повторной записью статусов, если запись не удалась
+FLUSH_RETRY_DELAY = 5.0
+RECIPIENTS_CHUNK = 1000
+# В режиме нескольких воркеров рассылки создаются в других процессах - проверяем базу периодически
+JOB_POLL_INTERVAL = 5.0
+# Попытки выполнения рассылки, которая завершается ошибкой, и максимальная пауза между ними
+MAX_JOB_ATTEMPTS = 5
+MAX_JOB_BACKOFF = 60.0
+
+class BroadcastQueue:
+    """Фоновый воркер, выполняющий сохраненные в базе рассылки (переживает перезапуск бота)"""
+
+    def __init__(self, engine: BroadcastEngine = None):
+        self.engine = engine or BroadcastEngine()
+        self._bot = None
+        self._task = None
+        self._wakeup = asyncio.Event()
+        # Статусы, еще не записанные в базу: job_id -> {telegram_id: status}. Этим получателям уже отправлено,
+        # поэтому следующая пачка получателей не выбирается, пока статусы не записаны (иначе они снова pending)
+        self._unsaved = {}
+        # Рассылки после ошибки: job_id -> время (monotonic), раньше которого попытка не повторяется
+        self._retry_at = {}
+
+    def start(self, bot):
+        """Запуск воркера: незавершенные рассылки продолжаются с места остановки"""
+        self._bot = bot
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Остановка воркера; уже отправленные статусы сохраняются"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def enqueue(self, sender_id, payload: dict):
+        """Сохранение новой рассылки в базу и пробуждение воркера"""
+        job_id = await db.create_broadcast_job(sender_id, json.dumps(payload, ensure_ascii=False))
+        if job_id is not None:
+            self._wakeup.set()
+        return job_id
+
+    async def _run(self):
+        # RetryAfter рассылки обрабатывает сам движок: он приостанавливает всю отправку, а не один запрос
+        disable_retries()
+        # Рассылки уступают общий лимит отправки ответам пользователям
+        set_lane(BULK)
+        while True:
+            self._wakeup.clear()
+            try:
+                jobs = await db.get_unfinished_broadcast_jobs()
+            except Exception as e:
+                logger.error(f"Failed to load broadcast jobs: {e}")
+                jobs = []
+
+            processed = False
+            for job_id, sender_id, payload, attempts in jobs:
+                if self._retry_at.get(job_id, 0.0) > time.monotonic():
+                    continue
+                processed = True
+                try:
+                    await self._process_job(job_id, sender_id, json.loads(payload), attempts)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    await self._job_failed(job_id, sender_id, attempts + 1, e)
+
+            if not processed:
+                # Ждем новую рассылку или время повтора отложенной
+                timeouts = [retry_at - time.monotonic() for retry_at in self._retry_at.values()]
+                if MULTI_WORKER:
+                    timeouts.append(JOB_POLL_INTERVAL)
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), max(0.0, min(timeouts)) if timeouts else None)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _job_failed(self, job_id, sender_id, attempts, error):
+        """Учет неудачной попытки: повтор с растущей паузой, после MAX_JOB_ATTEMPTS рассылка отмечается failed"""
+        failed = attempts >= MAX_JOB_ATTEMPTS
+        logger.error(f"Broadcast job #{job_id} attempt {attempts} failed: {error}")
+        # Пауза нужна и если попытку не удалось сохранить: иначе та же рассылка сразу запустится снова
+        self._retry_at[job_id] = time.monotonic() + min(2 ** attempts, MAX_JOB_BACKOFF)
+        try:
+            await db.set_broadcast_job_attempts(job_id, attempts, failed)
+        except Exception as e:
+            logger.error(f"Failed to save broadcast job #{job_id} attempts: {e}")
+            return
+        if not failed:
+            return
+
+        self._retry_at.pop(job_id, None)
+        self._unsaved.pop(job_id, None)
+        try:
+            await self._bot.send_message(
+                sender_id, f"❌ Рассылка #{job_id} остановлена после {attempts} неудачных попыток: {error}"
+            )
+        except Exception as e:
+            logger.error(f"Failed to send broadcast failure report to {sender_id}: {e}")
+
+    async def _process_job(self, job_id, sender_id, payload: dict, attempts=0):
+        bot = self._bot
+        stats = await db.get_broadcast_stats(job_id)
+        total = sum(stats.values())
+        processed = total - stats.get("pending", 0)
+        logger.info(f"Processing broadcast job #{job_id}. Recipients: {total}, already processed: {processed}")
+
+        # Сообщение о начале - только при первой попытке, повторы после ошибки его не дублируют
+        progress_msg = None
+        if not attempts:
+            try:
+                progress_msg = await bot.send_message(sender_id, f"⏳ Рассылка #{job_id}: начинаю отправку {total} получателям...")
+            except Exception as e:
+                logger.error(f"Failed to send broadcast progress to {sender_id}: {e}")
+
+        unsaved = self._unsaved.setdefault(job_id, {})
+        last_flush = time.monotonic()
+
+        async def flush():
+            nonlocal last_flush
+            last_flush = time.monotonic()
+            if not unsaved:
+                return
+            # Снимок до записи: воркеры продолжают добавлять новые статусы; записанные удаляются только после успеха
+            batch = list(unsaved.items())
+            if await db.set_broadcast_statuses(job_id, batch):
+                for chat_id, _ in batch:
+                    del unsaved[chat_id]
+
+        async def on_result(chat_id, success, result):
+            nonlocal processed
+            processed += 1
+            unsaved[chat_id] = "sent" if success else "failed"
+            if len(unsaved) >= FLUSH_SIZE or time.monotonic() - last_flush >= FLUSH_INTERVAL:
+                await flush()
+                if progress_msg is not None:
+                    try:
+                        await progress_msg.edit_text(
+                            f"⏳ Рассылка #{job_id}: обработано {processed}/{total}"
+                        )
+                    except Exception:
+                        pass
+
+        try:
+            while True:
+                await flush()
+                if unsaved:
+                    # Повторяется только запись: получатели с незаписанными статусами в базе еще pending
+                    logger.warning(
+                        f"Broadcast job #{job_id}: {len(unsaved)} statuses not saved, retry in {FLUSH_RETRY_DELAY} s"
+                    )
+                    await asyncio.sleep(FLUSH_RETRY_DELAY)
+                    continue
+                recipients = await db.get_pending_broadcast_recipients(job_id, limit=RECIPIENTS_CHUNK)
+                if not recipients:
+                    break
+                await self.engine.run(
+                    recipients,
+                    lambda chat_id, delivered: send_broadcast_payload(bot, chat_id, payload, delivered),
+                    cost=payload_cost(payload),
+                    on_result=on_result
+                )
+        finally:
+            # Сохраняем статусы и при остановке бота посреди рассылки
+            await flush()
+
+        del self._unsaved[job_id]
+        self._retry_at.pop(job_id, None)
+        await db.finish_broadcast_job(job_id)
+        stats = await db.get_broadcast_stats(job_id)
+        logger.info(f"Broadcast job #{job_id} completed. Sent: {stats.get('sent', 0)}, Failed: {stats.get('failed', 0)}")
+
+        if progress_msg is not None:
+            try:
+                await progress_msg.delete()
+            except Exception:
+                pass
+
+        result_message = (
+            f"📊 Рассылка #{job_id} завершена!\n\n"
+            f"🔐 Получателей: {total}\n"
+            f"✅ Отправлено: {stats.get('sent', 0)}\n"
+            f"❌ Не доставлено: {stats.get('failed', 0)}"
+        )
+        try:
+            await bot.send_message(sender_id, result_message)
+        except Exception as e:
+            logger.error(f"Failed to send broadcast report to {sender_id}: {e}")
+
+# Глобальная очередь рассылок
+broadcast_queue = BroadcastQueue()
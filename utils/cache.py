@@ -0,0 +1,52 @@
+# utils/cache.py
+from collections import OrderedDict
+
+_MISSING = object()
+
+class LRUCache:
+    """Ограниченный по размеру кэш с вытеснением давно не использованных записей и счетчиками попаданий"""
+
+    def __init__(self, maxsize: int, on_evict=None):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._on_evict = on_evict
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def lookup(self, key):
+        """Поиск значения: возвращает (найдено, значение), чтобы можно было кэшировать None"""
+        value = self._data.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return False, None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return True, value
+
+    def set(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            evicted_key, evicted_value = self._data.popitem(last=False)
+            if self._on_evict is not None:
+                self._on_evict(evicted_key, evicted_value)
+
+    def pop(self, key):
+        """Удаление записи; возвращает удаленное значение или None"""
+        return self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
@@ -1,54 +1,196 @@
+import asyncio
+import logging
+import multiprocessing
 import os
 import random
+import signal
 import string
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image, ImageDraw, ImageFont
 from io import BytesIO
 
+logger = logging.getLogger(__name__)
+
+# Размер пула готовых капч и количество процессов, которые его пополняют
+CAPTCHA_POOL_SIZE = 50
+CAPTCHA_PROCESSES = 2
+
+# Шрифт капчи (.ttf/.otf): путь задается переменной окружения CAPTCHA_FONT_PATH. Шрифт в проект не входит:
+# без переменной используется Arial или DejaVu Sans из системы, если их нет - шрифт Pillow по умолчанию
+CAPTCHA_FONT_PATH = os.getenv("CAPTCHA_FONT_PATH")
+CAPTCHA_FONT_SIZE = 45
+CAPTCHA_ALPHABET = string.ascii_uppercase + string.digits
+
+# Доля пикселей шума: 16/256 ≈ 6%, примерно как 1000 точек на картинке 200x80
+NOISE_THRESHOLD = 16
+_NOISE_LUT = [255 if value < NOISE_THRESHOLD else 0 for value in range(256)]
+
 def generate_captcha_text(length=5):
-    """Generate random text for captcha"""
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
+    """Случайный текст капчи"""
+    return ''.join(random.choices(CAPTCHA_ALPHABET, k=length))
+
+class CaptchaRenderer:
+    """Отрисовка капчи: шрифт, пустой холст и атлас символов готовятся один раз"""
+
+    def __init__(self, font_path=CAPTCHA_FONT_PATH, font_size=CAPTCHA_FONT_SIZE, width=200, height=80,
+                 alphabet=CAPTCHA_ALPHABET):
+        self.width = width
+        self.height = height
+        self.font_size = font_size
+        self.font = self._load_font(font_path, font_size)
+        # Пустой белый холст: для каждой картинки копируется, а не создается заново
+        self._template = Image.new('RGB', (width, height), color='white')
+        # Атлас символов: символ -> (маска, смещение маски по x, ширина символа)
+        self._glyphs = {}
+        for char in alphabet:
+            self._glyph(char)
+
+    @staticmethod
+    def _load_font(font_path, font_size):
+        """Первый доступный шрифт: из настройки, Arial, DejaVu Sans, шрифт Pillow по умолчанию"""
+        for path in (font_path, "arial.ttf", "DejaVuSans.ttf"):
+            if not path:
+                continue
+            try:
+                return ImageFont.truetype(path, font_size)
+            except OSError:
+                if path == font_path:
+                    logger.warning(f"Captcha font not found at {font_path}, trying system fonts")
+        logger.warning("No TrueType font for captcha found, using Pillow default font")
+        try:
+            return ImageFont.load_default(size=font_size)
+        except TypeError:
+            # Старый Pillow: шрифт по умолчанию без выбора размера
+            return ImageFont.load_default()
+
+    def _glyph(self, char):
+        glyph = self._glyphs.get(char)
+        if glyph is None:
+            advance = max(1, int(round(self.font.getlength(char))))
+            # Маска покрывает весь контур символа: части за пределами его ширины (выносные элементы) не обрезаются
+            left, _, right, _ = self.font.getbbox(char)
+            offset = min(0, left)
+            mask = Image.new('L', (max(advance, right) - offset, self.height))
+            ImageDraw.Draw(mask).text((-offset, 0), char, font=self.font, fill=255)
+            glyph = self._glyphs[char] = (mask, offset, advance)
+        return glyph
+
+    def render(self, text):
+        """Картинка капчи с текстом в формате PNG"""
+        image = self._template.copy()
+        draw = ImageDraw.Draw(image)
+
+        # Шум (случайные точки): одна маска из случайных байтов вместо вызова point() на каждую точку
+        noise = Image.frombytes('L', (self.width, self.height), os.urandom(self.width * self.height))
+        image.paste('gray', mask=noise.point(_NOISE_LUT))
+
+        # Линии для шума
+        for _ in range(5):
+            x1 = random.randint(0, self.width)
+            y1 = random.randint(0, self.height)
+            x2 = random.randint(0, self.width)
+            y2 = random.randint(0, self.height)
+            draw.line([(x1, y1), (x2, y2)], fill='gray', width=1)
+
+        # Позиция текста и вставка символов из атласа
+        glyphs = [self._glyph(char) for char in text]
+        text_x = (self.width - sum(advance for _, _, advance in glyphs)) // 2
+        text_y = (self.height - self.font_size) // 2
+        for mask, offset, advance in glyphs:
+            image.paste('black', (text_x + offset, text_y), mask)
+            text_x += advance
+
+        # Картинка в байтах
+        img_byte_array = BytesIO()
+        image.save(img_byte_array, format='PNG')
+        return img_byte_array.getvalue()
+
+# Отрисовщик текущего процесса (каждый процесс генерации создает свой один раз)
+_renderer = None
+
+def get_renderer():
+    """Отрисовщик капчи текущего процесса"""
+    global _renderer
+    if _renderer is None:
+        _renderer = CaptchaRenderer()
+    return _renderer
+
+def _init_process():
+    """Инициализация процесса генерации: Ctrl+C обрабатывает бот, пул останавливается при его завершении"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    get_renderer()
 
 def generate_captcha_image(text):
-    """Generate captcha image from text"""
-    # Create image with white background
-    width = 200
-    height = 80
-    image = Image.new('RGB', (width, height), color='white')
-    draw = ImageDraw.Draw(image)
-    
-    # Add noise (random dots)
-    for _ in range(1000):
-        x = random.randint(0, width)
-        y = random.randint(0, height)
-        draw.point((x, y), fill='gray')
-    
-    # Add lines for noise
-    for _ in range(5):
-        x1 = random.randint(0, width)
-        y1 = random.randint(0, height)
-        x2 = random.randint(0, width)
-        y2 = random.randint(0, height)
-        draw.line([(x1, y1), (x2, y2)], fill='gray', width=1)
-    
-    # Calculate font size and position
-    font_size = 45
-    try:
-        # Try to use Arial font if available
-        font = ImageFont.truetype("arial.ttf", font_size)
-    except:
-        # Fallback to default font
-        font = ImageFont.load_default()
-    
-    # Calculate text size and position
-    text_width = font.getlength(text)
-    text_x = (width - text_width) // 2
-    text_y = (height - font_size) // 2
-    
-    # Add text to image
-    draw.text((text_x, text_y), text, font=font, fill='black')
-    
-    # Return image as bytes
-    img_byte_array = BytesIO()
-    image.save(img_byte_array, format='PNG')
-    img_byte_array.seek(0)
-    return img_byte_array.getvalue()
+    """Картинка капчи для текста"""
+    return get_renderer().render(text)
+
+def generate_captcha():
+    """Текст капчи и PNG-картинка (выполняется в процессах генерации)"""
+    text = generate_captcha_text()
+    return text, generate_captcha_image(text)
+
+class CaptchaPool:
+    """Пул заранее сгенерированных капч, который пополняется в отдельных процессах"""
+
+    def __init__(self, size=CAPTCHA_POOL_SIZE, processes=CAPTCHA_PROCESSES):
+        self.size = size
+        self.processes = processes
+        self._queue = None
+        self._executor = None
+        self._tasks = []
+
+    def start(self):
+        """Запуск процессов генерации и фонового пополнения пула"""
+        self._queue = asyncio.Queue(maxsize=self.size)
+        # Каждый процесс загружает шрифт и атлас символов один раз при запуске
+        get_renderer()
+        # Процессы запускаются через spawn, а не fork: fork копирует процесс бота с его потоками
+        # (исполнитель базы, запись FSM) и открытыми соединениями, и дочерний процесс может зависнуть на чужой блокировке
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.processes, mp_context=multiprocessing.get_context("spawn"), initializer=_init_process
+        )
+        self._tasks = [asyncio.create_task(self._refill()) for _ in range(self.processes)]
+
+    async def stop(self):
+        """Остановка пополнения пула и процессов генерации"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _refill(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                captcha = await loop.run_in_executor(self._executor, generate_captcha)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to generate captcha: {e}")
+                await asyncio.sleep(1)
+                continue
+            # Ожидает, пока в пуле не освободится место
+            await self._queue.put(captcha)
+
+    async def get(self):
+        """Получение капчи (текст, PNG) - готовой из пула или сгенерированной вне event loop"""
+        if self._queue is not None:
+            try:
+                return self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                logger.warning("Captcha pool is empty, generating captcha on demand")
+
+        if self._executor is not None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, generate_captcha)
+
+        return await asyncio.to_thread(generate_captcha)
+
+    def qsize(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+# Глобальный пул капч
+captcha_pool = CaptchaPool()
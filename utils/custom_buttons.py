@@ -0,0 +1,99 @@
+# utils/custom_buttons.py
+import logging
+from dataclasses import dataclass
+
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+from utils.url_validator import validate_and_fix_url, is_valid_url, get_url_display_name
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class CustomButton:
+    """Подготовленная кастомная кнопка: текст ответа и инлайн-клавиатура со ссылкой"""
+    name: str
+    url: str
+    text: str
+    reply_markup: InlineKeyboardMarkup = None
+
+# Индекс активных кнопок: (версия кастомных кнопок, {название: CustomButton})
+_index_cache = None
+
+def _prepare_button(name, url) -> CustomButton:
+    """Проверка ссылки и сборка ответа для одной кнопки"""
+    try:
+        # Проверяем и исправляем URL
+        fixed_url = validate_and_fix_url(url)
+
+        if not is_valid_url(fixed_url):
+            # Если URL невалидный, показываем текстовое сообщение
+            return CustomButton(
+                name=name,
+                url=url,
+                text=f"🔗 {name}\n\n"
+                     f"Ссылка: {url}\n\n"
+                     f"⚠️ Некорректный формат ссылки. Обратитесь к администратору."
+            )
+
+        # Создаем инлайн-клавиатуру с кнопкой-ссылкой
+        display_name = get_url_display_name(fixed_url)
+        keyboard = InlineKeyboardMarkup(inline_keyboard=[
+            [InlineKeyboardButton(text=f"🔗 Перейти в {display_name}", url=fixed_url)]
+        ])
+        return CustomButton(
+            name=name,
+            url=fixed_url,
+            text=f"🔗 {name}\n\n"
+                 f"Нажмите на кнопку ниже, чтобы перейти:",
+            reply_markup=keyboard
+        )
+    except Exception as e:
+        logger.error(f"Error processing custom button URL: {e}")
+        # В случае ошибки показываем текстовое сообщение
+        return CustomButton(
+            name=name,
+            url=url,
+            text=f"🔗 {name}\n\n"
+                 f"Ссылка: {url}\n\n"
+                 f"⚠️ Ошибка при обработке ссылки. Обратитесь к администратору."
+        )
+
+async def get_custom_button_index() -> dict:
+    """Активные кастомные кнопки в порядке сортировки, по названию
+
+    Индекс перестраивается только при изменении кастомных кнопок в базе. Если прочитать кнопки
+    не удалось, индекс не кэшируется (следующий вызов прочитает их снова) и выбрасывается RuntimeError.
+    """
+    global _index_cache
+
+    # Импортируем здесь, чтобы избежать циклического импорта
+    from database import db
+
+    version = db.custom_buttons_version
+    if _index_cache is not None and _index_cache[0] == version:
+        return _index_cache[1]
+
+    rows = await db.get_custom_buttons(active_only=True)
+    if rows is None:
+        raise RuntimeError("Custom buttons could not be read from the database")
+
+    index = {}
+    for button_id, name, url, is_active in rows:
+        # При совпадении названий срабатывает первая кнопка, как и раньше
+        if name not in index:
+            index[name] = _prepare_button(name, url)
+
+    _index_cache = (version, index)
+    logger.info(f"Rebuilt custom button index (version {version}) with {len(index)} buttons")
+    return index
+
+async def find_custom_button(text) -> CustomButton | None:
+    """Поиск кастомной кнопки по тексту сообщения"""
+    if not text:
+        return None
+    try:
+        index = await get_custom_button_index()
+    except Exception as e:
+        logger.error(f"Error getting custom buttons: {e}")
+        return None
+    return index.get(text.strip())
@@ -0,0 +1,231 @@
+# utils/fsm_storage.py
+import asyncio
+import heapq
+import json
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from database import db
+from models import AuthStates, LinkStates, MessageStates, RegistrationStates
+from utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Количество состояний в памяти
+FSM_CACHE_SIZE = 10000
+# Изменения записываются в базу пачками: раз в FSM_FLUSH_INTERVAL секунд или при FSM_FLUSH_SIZE изменениях
+FSM_FLUSH_INTERVAL = 1.0
+FSM_FLUSH_SIZE = 100
+# Как часто удаляются истекшие состояния (секунды)
+FSM_SWEEP_INTERVAL = 30.0
+
+# Время жизни состояния после последнего изменения (секунды): брошенный диалог удаляется вместе с данными.
+# Ключ - состояние или группа состояний; остальные (диалоги администратора) живут FSM_DEFAULT_TTL
+FSM_DEFAULT_TTL = 24 * 60 * 60
+FSM_STATE_TTL = {
+    AuthStates.waiting_for_captcha.state: 5 * 60,
+    AuthStates.__full_group_name__: 15 * 60,
+    RegistrationStates.__full_group_name__: 15 * 60,
+    LinkStates.__full_group_name__: 60 * 60,
+    MessageStates.__full_group_name__: 60 * 60,
+}
+
+_EMPTY = (None, None, None)
+
+def make_key(key: StorageKey) -> str:
+    """Строковый ключ записи FSM"""
+    return f"{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id or ''}:{key.destiny}"
+
+def dump_data(data: Dict[str, Any]) -> Optional[str]:
+    """Компактный JSON данных (пустые данные не хранятся)"""
+    if not data:
+        return None
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+def load_data(raw: Optional[str]) -> Dict[str, Any]:
+    return json.loads(raw) if raw else {}
+
+def state_ttl(state: Optional[str]) -> float:
+    """Время жизни состояния: своё, его группы или по умолчанию"""
+    if state is None:
+        return FSM_DEFAULT_TTL
+    ttl = FSM_STATE_TTL.get(state)
+    if ttl is None:
+        ttl = FSM_STATE_TTL.get(state.split(":", 1)[0], FSM_DEFAULT_TTL)
+    return ttl
+
+class SQLiteStorage(BaseStorage):
+    """Хранилище FSM в базе бота: состояния общие для всех процессов и переживают перезапуск
+
+    Чтение идет из LRU-кэша в памяти, изменения записываются в базу в фоне пачками.
+    В режиме нескольких воркеров чат всегда обрабатывается одним процессом, поэтому кэш не устаревает.
+    Каждая запись истекает через state_ttl(state) после последнего изменения: истекшие записи
+    находятся по куче времен истечения и удаляются фоновой задачей вместе с данными.
+    """
+
+    def __init__(self, cache_size=FSM_CACHE_SIZE, flush_interval=FSM_FLUSH_INTERVAL, flush_size=FSM_FLUSH_SIZE,
+                 sweep_interval=FSM_SWEEP_INTERVAL):
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.sweep_interval = sweep_interval
+        # ключ -> (state, data, expires_at); data хранится сериализованной, чтобы изменения словаря не попадали в кэш
+        self.cache = LRUCache(cache_size, on_evict=self._forget)
+        self._dirty = {}  # ключ -> (state, data, expires_at), еще не записанные в базу
+        # Время истечения записей в памяти и куча (expires_at, ключ); устаревшие элементы кучи пропускаются
+        self._expires = {}
+        self._heap = []
+        self.evicted = 0
+        self._wakeup = None
+        self._task = None
+        self._closing = False
+
+    def _forget(self, key, record):
+        # Вытесненная из кэша запись истекает в базе и удаляется запросом по индексу
+        if key not in self._dirty:
+            self._expires.pop(key, None)
+
+    def _track(self, key, record):
+        expires_at = record[2]
+        if expires_at is None:
+            self._expires.pop(key, None)
+        elif self._expires.get(key) != expires_at:
+            self._expires[key] = expires_at
+            heapq.heappush(self._heap, (expires_at, key))
+
+    async def _load(self, key: str):
+        record = self._dirty.get(key)
+        if record is None:
+            found, record = self.cache.lookup(key)
+            if not found:
+                row = await db.get_fsm_record(key)
+                # Пока шел запрос, запись могла измениться или загрузиться другим вызовом
+                record = self._dirty.get(key)
+                if record is None:
+                    found, record = self.cache.lookup(key)
+                    if not found:
+                        record = tuple(row) if row else _EMPTY
+                        self.cache.set(key, record)
+                        self._track(key, record)
+        # Запись могла истечь до ближайшего прохода очистки
+        if record[2] is not None and record[2] <= time.time():
+            return _EMPTY
+        return record
+
+    def _store(self, key: str, state, data):
+        if state is None and data is None:
+            record = _EMPTY
+        else:
+            record = (state, data, time.time() + state_ttl(state))
+        self.cache.set(key, record)
+        self._dirty[key] = record
+        self._track(key, record)
+        if self._task is None:
+            self.start()
+        if len(self._dirty) >= self.flush_size:
+            self._wakeup.set()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        if isinstance(state, State):
+            state = state.state
+        key = make_key(key)
+        _, data, _ = await self._load(key)
+        self._store(key, state, data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _, _ = await self._load(make_key(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        key = make_key(key)
+        state, _, _ = await self._load(key)
+        self._store(key, state, dump_data(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data, _ = await self._load(make_key(key))
+        return load_data(data)
+
+    def sweep(self, now=None) -> int:
+        """Удаление истекших записей из памяти (из базы они удаляются при следующей записи)"""
+        now = time.time() if now is None else now
+        evicted = 0
+        while self._heap and self._heap[0][0] <= now:
+            expires_at, key = heapq.heappop(self._heap)
+            if self._expires.get(key) != expires_at:
+                continue
+            del self._expires[key]
+            self.cache.pop(key)
+            self._dirty[key] = _EMPTY
+            evicted += 1
+        self.evicted += evicted
+        return evicted
+
+    async def _sweep_database(self):
+        now = time.time()
+        self.sweep(now)
+        # Сначала записываем удаления из памяти, чтобы не посчитать их второй раз
+        await self.flush()
+        # В базе остаются истекшие записи, которых нет в памяти (например, после перезапуска)
+        deleted = await db.delete_expired_fsm_states(now)
+        self.evicted += deleted
+        if deleted:
+            logger.info(f"Removed {deleted} expired FSM states")
+
+    async def stats(self) -> dict:
+        """Количество живых состояний (в базе, с учетом незаписанных изменений) и удаленных по времени"""
+        await self.flush()
+        return {"live": await db.count_fsm_states(time.time()), "evicted": self.evicted}
+
+    async def flush(self):
+        """Запись накопленных изменений в базу"""
+        if not self._dirty:
+            return
+        batch = self._dirty
+        self._dirty = {}
+        try:
+            await db.save_fsm_records([(key, *record) for key, record in batch.items()])
+        except Exception:
+            # Возвращаем изменения, если за время записи их не перезаписали более новыми
+            for key, record in batch.items():
+                self._dirty.setdefault(key, record)
+            raise
+
+    def start(self):
+        """Запуск фоновой записи изменений и удаления истекших записей"""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        # Цикл завершается по флагу, а не отменой задачи, чтобы не прервать запись пачки на середине
+        next_sweep = 0.0
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                if time.monotonic() >= next_sweep:
+                    next_sweep = time.monotonic() + self.sweep_interval
+                    await self._sweep_database()
+                else:
+                    await self.flush()
+            except Exception as e:
+                logger.error(f"Failed to save FSM states: {e}")
+
+    async def close(self) -> None:
+        """Остановка фоновой записи и сохранение оставшихся изменений"""
+        if self._task is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+            self._closing = False
+        await self.flush()
+
+# Глобальное хранилище FSM
+fsm_storage = SQLiteStorage()
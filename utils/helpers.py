@@ -21,7 +21,9 @@ async def cancel_state(message: types.Message, state: FSMContext) -> bool:
         # Проверяем, авторизован ли пользователь
         from database import db  # Import here to avoid circular imports
         from aiogram.types import ReplyKeyboardRemove
-        user = db.get_user_by_telegram_id(message.from_user.id)
+        from utils.replies import ReplyComposer
+        user = await db.get_user_by_telegram_id(message.from_user.id)
+        reply = ReplyComposer(message)
         
         if user:
             # Пользователь авторизован
@@ -29,60 +31,121 @@ async def cancel_state(message: types.Message, state: FSMContext) -> bool:
             
             if is_admin:
                 # Для админа отправляем сообщение с кнопками администрирования
-                await message.answer(
-                    "Действие отменено.", 
-                    reply_markup=get_admin_keyboard()
-                )
+                reply.add("Действие отменено.", reply_markup=get_admin_keyboard())
             else:
-                # Для обычного авторизованного пользователя - сначала убираем reply клавиатуру
-                await message.answer("Действие отменено.", reply_markup=ReplyKeyboardRemove())
-                # Затем отправляем инлайн клавиатуру
+                # Для обычного пользователя клавиатура отмены заменяется основной в том же сообщении
                 from utils.keyboards import get_main_keyboard
-                await message.answer("Выберите действие:", reply_markup=get_main_keyboard())
+                reply.add("Действие отменено.", reply_markup=ReplyKeyboardRemove())
+                reply.add("Выберите действие:", reply_markup=await get_main_keyboard())
         else:
             # Если не авторизован - сначала убираем reply клавиатуру, затем отправляем инлайн кнопку
+            # (это два сообщения: у одного сообщения не может быть обеих клавиатур)
             from utils.keyboards import get_start_button
-            await message.answer("Действие отменено.", reply_markup=ReplyKeyboardRemove())
-            await message.answer("Нажмите Старт для начала работы:", reply_markup=get_start_button())
+            reply.add("Действие отменено.", reply_markup=ReplyKeyboardRemove())
+            reply.add("Нажмите Старт для начала работы:", reply_markup=get_start_button())
         
+        await reply.send()
         return True
     return False
 
-def format_user_list(users: list) -> str:
-    """Форматирование списка пользователей - используется только для коротких списков"""
-    if not users:
-        return "Список пользователей пуст."
+async def send_welcome_message(message: types.Message):
+    """Отправка приветственного сообщения с логотипом (если он есть)"""
+    from utils.media import media_registry, LOGO_PATH  # Import here to avoid circular imports
+    from utils.welcome import welcome_message
+
+    # Текст и parse_mode берутся из памяти, HTML проверен при загрузке приветствия
+    welcome = welcome_message.get()
+    if media_registry.exists(LOGO_PATH):
+        try:
+            await media_registry.answer_photo(message, LOGO_PATH, caption=welcome.text, parse_mode=welcome.parse_mode)
+        except Exception as e:
+            logger.error(f"Error sending welcome message with photo: {e}")
+            await media_registry.answer_photo(message, LOGO_PATH, caption=welcome.text, parse_mode=None)
+    else:
+        try:
+            await message.answer(welcome.text, parse_mode=welcome.parse_mode)
+        except Exception as e:
+            logger.error(f"Error sending welcome message: {e}")
+            await message.answer(welcome.text, parse_mode=None)
+
+def format_admin_user_entry(user_data, max_link_length=None) -> str:
+    """Форматирование одного пользователя для списка администратора
+
+    Args:
+        user_data: (id, username, password, telegram_id, link, full_name)
+        max_link_length: обрезать ссылки длиннее указанного (None - показывать полностью)
+    """
+    user_id, username, password, telegram_id, link, full_name = user_data
+    
+    # Формируем отображение имени
+    if full_name and full_name.strip():
+        display_name = f"{full_name} (@{username})"
+    else:
+        display_name = username
     
-    # Для отображения более 5 пользователей используем send_user_list_in_parts
-    if len(users) > 5:
-        return f"📊 Найдено пользователей: {len(users)}\n\n⚠️ Используется разбивка на части."
+    # Формируем текст для одного пользователя
+    user_text = f"🆔 ID: {user_id}\n"
+    user_text += f"👤 Имя: {display_name}\n"
+    user_text += f"📝 Логин: {username}\n"
+    user_text += f"🔐 Пароль: {password}\n"
+    
+    if telegram_id:
+        user_text += f"✅ Авторизован (TG: {telegram_id})\n"
+    else:
+        user_text += f"❌ Не авторизован\n"
+    
+    if link and max_link_length and len(link) > max_link_length:
+        link = link[:max_link_length] + "…"
+    
+    # Показываем ссылки полностью
+    if link:
+        user_text += f"🔗 Информация: {link}\n"
+    else:
+        user_text += f"🔗 Информация: —\n"
+    
+    user_text += "─" * 30 + "\n\n"
+    return user_text
+
+def iter_user_list_parts(users, max_length: int, max_link_length=None):
+    """Потоковая разбивка списка пользователей на части не длиннее max_length
+
+    Записи форматируются по мере обхода, готовая часть отдается, как только следующая запись в нее
+    не помещается (запись длиннее max_length отдается отдельной частью).
+
+    Args:
+        users: итерируемые строки (id, username, password, telegram_id, link, full_name)
+        max_length: максимальная длина части без заголовка сообщения
+        max_link_length: обрезать ссылки длиннее указанного (None - показывать полностью)
+
+    Yields:
+        (str, list): текст части и строки пользователей, которые в нее вошли
+    """
+    current_part = []
+    current_rows = []
+    current_length = 0
     
-    # Для короткого списка возвращаем базовую информацию
-    report = f"📊 Пользователи ({len(users)}):\n\n"
     for user_data in users:
         try:
-            user_id = user_data[0]
-            username = user_data[1]
-            telegram_id = user_data[2] if len(user_data) > 2 else None
-            full_name = user_data[4] if len(user_data) > 4 else None
-            
-            if full_name and full_name.strip():
-                display_name = f"{full_name} (@{username})"
-            else:
-                display_name = username
-            
-            report += f"🆔 {user_id}: {display_name}"
-            if telegram_id:
-                report += " ✅"
-            else:
-                report += " ❌"
-            report += "\n"
-            
+            user_entry = format_admin_user_entry(user_data, max_link_length)
         except Exception as e:
-            logger.error(f"Error formatting user in short list: {e}")
-            report += f"❌ Ошибка пользователя\n"
+            logger.error(f"Error processing user data: {e}")
+            # Добавляем базовую информацию даже при ошибке
+            user_entry = f"❌ Ошибка обработки пользователя ID: {user_data[0] if user_data else 'Unknown'}\n\n"
+        
+        if current_part and current_length + len(user_entry) > max_length:
+            # Если не помещается, отдаем текущую часть и начинаем новую
+            yield "".join(current_part).rstrip(), current_rows
+            current_part = []
+            current_rows = []
+            current_length = 0
+        
+        current_part.append(user_entry)
+        current_rows.append(user_data)
+        current_length += len(user_entry)
     
-    return report
+    # Отдаем последнюю часть
+    if current_part:
+        yield "".join(current_part).rstrip(), current_rows
 
 async def send_error_message(message: types.Message, error_text: str, reply_markup=None):
     """Отправка сообщения об ошибке"""
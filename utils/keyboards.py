@@ -1,6 +1,7 @@
 # utils/keyboards.py с отладкой
 import logging
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
+from utils.custom_buttons import get_custom_button_index
 
 logger = logging.getLogger(__name__)
 
@@ -25,60 +26,61 @@ def get_auth_keyboard():
     ]
     return ReplyKeyboardMarkup(keyboard=kb, resize_keyboard=True)
 
-def get_main_keyboard():
-    """Обычная клавиатура для авторизованных пользователей с кастомными кнопками"""
+# Кэш основной клавиатуры: (версия кастомных кнопок, клавиатура)
+_main_keyboard_cache = None
+
+def _build_main_keyboard(button_names=()):
+    """Сборка основной клавиатуры с кастомными кнопками"""
+    # Базовые кнопки
+    kb = [
+        [KeyboardButton(text='🔗 Моё актуальное'), KeyboardButton(text='🔄 Изменить')],
+        [KeyboardButton(text='✉️ Написать сообщение')]
+    ]
+    
+    # Добавляем кастомные кнопки
+    for button_name in button_names:
+        kb.append([KeyboardButton(text=button_name)])
+    
+    # Кнопка выхода в конце
+    kb.append([KeyboardButton(text='🚪 Выйти')])
+    
+    return ReplyKeyboardMarkup(
+        keyboard=kb, 
+        resize_keyboard=True, 
+        one_time_keyboard=False,
+        is_persistent=True
+    )
+
+async def get_main_keyboard():
+    """Обычная клавиатура для авторизованных пользователей с кастомными кнопками
+    
+    Клавиатура строится один раз и перестраивается только при изменении кастомных кнопок.
+    Клавиатура, собранная без прочитанных кнопок, не кэшируется.
+    """
+    global _main_keyboard_cache
+    
+    # Импортируем здесь, чтобы избежать циклического импорта
+    from database import db
+    
+    version = db.custom_buttons_version
+    if _main_keyboard_cache is not None and _main_keyboard_cache[0] == version:
+        return _main_keyboard_cache[1]
+    
     try:
-        # Импортируем здесь, чтобы избежать циклического импорта
-        from database import db
-        
-        # Базовые кнопки
-        kb = [
-            [KeyboardButton(text='🔗 Моё актуальное'), KeyboardButton(text='🔄 Изменить')],
-            [KeyboardButton(text='✉️ Написать сообщение')]
-        ]
-        
-        # Добавляем кастомные кнопки
-        try:
-            custom_buttons = db.get_custom_buttons(active_only=True)
-            logger.info(f"Found {len(custom_buttons)} custom buttons")
-            
-            for button_data in custom_buttons:
-                button_name = button_data[1]  # name
-                kb.append([KeyboardButton(text=button_name)])
-                logger.info(f"Added custom button: {button_name}")
-                
-        except Exception as e:
-            logger.error(f"Error getting custom buttons: {e}")
-            # Если возникла ошибка с базой данных, просто пропускаем кастомные кнопки
-            pass
-        
-        # Кнопка выхода в конце
-        kb.append([KeyboardButton(text='🚪 Выйти')])
-        
-        keyboard = ReplyKeyboardMarkup(
-            keyboard=kb, 
-            resize_keyboard=True, 
-            one_time_keyboard=False,
-            is_persistent=True
-        )
-        
-        logger.info(f"Created main keyboard with {len(kb)} rows")
-        return keyboard
-        
+        # Кнопки берем из индекса кастомных кнопок, он перестраивается по той же версии
+        custom_buttons = list(await get_custom_button_index())
     except Exception as e:
-        logger.error(f"Error creating main keyboard: {e}")
-        # Fallback клавиатура без кастомных кнопок
-        kb = [
-            [KeyboardButton(text='🔗 Моё актуальное'), KeyboardButton(text='🔄 Изменить')],
-            [KeyboardButton(text='✉️ Написать сообщение')],
-            [KeyboardButton(text='🚪 Выйти')]
-        ]
-        return ReplyKeyboardMarkup(
-            keyboard=kb, 
-            resize_keyboard=True, 
-            one_time_keyboard=False,
-            is_persistent=True
-        )
+        logger.error(f"Error getting custom buttons: {e}")
+        # Кнопки не прочитались: отдаем последнюю собранную клавиатуру (или без кастомных кнопок),
+        # кэш не обновляется - следующий вызов прочитает кнопки снова
+        if _main_keyboard_cache is not None:
+            return _main_keyboard_cache[1]
+        return _build_main_keyboard()
+    
+    keyboard = _build_main_keyboard(custom_buttons)
+    _main_keyboard_cache = (version, keyboard)
+    logger.info(f"Rebuilt main keyboard (version {version}) with {len(custom_buttons)} custom buttons")
+    return keyboard
 
 def get_admin_inline_keyboard():
     """Инлайн-клавиатура для базовых действий администраторов"""
@@ -145,4 +147,15 @@ def get_cancel_keyboard():
     kb = [
         [KeyboardButton(text='❌ Отмена')]
     ]
-    return ReplyKeyboardMarkup(keyboard=kb, resize_keyboard=True)
\ No newline at end of file
+    return ReplyKeyboardMarkup(keyboard=kb, resize_keyboard=True)
+
+def get_users_page_keyboard(view, first_id, last_id, has_prev, has_next):
+    """Инлайн-клавиатура для перелистывания списка пользователей"""
+    row = []
+    if has_prev:
+        row.append(InlineKeyboardButton(text='⬅️ Назад', callback_data=f'users:{view}:prev:{first_id}'))
+    if has_next:
+        row.append(InlineKeyboardButton(text='Вперед ➡️', callback_data=f'users:{view}:next:{last_id}'))
+    if not row:
+        return None
+    return InlineKeyboardMarkup(inline_keyboard=[row])
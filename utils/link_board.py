@@ -0,0 +1,95 @@
+# utils/link_board.py
+import logging
+
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest
+
+from database import db
+
+logger = logging.getLogger(__name__)
+
+# Пользователей в одном сообщении доски и максимальная длина записи:
+# 15 записей по 250 символов с заголовком помещаются в лимит 4096 символов
+BOARD_SHARD_SIZE = 15
+MAX_ENTRY_LENGTH = 250
+MESSAGE_LIMIT = 4096
+
+def shard_of(user_id) -> int:
+    """Номер сообщения доски, в котором находится пользователь"""
+    return (user_id - 1) // BOARD_SHARD_SIZE
+
+def shard_range(shard):
+    """Диапазон id пользователей сообщения доски"""
+    first_id = shard * BOARD_SHARD_SIZE + 1
+    return first_id, first_id + BOARD_SHARD_SIZE - 1
+
+def format_board_entry(username, link) -> str:
+    entry = f"👤 {username}\n🔗 {link}"
+    if len(entry) > MAX_ENTRY_LENGTH:
+        entry = entry[:MAX_ENTRY_LENGTH - 1] + "…"
+    return entry
+
+def render_shard(shard, users) -> str:
+    """Текст сообщения доски для пользователей (id, username, link) одного диапазона"""
+    first_id, last_id = shard_range(shard)
+    header = f"📋 Актуальные ссылки (пользователи #{first_id}–{last_id}):\n\n"
+    if not users:
+        return header + "Пока нет ссылок."
+    return (header + "\n\n".join(format_board_entry(username, link) for _, username, link in users))[:MESSAGE_LIMIT]
+
+class LinkBoard:
+    """Доска актуальных ссылок в канале: закрепленные сообщения, по одному на диапазон id пользователей
+
+    При обновлении ссылки перерисовывается и редактируется только сообщение с этим пользователем,
+    поэтому число запросов к API на обновление не зависит от количества партнеров.
+    """
+
+    def __init__(self):
+        self._boards = {}  # ID канала -> {часть: message_id}
+
+    async def _board(self, chat_id) -> dict:
+        board = self._boards.get(chat_id)
+        if board is None:
+            board = self._boards[chat_id] = await db.get_link_board(chat_id)
+        return board
+
+    async def update(self, bot, payloads):
+        """Обновление частей доски, затронутых пачкой изменений ссылок"""
+        chat_id = await db.get_channel("links")
+        if not chat_id:
+            logger.warning("Links channel not configured")
+            return
+
+        board = await self._board(chat_id)
+        user_ids = [payload.get('user_id') for payload in payloads]
+        if not board or None in user_ids:
+            # Доски в этом канале еще нет (или id пользователя неизвестен) - рисуем все части
+            shards = range(shard_of(await db.get_max_user_id()) + 1)
+        else:
+            shards = sorted({shard_of(user_id) for user_id in user_ids})
+
+        for shard in shards:
+            users = await db.get_user_links_in_range(*shard_range(shard))
+            await self._publish(bot, chat_id, board, shard, render_shard(shard, users))
+        logger.info(f"Link board updated: {len(payloads)} updates, {len(shards)} messages")
+
+    async def _publish(self, bot, chat_id, board, shard, text):
+        message_id = board.get(shard)
+        if message_id is not None:
+            try:
+                await bot.edit_message_text(text, chat_id=chat_id, message_id=message_id, disable_web_page_preview=True)
+                return
+            except TelegramBadRequest as e:
+                error = e.message.lower()
+                if "not modified" in error:
+                    return
+                if "not found" not in error and "can't be edited" not in error:
+                    raise
+                logger.warning(f"Link board message {message_id} is gone, posting it again")
+
+        sent = await bot.send_message(chat_id, text, disable_web_page_preview=True)
+        board[shard] = sent.message_id
+        await db.save_link_board_message(chat_id, shard, sent.message_id)
+        try:
+            await bot.pin_chat_message(chat_id, sent.message_id, disable_notification=True)
+        except TelegramAPIError as e:
+            logger.warning(f"Failed to pin link board message: {e}")
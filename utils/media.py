@@ -0,0 +1,98 @@
+# utils/media.py
+import asyncio
+import hashlib
+import logging
+import os
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message, FSInputFile
+
+from database import db
+
+logger = logging.getLogger(__name__)
+
+# Логотип для приветственного сообщения
+LOGO_PATH = os.path.join("assets", "logo.jpg")
+
+def _file_sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class MediaRegistry:
+    """Реестр статических файлов: каждый файл загружается в Telegram один раз,
+    дальше отправляется по сохраненному в базе file_id.
+
+    Файл загружается заново, только если изменилось его содержимое (sha256).
+    """
+
+    def __init__(self):
+        # path -> ((mtime, size), sha256), чтобы не пересчитывать хэш неизмененного файла
+        self._hashes = {}
+        # path -> (sha256, file_id), загруженные из базы записи
+        self._assets = {}
+        self._locks = {}
+
+    def exists(self, path) -> bool:
+        return os.path.isfile(path)
+
+    async def _current_hash(self, path) -> str:
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._hashes.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        sha256 = await asyncio.to_thread(_file_sha256, path)
+        self._hashes[path] = (signature, sha256)
+        return sha256
+
+    async def _cached_file_id(self, path, sha256):
+        asset = self._assets.get(path)
+        if asset is None:
+            asset = await db.get_media_asset(path)
+            if asset:
+                self._assets[path] = asset = tuple(asset)
+        if asset and asset[0] == sha256:
+            return asset[1]
+        return None
+
+    async def _forget(self, path):
+        self._assets.pop(path, None)
+        await db.delete_media_asset(path)
+
+    async def answer_photo(self, message: Message, path, **kwargs) -> Message:
+        """Отправка фото из файла: по file_id, если файл уже загружен, иначе с загрузкой"""
+        lock = self._locks.setdefault(path, asyncio.Lock())
+        sha256 = await self._current_hash(path)
+
+        file_id = await self._cached_file_id(path, sha256)
+        if file_id is None:
+            # Одновременные отправки ждут первую загрузку и дальше используют её file_id
+            async with lock:
+                file_id = await self._cached_file_id(path, sha256)
+                if file_id is None:
+                    return await self._upload(message, path, sha256, **kwargs)
+
+        try:
+            return await message.answer_photo(file_id, **kwargs)
+        except TelegramBadRequest as e:
+            if "file" not in e.message.lower():
+                raise
+            # file_id больше не действителен - загружаем файл заново
+            logger.warning(f"Stored file_id for {path} was rejected, uploading again: {e}")
+            await self._forget(path)
+            async with lock:
+                return await self._upload(message, path, sha256, **kwargs)
+
+    async def _upload(self, message: Message, path, sha256, **kwargs) -> Message:
+        sent = await message.answer_photo(FSInputFile(path), **kwargs)
+        file_id = sent.photo[-1].file_id
+        self._assets[path] = (sha256, file_id)
+        await db.save_media_asset(path, sha256, file_id)
+        logger.info(f"Uploaded {path} to Telegram, file_id saved")
+        return sent
+
+# Глобальный реестр файлов
+media_registry = MediaRegistry()
@@ -0,0 +1,297 @@
+# utils/notifications.py
+import asyncio
+import json
+import logging
+import os
+import time
+
+from aiogram.exceptions import TelegramRetryAfter
+
+from config import ADMIN_IDS
+from database import db
+from utils.bot_session import disable_retries
+from utils.link_board import LinkBoard
+from utils.outbound import BULK, set_lane
+from utils.workers import MULTI_WORKER
+
+logger = logging.getLogger(__name__)
+
+# Количество воркеров отправки (один воркер сохраняет порядок постов в канале)
+NOTIFICATION_WORKERS = 1
+# Попытки отправки одного уведомления и максимальная пауза между ними
+MAX_ATTEMPTS = 5
+MAX_BACKOFF = 60.0
+# В режиме нескольких воркеров события публикуются в других процессах - проверяем базу периодически
+OUTBOX_POLL_INTERVAL = 1.0
+
+# Как показывать обновления ссылок в канале: "digest" - посты с обновлениями, "board" - доска актуальных ссылок
+LINK_CHANNEL_MODE = os.getenv("LINK_CHANNEL_MODE", "digest")
+# Окно объединения обновлений ссылок в один пост (секунды). По умолчанию 0 - пост на каждое обновление
+# сразу; ботам с частыми обновлениями стоит задать окно явно (например, 30), пост задержится не больше чем на него
+LINK_DIGEST_WINDOW = float(os.getenv("LINK_DIGEST_WINDOW", "0"))
+# Окно объединения обновлений для доски: несколько правок одной части - одно редактирование
+LINK_BOARD_WINDOW = 2.0
+# Максимальная длина сообщения Telegram
+MESSAGE_LIMIT = 4096
+
+# Тип события: пользователь обновил ссылку
+LINK_UPDATED = "link_updated"
+# Тип события: уведомление админам (новая авторизация или регистрация)
+ADMIN_NOTIFICATION = "admin_notification"
+
+class NotificationBus:
+    """Шина событий для исходящих уведомлений
+
+    publish() сохраняет событие в таблицу notification_outbox и ставит его в очередь;
+    фоновые воркеры вызывают подписчиков и удаляют событие после успешной обработки.
+    Неотправленные события загружаются из базы при следующем запуске.
+
+    Подписчик с окном window получает список событий, накопленных за window секунд
+    после первого из них; события удаляются из базы только после обработки всей пачки.
+    """
+
+    def __init__(self, workers=NOTIFICATION_WORKERS, max_attempts=MAX_ATTEMPTS):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self._subscribers = {}
+        self._windows = {}  # тип события -> окно накопления пачки
+        self._batches = {}  # тип события -> (время отправки, [события])
+        self._queue = None
+        self._queued = set()  # id событий в очереди, чтобы не поставить событие дважды
+        self._bot = None
+        self._tasks = []
+        self._restoring = False
+        self._published = 0  # счетчик публикаций, чтобы заметить новые события во время загрузки
+
+    def subscribe(self, kind, handler):
+        """Подписка обработчика handler(bot, payload) на события типа kind"""
+        self._subscribers.setdefault(kind, []).append(handler)
+
+    def subscribe_batch(self, kind, handler, window):
+        """Подписка обработчика handler(bot, payloads) на пачки событий типа kind"""
+        self._windows[kind] = window
+        self.subscribe(kind, handler)
+
+    def start(self, bot):
+        """Запуск воркеров: сначала в очередь попадают события, оставшиеся с прошлого запуска"""
+        self._bot = bot
+        self._queue = asyncio.Queue()
+        self._restoring = True
+        self._tasks = [asyncio.create_task(self._run())]
+
+    async def stop(self):
+        """Остановка воркеров; необработанные события остаются в базе"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._queued.clear()
+        self._batches.clear()
+        self._restoring = False
+
+    async def publish(self, kind, payload: dict):
+        """Публикация события без ожидания его отправки"""
+        notification_id = await db.add_notification(kind, json.dumps(payload, ensure_ascii=False))
+        self._published += 1
+        # До start() и во время загрузки из базы событие только сохраняется: его поставит в очередь _restore
+        if not self._restoring:
+            self._enqueue(notification_id, kind, payload, 0)
+        return notification_id
+
+    def _enqueue(self, notification_id, kind, payload, attempts):
+        if self._queue is None or notification_id in self._queued:
+            return
+        self._queued.add(notification_id)
+        self._queue.put_nowait((notification_id, kind, payload, attempts))
+
+    async def _restore(self):
+        """Постановка в очередь событий из базы в порядке создания"""
+        restored = 0
+        while True:
+            published = self._published
+            for notification_id, kind, payload, attempts in await db.get_pending_notifications():
+                if notification_id not in self._queued:
+                    self._enqueue(notification_id, kind, json.loads(payload), attempts)
+                    restored += 1
+            # Если за время запроса появились новые события, перечитываем, чтобы не нарушить порядок
+            if published == self._published:
+                break
+        self._restoring = False
+        if restored:
+            logger.info(f"Restored {restored} pending notifications")
+
+    async def _run(self):
+        # Повторы и RetryAfter обрабатываются здесь же (с сохранением попыток в базе)
+        disable_retries()
+        # Посты в канал уступают общий лимит отправки ответам пользователям
+        set_lane(BULK)
+        try:
+            await self._restore()
+        except Exception as e:
+            logger.error(f"Failed to load pending notifications: {e}")
+            self._restoring = False
+        tasks = [self._worker() for _ in range(self.workers)]
+        if MULTI_WORKER:
+            tasks.append(self._poll_outbox())
+        await asyncio.gather(*tasks)
+
+    async def _poll_outbox(self):
+        """Постановка в очередь событий, опубликованных другими процессами"""
+        while True:
+            await asyncio.sleep(OUTBOX_POLL_INTERVAL)
+            try:
+                for notification_id, kind, payload, attempts in await db.get_pending_notifications():
+                    self._enqueue(notification_id, kind, json.loads(payload), attempts)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to poll notification outbox: {e}")
+
+    async def _worker(self):
+        while True:
+            timeout = None
+            if self._batches:
+                timeout = max(0.0, min(deadline for deadline, _ in self._batches.values()) - time.monotonic())
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                item = None
+
+            if item is not None:
+                kind = item[1]
+                if kind in self._windows:
+                    # Событие копится в пачке до истечения окна
+                    deadline, items = self._batches.setdefault(kind, (time.monotonic() + self._windows[kind], []))
+                    items.append(item)
+                else:
+                    await self._process([item])
+
+            now = time.monotonic()
+            for kind, (deadline, items) in list(self._batches.items()):
+                if deadline <= now:
+                    del self._batches[kind]
+                    await self._process(items)
+
+    async def _process(self, items):
+        try:
+            await self._deliver(items)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Notifications {[item[0] for item in items]} processing error: {e}")
+        finally:
+            for item in items:
+                self._queued.discard(item[0])
+
+    async def _deliver(self, items):
+        """Отправка одного события или пачки событий одного типа"""
+        kind = items[0][1]
+        ids = [item[0] for item in items]
+        attempts = max(item[3] for item in items)
+        while True:
+            try:
+                for handler in self._subscribers.get(kind, []):
+                    if kind in self._windows:
+                        await handler(self._bot, [item[2] for item in items])
+                    else:
+                        await handler(self._bot, items[0][2])
+            except TelegramRetryAfter as e:
+                # Ограничение Telegram не считается неудачной попыткой
+                logger.warning(f"Notifications {ids}: flood control, retry in {e.retry_after} s")
+                await asyncio.sleep(e.retry_after)
+                continue
+            except Exception as e:
+                attempts += 1
+                failed = attempts >= self.max_attempts
+                logger.error(f"Notifications {ids} ({kind}) attempt {attempts} failed: {e}")
+                await db.set_notifications_attempts(ids, attempts, failed)
+                if failed:
+                    return
+                await asyncio.sleep(min(2 ** attempts, MAX_BACKOFF))
+                continue
+            await db.delete_notifications(ids)
+            return
+
+def format_link_update(payload) -> str:
+    return (
+        f"👤 Пользователь: {payload['username']}\n"
+        f"🔗 Ссылки: \n{payload['link']}"
+    )
+
+def iter_digest_parts(entries, header, max_length=MESSAGE_LIMIT):
+    """Разбивка записей дайджеста на сообщения не длиннее max_length"""
+    current = header
+    for entry in entries:
+        if len(entry) > max_length - len(header):
+            entry = entry[:max_length - len(header) - 1] + "…"
+        if current != header and len(current) + 2 + len(entry) > max_length:
+            yield current
+            current = header
+        current = current + ("\n\n" if current != header else "") + entry
+    if current != header:
+        yield current
+
+class LinkDigest:
+    """Объединение обновлений ссылок в посты для канала со статистикой за минуту"""
+
+    def __init__(self):
+        self.events = 0
+        self.messages = 0
+        self._period_started = time.monotonic()
+
+    def _report(self):
+        now = time.monotonic()
+        if now - self._period_started >= 60:
+            logger.info(
+                f"Link notifications per minute: {self.events} updates -> {self.messages} channel messages"
+            )
+            self.events = 0
+            self.messages = 0
+            self._period_started = now
+
+    async def send(self, bot, payloads):
+        """Отправка пачки обновлений: по одному последнему значению на пользователя"""
+        channel_id = await db.get_channel("links")
+        if not channel_id:
+            logger.warning("Links channel not configured")
+            return
+
+        # Последнее обновление каждого пользователя; порядок - по первому обновлению в пачке
+        latest = {}
+        for payload in payloads:
+            latest[payload.get('user_id') or payload['username']] = payload
+
+        if len(latest) == 1:
+            header = "📢 Пользователь обновил ссылки!\n"
+        else:
+            header = f"📢 Пользователи обновили ссылки ({len(latest)}):\n\n"
+
+        messages = 0
+        for text in iter_digest_parts([format_link_update(payload) for payload in latest.values()], header):
+            await bot.send_message(channel_id, text)
+            messages += 1
+
+        self._report()
+        self.events += len(payloads)
+        self.messages += messages
+        logger.info(f"Link digest sent to channel: {len(payloads)} updates from {len(latest)} users in {messages} messages")
+
+async def notify_admins(bot, payload):
+    """Отправка уведомления всем админам; ошибка отправки одному админу не мешает остальным"""
+    for admin_id in ADMIN_IDS:
+        try:
+            await bot.send_message(admin_id, payload['text'])
+            logger.info(f"Admin notification sent to {admin_id}")
+        except Exception as e:
+            logger.error(f"Failed to send notification to admin {admin_id}: {e}")
+
+# Глобальная шина уведомлений
+notification_bus = NotificationBus()
+link_digest = LinkDigest()
+link_board = LinkBoard()
+if LINK_CHANNEL_MODE == "board":
+    notification_bus.subscribe_batch(LINK_UPDATED, link_board.update, LINK_BOARD_WINDOW)
+else:
+    notification_bus.subscribe_batch(LINK_UPDATED, link_digest.send, LINK_DIGEST_WINDOW)
+notification_bus.subscribe(ADMIN_NOTIFICATION, notify_admins)
@@ -0,0 +1,208 @@
+# utils/outbound.py
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from utils.workers import BOT_WORKERS, MULTI_WORKER
+
+logger = logging.getLogger(__name__)
+
+# Счетчик запросов к Bot API текущего апдейта (None вне обработки апдейта - фоновые задачи)
+_update_calls: ContextVar = ContextVar("update_calls", default=None)
+
+class OutboundCallCounter:
+    """Подсчет запросов к Bot API на один апдейт
+
+    Экземпляр регистрируется дважды: как outer middleware dp.update (заводит счетчик апдейта
+    в contextvar) и как middleware сессии бота (count_request увеличивает счетчик текущего апдейта).
+    Запросы фоновых задач (рассылки, уведомления) считаются отдельно.
+    """
+
+    def __init__(self):
+        self.updates = 0
+        self.calls = 0
+        self.max_calls = 0
+        self.background_calls = 0
+        self.methods = {}  # метод -> количество запросов при обработке апдейтов
+
+    async def __call__(self, handler, event, data):
+        counter = [0]
+        token = _update_calls.set(counter)
+        try:
+            return await handler(event, data)
+        finally:
+            _update_calls.reset(token)
+            self.updates += 1
+            self.calls += counter[0]
+            self.max_calls = max(self.max_calls, counter[0])
+
+    async def count_request(self, make_request, bot, method):
+        counter = _update_calls.get()
+        if counter is None:
+            self.background_calls += 1
+        else:
+            counter[0] += 1
+            name = type(method).__name__
+            self.methods[name] = self.methods.get(name, 0) + 1
+        return await make_request(bot, method)
+
+    def stats(self) -> dict:
+        return {
+            "updates": self.updates,
+            "calls": self.calls,
+            "calls_per_update": self.calls / self.updates if self.updates else 0.0,
+            "max_calls": self.max_calls,
+            "background_calls": self.background_calls,
+            "methods": dict(self.methods),
+        }
+
+# Полосы исходящих запросов: ответы пользователям всегда обслуживаются раньше массовых отправок
+INTERACTIVE = "interactive"
+BULK = "bulk"
+LANES = (INTERACTIVE, BULK)
+
+# Общий бюджет отправки сообщений (в секунду) - лимит Telegram для бота (0 - без ограничения)
+OUTBOUND_RATE = float(os.getenv("OUTBOUND_RATE", "30"))
+# Лимит Telegram общий для бота: при нескольких процессах бюджет делится поровну между воркерами
+# и основным процессом (рассылки и уведомления)
+OUTBOUND_PROCESSES = BOT_WORKERS + 1 if MULTI_WORKER else 1
+PROCESS_OUTBOUND_RATE = OUTBOUND_RATE / OUTBOUND_PROCESSES
+# Запас токенов: отправки сверх OUTBOUND_RATE в первую секунду (и после простоя)
+OUTBOUND_BURST = float(os.getenv("OUTBOUND_BURST", "1"))
+# Методы, которые расходуют бюджет (отправка и изменение сообщений); остальные не ограничиваются
+RATE_LIMITED_PREFIXES = ("Send", "Copy", "Forward", "Edit")
+# Количество последних ожиданий полосы для перцентилей
+WAIT_SAMPLES = 1000
+
+# Полоса текущей задачи: по умолчанию - ответы на апдейты
+_lane: ContextVar = ContextVar("outbound_lane", default=INTERACTIVE)
+
+def current_lane():
+    """Полоса текущей задачи"""
+    return _lane.get()
+
+def set_lane(lane):
+    """Полоса для текущей задачи и задач, которые она создаст (например, BULK для рассылок)"""
+    _lane.set(lane)
+
+@contextmanager
+def outbound_lane(lane):
+    """Полоса для запросов внутри блока with"""
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+class _LaneStats:
+    __slots__ = ("granted", "waited", "total_wait", "max_wait", "samples")
+
+    def __init__(self):
+        self.granted = 0
+        self.waited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.samples = deque(maxlen=WAIT_SAMPLES)
+
+    def add(self, wait):
+        self.granted += 1
+        if wait > 0:
+            self.waited += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.samples.append(wait)
+
+class OutboundScheduler:
+    """Middleware сессии: общий бюджет отправки сообщений, разделенный на полосы по приоритету
+
+    Токены выдаются с частотой rate. Пока есть ожидающие запросы полосы INTERACTIVE, запросы BULK
+    токены не получают; внутри полосы - в порядке очереди. Ожидание считается по полосам.
+    """
+
+    def __init__(self, rate=PROCESS_OUTBOUND_RATE, capacity=OUTBOUND_BURST):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._waiters = {lane: deque() for lane in LANES}
+        self._stats = {lane: _LaneStats() for lane in LANES}
+        self._task = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _has_waiters(self, lanes):
+        return any(self._waiters[lane] for lane in lanes)
+
+    async def acquire(self, lane=INTERACTIVE) -> float:
+        """Ожидание токена; возвращает время ожидания в секундах"""
+        # Запрос проходит сразу, если токен есть и впереди нет запросов той же или более важной полосы
+        self._refill()
+        ahead = LANES[:LANES.index(lane) + 1]
+        if self._tokens >= 1 and not self._has_waiters(ahead):
+            self._tokens -= 1
+            self._stats[lane].add(0.0)
+            return 0.0
+
+        started = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[lane].append(waiter)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._grant())
+        await waiter
+        wait = time.monotonic() - started
+        self._stats[lane].add(wait)
+        return wait
+
+    async def _grant(self):
+        """Выдача токенов ожидающим: сначала INTERACTIVE, затем BULK"""
+        while True:
+            for lane in LANES:
+                queue = self._waiters[lane]
+                while queue and queue[0].done():
+                    queue.popleft()  # ожидание отменено
+            if not self._has_waiters(LANES):
+                return
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                continue
+            for lane in LANES:
+                if self._waiters[lane]:
+                    self._tokens -= 1
+                    self._waiters[lane].popleft().set_result(None)
+                    break
+            # Даем получившему токен отправить запрос до следующей выдачи
+            await asyncio.sleep(0)
+
+    async def __call__(self, make_request, bot, method):
+        if self.rate and type(method).__name__.startswith(RATE_LIMITED_PREFIXES):
+            await self.acquire(current_lane())
+        return await make_request(bot, method)
+
+    def stats(self) -> dict:
+        """Полоса -> в очереди сейчас, выдано токенов, из них с ожиданием, среднее, p95 и максимум ожидания (мс)"""
+        result = {}
+        for lane in LANES:
+            stats = self._stats[lane]
+            samples = sorted(stats.samples)
+            result[lane] = {
+                "queued": sum(not waiter.done() for waiter in self._waiters[lane]),
+                "granted": stats.granted,
+                "waited": stats.waited,
+                "avg_wait_ms": stats.total_wait / stats.granted * 1000 if stats.granted else 0.0,
+                "p95_wait_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000 if samples else 0.0,
+                "max_wait_ms": stats.max_wait * 1000,
+            }
+        return result
+
+# Глобальный счетчик исходящих запросов
+outbound_calls = OutboundCallCounter()
+# Глобальный планировщик отправки по полосам
+outbound_scheduler = OutboundScheduler()
@@ -0,0 +1,97 @@
+# utils/replies.py
+from aiogram.types import ForceReply, Message, ReplyKeyboardMarkup, ReplyKeyboardRemove
+
+# Лимиты Telegram на длину текста сообщения и подписи к фото
+MESSAGE_LIMIT = 4096
+CAPTION_LIMIT = 1024
+SEPARATOR = "\n\n"
+
+# Клавиатуры под полем ввода: следующая заменяет предыдущую, поэтому в одном сообщении достаточно последней
+_REPLY_KEYBOARDS = (ReplyKeyboardMarkup, ReplyKeyboardRemove, ForceReply)
+_CONFLICT = object()
+
+def merge_markups(first, second):
+    """Клавиатура объединенного сообщения; _CONFLICT, если у сообщения может быть только одна из них"""
+    if first is None:
+        return second
+    if second is None:
+        return first
+    if isinstance(first, _REPLY_KEYBOARDS) and isinstance(second, _REPLY_KEYBOARDS):
+        return second
+    return _CONFLICT
+
+class _Part:
+    __slots__ = ("text", "photo", "reply_markup", "kwargs")
+
+    def __init__(self, text, photo=None, reply_markup=None, kwargs=None):
+        self.text = text
+        self.photo = photo
+        self.reply_markup = reply_markup
+        self.kwargs = kwargs or {}
+
+def _merge(current: _Part, part: _Part):
+    """Одна часть из двух соседних или None, если Telegram не позволит отправить их одним сообщением"""
+    if current.photo is not None or current.kwargs != part.kwargs:
+        return None
+    markup = merge_markups(current.reply_markup, part.reply_markup)
+    if markup is _CONFLICT:
+        return None
+    if part.photo is not None:
+        # Текст перед фото без подписи становится подписью
+        if part.text or len(current.text) > CAPTION_LIMIT:
+            return None
+        return _Part(current.text, part.photo, markup, part.kwargs)
+    text = current.text + SEPARATOR + part.text
+    if len(text) > MESSAGE_LIMIT:
+        return None
+    return _Part(text, None, markup, part.kwargs)
+
+def compose(parts):
+    """Объединение соседних частей ответа в как можно меньшее число сообщений"""
+    messages = []
+    for part in parts:
+        merged = _merge(messages[-1], part) if messages else None
+        if merged is None:
+            messages.append(part)
+        else:
+            messages[-1] = merged
+    return messages
+
+class ReplyComposer:
+    """Ответ из нескольких частей, отправляемый как можно меньшим числом сообщений
+
+    Соседние тексты склеиваются через пустую строку, если у них одинаковые параметры отправки,
+    не больше одной клавиатуры (или только клавиатуры под полем ввода - тогда остается последняя)
+    и результат укладывается в лимит длины. Текст перед фото без подписи отправляется подписью.
+    """
+
+    def __init__(self, message: Message):
+        self.message = message
+        self.parts = []
+
+    def add(self, text, reply_markup=None, **kwargs) -> "ReplyComposer":
+        self.parts.append(_Part(text, None, reply_markup, kwargs))
+        return self
+
+    def add_photo(self, photo, caption=None, reply_markup=None, **kwargs) -> "ReplyComposer":
+        self.parts.append(_Part(caption, photo, reply_markup, kwargs))
+        return self
+
+    def error(self, text, reply_markup=None) -> "ReplyComposer":
+        return self.add(f"❌ {text}", reply_markup=reply_markup)
+
+    def success(self, text, reply_markup=None) -> "ReplyComposer":
+        return self.add(f"✅ {text}", reply_markup=reply_markup)
+
+    async def send(self):
+        """Отправка накопленных частей; возвращает отправленные сообщения"""
+        parts, self.parts = self.parts, []
+        sent = []
+        for part in compose(parts):
+            if part.photo is not None:
+                sent.append(await self.message.answer_photo(
+                    part.photo, caption=part.text, reply_markup=part.reply_markup, **part.kwargs
+                ))
+            else:
+                sent.append(await self.message.answer(part.text, reply_markup=part.reply_markup, **part.kwargs))
+        return sent
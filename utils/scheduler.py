@@ -0,0 +1,97 @@
+# utils/scheduler.py
+import asyncio
+import logging
+import os
+
+from aiogram.dispatcher.event.bases import UNHANDLED
+
+logger = logging.getLogger(__name__)
+
+# Сколько апдейтов разных чатов обрабатывается одновременно
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "64"))
+# Сколько апдейтов одного чата может ждать очереди; лишние отбрасываются (например, при спаме кнопкой)
+CHAT_QUEUE_SIZE = int(os.getenv("CHAT_QUEUE_SIZE", "10"))
+
+class _ChatQueue:
+    """Очередь апдейтов одного чата: блокировка asyncio.Lock пропускает ожидающих по порядку"""
+    __slots__ = ("lock", "size")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.size = 0  # апдейты чата в обработке и в ожидании
+
+class ChatScheduler:
+    """Middleware апдейтов: апдейты одного чата обрабатываются по очереди в порядке получения,
+    апдейты разных чатов - параллельно, не больше concurrency одновременно
+
+    Регистрируется как outer middleware dp.update (после встроенного, который определяет event_chat).
+    Встроенный FSMContextMiddleware читает состояние до очереди, поэтому когда подходит очередь чата,
+    raw_state читается заново: предыдущий апдейт чата мог его изменить.
+    Очередь чата удаляется, когда в ней не остается апдейтов.
+    """
+
+    def __init__(self, concurrency=UPDATE_CONCURRENCY, queue_size=CHAT_QUEUE_SIZE):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._chats = {}
+        self.running = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.dropped = 0
+
+    async def __call__(self, handler, event, data):
+        chat = data.get("event_chat")
+        user = data.get("event_from_user")
+        chat_id = chat.id if chat else (user.id if user else None)
+        if chat_id is None:
+            async with self._semaphore:
+                return await handler(event, data)
+
+        queue = self._chats.get(chat_id)
+        if queue is None:
+            queue = self._chats[chat_id] = _ChatQueue()
+        elif queue.size >= self.queue_size:
+            self.dropped += 1
+            logger.warning(f"Too many pending updates in chat {chat_id}, update {event.update_id} dropped")
+            return UNHANDLED
+
+        queue.size += 1
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        waiting = True
+        try:
+            # Общий лимит занимается только когда подошла очередь чата, чтобы ждущие чаты не держали слоты
+            async with queue.lock:
+                async with self._semaphore:
+                    self.waiting -= 1
+                    waiting = False
+                    self.running += 1
+                    try:
+                        state = data.get("state")
+                        if state is not None:
+                            data["raw_state"] = await state.get_state()
+                        return await handler(event, data)
+                    finally:
+                        self.running -= 1
+        finally:
+            if waiting:
+                self.waiting -= 1
+            queue.size -= 1
+            if not queue.size:
+                del self._chats[chat_id]
+
+    def stats(self) -> dict:
+        """Глубина очереди: апдейты в обработке и в ожидании, число чатов с апдейтами, отброшенные"""
+        return {
+            "running": self.running,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "chats": len(self._chats),
+            "busiest_chat": max((queue.size for queue in self._chats.values()), default=0),
+            "dropped": self.dropped,
+            "concurrency": self.concurrency,
+        }
+
+# Глобальный планировщик апдейтов
+chat_scheduler = ChatScheduler()
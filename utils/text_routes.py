@@ -0,0 +1,117 @@
+# utils/text_routes.py
+import logging
+import operator
+
+from aiogram import Router
+from aiogram.dispatcher.event.bases import SkipHandler
+from aiogram.filters import Command
+from aiogram.fsm.state import State
+from aiogram.utils.magic_filter import MagicFilter
+from magic_filter.operations import ComparatorOperation, GetAttributeOperation
+
+logger = logging.getLogger(__name__)
+
+def exact_text(filter_object):
+    """Текст фильтра F.text == "...", иначе None"""
+    magic = getattr(filter_object, "magic", None)
+    if not isinstance(magic, MagicFilter) or len(magic._operations) != 2:
+        return None
+    attribute, comparison = magic._operations
+    if (isinstance(attribute, GetAttributeOperation) and attribute.name == "text"
+            and isinstance(comparison, ComparatorOperation) and comparison.comparator is operator.eq
+            and isinstance(comparison.right, str)):
+        return comparison.right
+    return None
+
+class _Route:
+    """Обработчик сообщений с уже разрешенной цепочкой inner middleware его роутера"""
+    __slots__ = ("router", "handler", "middlewares")
+
+    def __init__(self, router, handler):
+        self.router = router
+        self.handler = handler
+        self.middlewares = router.message._resolve_middlewares()
+
+    async def call(self, event, data):
+        data["event_router"] = self.router
+        data["handler"] = self.handler
+        wrapped = self.router.message.outer_middleware.wrap_middlewares(self.middlewares, self.handler.call)
+        return await wrapped(event, data)
+
+class TextRouteTable:
+    """Outer middleware dp.message: сообщение без состояния FSM с текстом кнопки отправляется
+    сразу нужному обработчику по словарю, без проверки фильтров всех обработчиков по очереди
+
+    Таблица строится по зарегистрированным обработчикам в порядке их проверки aiogram.
+    Обработчики с состоянием FSM при пустом состоянии не срабатывают и пропускаются, команды
+    срабатывают только на текст с префиксом команды. Построение останавливается на первом
+    обработчике с другими фильтрами: обработчик без фильтров (catch-all) запоминается для текстов
+    не из таблицы, после любого другого все остальное проверяется как обычно.
+    Роутеры с собственными фильтрами или outer middleware в таблицу не попадают.
+    Состояние FSM читается заново: middleware вызывается внутри очереди чата (utils/scheduler.py),
+    когда предыдущие апдейты чата уже обработаны.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.fallback = None
+        self.command_prefixes = set()
+        self.hits = 0
+        self.fallbacks = 0
+
+    def build(self, router: Router):
+        self.routes = {}
+        self.fallback = None
+        self.command_prefixes = set()
+        self._walk(router)
+        logger.info(f"Text routes: {len(self.routes)} button texts, catch-all: {self.fallback is not None}")
+
+    def _walk(self, router: Router) -> bool:
+        """Добавление обработчиков роутера и вложенных роутеров; False - дальше таблицу строить нельзя"""
+        observer = router.message
+        if observer._handler.filters or observer.outer_middleware:
+            return False
+        for handler in observer.handlers:
+            filters = handler.filters or []
+            if any(isinstance(f.callback, State) and f.callback.state not in (None, "*") for f in filters):
+                continue
+            if filters and all(isinstance(f.callback, Command) for f in filters):
+                for f in filters:
+                    self.command_prefixes.update(f.callback.prefix)
+                continue
+            text = exact_text(filters[0]) if len(filters) == 1 else None
+            if text is not None:
+                # Текст, похожий на команду, может раньше поймать обработчик команды
+                if text[:1] not in self.command_prefixes:
+                    self.routes.setdefault(text, _Route(router, handler))
+                continue
+            if not filters:
+                self.fallback = _Route(router, handler)
+            return False
+        return all(self._walk(sub_router) for sub_router in router.sub_routers)
+
+    async def __call__(self, handler, event, data):
+        text = event.text
+        if text is None:
+            return await handler(event, data)
+        # Состояние читается здесь, уже в очереди чата: значение, прочитанное до очереди, могло устареть
+        state = data.get("state")
+        if state is not None:
+            data["raw_state"] = await state.get_state()
+        if data.get("raw_state") is not None:
+            return await handler(event, data)
+        route = self.routes.get(text)
+        if route is not None:
+            self.hits += 1
+        elif self.fallback is not None and text[:1] not in self.command_prefixes:
+            route = self.fallback
+            self.fallbacks += 1
+        else:
+            return await handler(event, data)
+        try:
+            return await route.call(event, data)
+        except SkipHandler:
+            return await handler(event, data)
+
+# Глобальная таблица маршрутов кнопок
+text_routes = TextRouteTable()
@@ -0,0 +1,125 @@
+# utils/webhook.py
+import asyncio
+import logging
+import os
+import secrets
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+
+from utils.workers import SECRET_HEADER, UpdateRouter
+
+logger = logging.getLogger(__name__)
+
+# Режим получения апдейтов: "polling" (по умолчанию) или "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+
+# Адрес и путь встроенного HTTP-сервера
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+# Публичный адрес (https://example.com), по которому Telegram достучится до сервера.
+# Если не задан, вебхук в Telegram не регистрируется - удобно для локальной проверки POST-запросами
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+# Секрет из заголовка X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+
+async def healthcheck(request: web.Request) -> web.Response:
+    return web.Response(text="ok")
+
+def create_webhook_app(dp: Dispatcher, bot: Bot, secret_token, path=WEBHOOK_PATH) -> web.Application:
+    """aiohttp-приложение, передающее апдейты из POST-запросов диспетчеру"""
+    app = web.Application()
+    # Ответ Telegram отдается сразу, апдейт обрабатывается в фоне
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=secret_token).register(app, path=path)
+    app.router.add_get("/healthz", healthcheck)
+    return app
+
+def create_front_app(router: UpdateRouter, secret_token, path=WEBHOOK_PATH) -> web.Application:
+    """aiohttp-приложение основного процесса: апдейты пересылаются воркерам по ID чата"""
+    async def handle_update(request: web.Request) -> web.Response:
+        if not secrets.compare_digest(request.headers.get(SECRET_HEADER, ""), secret_token):
+            return web.Response(status=401, text="Unauthorized")
+        try:
+            update = await request.json()
+        except ValueError as e:
+            # Тело не JSON (json.JSONDecodeError - подкласс ValueError): отвечаем ошибкой, процесс не падает
+            logger.warning(f"Bad webhook request body: {e}")
+            return web.Response(status=400, text="Bad Request")
+        if not isinstance(update, dict):
+            logger.warning(f"Bad webhook update: expected an object, got {type(update).__name__}")
+            return web.Response(status=400, text="Bad Request")
+        await router.route(update)
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post(path, handle_update)
+    app.router.add_get("/healthz", healthcheck)
+    return app
+
+async def run_webhook(dp: Dispatcher, bot: Bot, host=WEBHOOK_HOST, port=WEBHOOK_PORT, path=WEBHOOK_PATH,
+                      url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET, router: UpdateRouter = None):
+    """Запуск HTTP-сервера для вебхука; работает до отмены задачи
+
+    router: апдейты не обрабатываются в этом процессе, а пересылаются воркерам
+    """
+    if not secret_token:
+        secret_token = secrets.token_urlsafe(32)
+        logger.warning("WEBHOOK_SECRET is not set, using a random secret (set it to send test updates locally)")
+
+    if router is not None:
+        app = create_front_app(router, secret_token, path)
+    else:
+        app = create_webhook_app(dp, bot, secret_token, path)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    logger.info(f"Webhook server listening on {host}:{port}{path}")
+
+    try:
+        if url:
+            # Переход с поллинга: Telegram начинает отправлять апдейты на сервер
+            await bot.set_webhook(
+                url.rstrip("/") + path,
+                secret_token=secret_token,
+                allowed_updates=dp.resolve_used_update_types(),
+                drop_pending_updates=True
+            )
+            logger.info(f"Webhook set to {url.rstrip('/')}{path}")
+        else:
+            logger.warning("WEBHOOK_URL is not set, webhook is not registered in Telegram")
+        await asyncio.Event().wait()
+    finally:
+        # Вебхук не удаляем: Telegram накопит апдейты до следующего запуска
+        await runner.cleanup()
+        logger.info("Webhook server stopped")
+
+async def run_polling(dp: Dispatcher, bot: Bot):
+    """Запуск long polling; установленный ранее вебхук удаляется"""
+    await bot.delete_webhook(drop_pending_updates=True)
+    await dp.start_polling(bot)
+
+async def run_front_polling(dp: Dispatcher, bot: Bot, router: UpdateRouter, timeout=30):
+    """Long polling в основном процессе: полученные апдейты пересылаются воркерам"""
+    await bot.delete_webhook(drop_pending_updates=True)
+    allowed_updates = dp.resolve_used_update_types()
+    offset = None
+    delay = 1.0
+    while True:
+        try:
+            updates = await bot.get_updates(offset=offset, timeout=timeout, allowed_updates=allowed_updates)
+        except TelegramRetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+            continue
+        except Exception as e:
+            logger.error(f"Failed to get updates: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+            continue
+        delay = 1.0
+        for update in updates:
+            await router.route(update.model_dump(mode="json", exclude_unset=True, by_alias=True))
+            offset = update.update_id + 1
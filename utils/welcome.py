@@ -0,0 +1,152 @@
+# utils/welcome.py
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from html.parser import HTMLParser
+
+import config
+from database import db
+
+logger = logging.getLogger(__name__)
+
+# Файл, в котором config хранит приветствие: по умолчанию тот, что указан в config. Правки в обход бота
+# подхватываются в фоне: по mtime файла, а если путь неизвестен - по тексту, который возвращает config
+WELCOME_MESSAGE_FILE = os.getenv("WELCOME_MESSAGE_FILE") or getattr(config, "WELCOME_MESSAGE_FILE", None)
+WELCOME_CHECK_INTERVAL = 10.0
+
+# Теги, которые Telegram поддерживает в parse_mode="HTML"
+TELEGRAM_HTML_TAGS = {
+    "b", "strong", "i", "em", "u", "ins", "s", "strike", "del", "span", "tg-spoiler",
+    "a", "code", "pre", "blockquote", "tg-emoji",
+}
+
+class _TelegramHTMLChecker(HTMLParser):
+    """Проверка, что текст содержит только поддерживаемые Telegram и правильно закрытые теги"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []
+        self.valid = True
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in TELEGRAM_HTML_TAGS:
+            self.valid = False
+        self.stack.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.valid = False
+
+    def handle_endtag(self, tag):
+        if not self.stack or self.stack.pop() != tag:
+            self.valid = False
+
+def is_valid_telegram_html(text) -> bool:
+    checker = _TelegramHTMLChecker()
+    try:
+        checker.feed(text)
+        checker.close()
+    except Exception:
+        return False
+    return checker.valid and not checker.stack
+
+@dataclass(frozen=True)
+class WelcomeMessage:
+    """Текст приветствия и parse_mode, вычисленный при загрузке"""
+    text: str
+    parse_mode: str = None
+
+    @classmethod
+    def parse(cls, text):
+        if is_valid_telegram_html(text):
+            return cls(text=text, parse_mode="HTML")
+        logger.warning("Welcome message is not valid Telegram HTML, it will be sent as plain text")
+        return cls(text=text)
+
+class WelcomeMessageCache:
+    """Приветственное сообщение в памяти: чтение без обращения к диску,
+    обновление через update() и фоновая проверка изменений (mtime файла или текст из config)"""
+
+    def __init__(self, path=WELCOME_MESSAGE_FILE, interval=WELCOME_CHECK_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._message = None
+        self._mtime = None
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    def _file_mtime(self):
+        if not self.path:
+            return None
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self) -> WelcomeMessage:
+        mtime = self._file_mtime()
+        message = WelcomeMessage.parse(config.get_welcome_message())
+        # Замена одной ссылкой: читатели видят либо старый, либо новый текст целиком
+        self._message, self._mtime = message, mtime
+        return message
+
+    def get(self) -> WelcomeMessage:
+        """Текущее приветствие (с диска читается только при первом обращении)"""
+        message = self._message
+        if message is None:
+            message = self._load()
+        return message
+
+    @property
+    def text(self) -> str:
+        return self.get().text
+
+    async def update(self, text) -> bool:
+        """Сохранение нового приветствия и замена закэшированного"""
+        async with self._lock:
+            if not await asyncio.to_thread(config.update_welcome_message, text):
+                return False
+            self._message = WelcomeMessage.parse(text)
+            self._mtime = await asyncio.to_thread(self._file_mtime)
+            # Другие воркеры перечитают приветствие
+            await db.log_invalidation("welcome")
+            logger.info("Welcome message updated")
+            return True
+
+    async def _reload(self, key=None):
+        async with self._lock:
+            await asyncio.to_thread(self._load)
+            logger.info("Welcome message reloaded after change in another worker")
+
+    def start(self):
+        """Загрузка приветствия и запуск проверки изменений файла"""
+        self.get()
+        db.add_invalidation_listener("welcome", self._reload)
+        self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                async with self._lock:
+                    if self.path:
+                        mtime = await asyncio.to_thread(self._file_mtime)
+                        if mtime != self._mtime:
+                            await asyncio.to_thread(self._load)
+                            logger.info(f"Welcome message reloaded after external change of {self.path}")
+                        continue
+                    text = await asyncio.to_thread(config.get_welcome_message)
+                    if text != self.get().text:
+                        self._message = WelcomeMessage.parse(text)
+                        logger.info("Welcome message reloaded after external change")
+            except Exception as e:
+                logger.error(f"Failed to reload welcome message: {e}")
+
+# Глобальный кэш приветственного сообщения
+welcome_message = WelcomeMessageCache()
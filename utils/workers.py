@@ -0,0 +1,154 @@
+# utils/workers.py
+import asyncio
+import json
+import logging
+import os
+import secrets
+import subprocess
+import sys
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Количество процессов, обрабатывающих апдейты (1 - обычный режим в одном процессе)
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "1"))
+MULTI_WORKER = BOT_WORKERS > 1
+# Роль процесса: "primary" принимает апдейты и выполняет фоновые задачи, "worker" обрабатывает апдейты
+BOT_ROLE = os.getenv("BOT_ROLE", "primary")
+IS_PRIMARY = BOT_ROLE != "worker"
+WORKER_INDEX = int(os.getenv("BOT_WORKER_INDEX", "0"))
+# Воркер i слушает 127.0.0.1:WORKER_BASE_PORT + i
+WORKER_BASE_PORT = int(os.getenv("WORKER_BASE_PORT", "8100"))
+# Секрет для запросов от основного процесса к воркерам
+WORKER_SECRET = os.getenv("WORKER_SECRET", "")
+# Максимум апдейтов в очереди одного воркера
+WORKER_QUEUE_SIZE = 10000
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+def update_chat_id(update: dict) -> int:
+    """ID чата апдейта (или пользователя, если чата у апдейта нет)"""
+    for field, event in update.items():
+        if field == "update_id" or not isinstance(event, dict):
+            continue
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+        user = event.get("from") or event.get("user") or {}
+        return user.get("id", 0)
+    return 0
+
+def worker_for(update: dict, workers=BOT_WORKERS) -> int:
+    """Номер воркера для апдейта: апдейты одного чата всегда попадают к одному воркеру"""
+    return update_chat_id(update) % workers
+
+def worker_url(index, path) -> str:
+    return f"http://127.0.0.1:{WORKER_BASE_PORT + index}{path}"
+
+class UpdateRouter:
+    """Пересылка апдейтов воркерам по ID чата
+
+    У каждого воркера своя очередь и один отправитель, поэтому апдейты одного чата
+    доходят до воркера в порядке получения.
+    """
+
+    def __init__(self, workers=BOT_WORKERS, path="/webhook", secret_token=WORKER_SECRET):
+        self.workers = workers
+        self.path = path
+        self.secret_token = secret_token
+        self._queues = []
+        self._tasks = []
+        self._session = None
+        self.forwarded = 0
+
+    def start(self):
+        self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+        self._queues = [asyncio.Queue(maxsize=WORKER_QUEUE_SIZE) for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._forward(index)) for index in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def route(self, update: dict):
+        """Постановка апдейта в очередь воркера его чата"""
+        await self._queues[worker_for(update, self.workers)].put(json.dumps(update, ensure_ascii=False))
+
+    async def _forward(self, index):
+        url = worker_url(index, self.path)
+        headers = {SECRET_HEADER: self.secret_token, "Content-Type": "application/json"}
+        queue = self._queues[index]
+        while True:
+            body = await queue.get()
+            delay = 0.2
+            while True:
+                try:
+                    async with self._session.post(url, data=body, headers=headers) as response:
+                        if response.status < 500:
+                            if response.status != 200:
+                                logger.error(f"Worker {index} rejected update: HTTP {response.status}")
+                            break
+                        logger.warning(f"Worker {index} returned HTTP {response.status}, retrying")
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # Воркер еще запускается или перезапускается - ждем его
+                    logger.warning(f"Worker {index} is unavailable ({e}), retrying in {delay:.1f} s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 5.0)
+            self.forwarded += 1
+
+class WorkerPool:
+    """Запуск процессов-воркеров (python bot.py с BOT_ROLE=worker) и их перезапуск при падении"""
+
+    def __init__(self, script, workers=BOT_WORKERS):
+        self.script = script
+        self.workers = workers
+        self.secret_token = WORKER_SECRET or secrets.token_urlsafe(32)
+        self._processes = {}
+        self._task = None
+
+    def _spawn(self, index):
+        env = dict(
+            os.environ,
+            BOT_ROLE="worker",
+            BOT_WORKER_INDEX=str(index),
+            WORKER_SECRET=self.secret_token,
+        )
+        self._processes[index] = subprocess.Popen([sys.executable, self.script], env=env)
+        logger.info(f"Started worker {index} (pid {self._processes[index].pid}) on port {WORKER_BASE_PORT + index}")
+
+    def start(self):
+        for index in range(self.workers):
+            self._spawn(index)
+        self._task = asyncio.create_task(self._watch())
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(1)
+            for index, process in list(self._processes.items()):
+                if process.poll() is not None:
+                    logger.error(f"Worker {index} exited with code {process.returncode}, restarting")
+                    self._spawn(index)
+
+    async def stop(self, timeout=10):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for process in self._processes.values():
+            if process.poll() is None:
+                process.terminate()
+        for index, process in self._processes.items():
+            try:
+                await asyncio.to_thread(process.wait, timeout)
+            except subprocess.TimeoutExpired:
+                logger.warning(f"Worker {index} did not stop in {timeout} s, killing it")
+                process.kill()
+        self._processes.clear()